@@ -60,7 +60,11 @@ function getReportQueryString(currentState, next, exportReport, notify) {
             params.export = true;
         }
 
-        params['from'] = next ? get(currentState, 'results.length') : 0;
+        if (next && currentState.cursor) {
+            params.cursor = currentState.cursor;
+        } else {
+            params['from'] = next ? get(currentState, 'results.length') : 0;
+        }
         const queryString = Object.keys(params)
             .filter((key) => params[key])
             .map((key) => [key, params[key]].join('='))
@@ -93,8 +97,8 @@ export function receivedData(data) {
 }
 
 export const ADD_RESULTS = 'ADD_RESULTS';
-export function addResults(results) {
-    return {type: ADD_RESULTS, data: results};
+export function addResults(results, cursor = null) {
+    return {type: ADD_RESULTS, data: results, cursor};
 }
 
 export const SET_ERROR = 'SET_ERROR';
@@ -167,7 +171,7 @@ export function fetchReport(url, next, exportReport) {
                 dispatch(receivedData(data));
             } else {
                 dispatch(isLoading(false));
-                dispatch(addResults(get(data, 'results', [])));
+                dispatch(addResults(get(data, 'results', []), get(data, 'cursor', null)));
             }
         })
             .catch((error) => errorHandler(error, dispatch, setError));
@@ -18,6 +18,7 @@ const initialState = {
     activeReport: null,
     results: [],
     resultHeaders: [],
+    cursor: null,
     aggregations: null,
     companies: [],
     sections: [],
@@ -69,6 +70,7 @@ export default function companyReportReducer(state = initialState, action) {
             isLoading: false,
             aggregations: get(action, 'data.aggregations', null),
             resultHeaders: get(action, 'data.result_headers', []),
+            cursor: get(action, 'data.cursor', null),
         };
     }
 
@@ -87,7 +89,8 @@ export default function companyReportReducer(state = initialState, action) {
     case ADD_RESULTS:
         return {
             ...state,
-            results: [ ...state.results, ...action.data ]
+            results: [ ...state.results, ...action.data ],
+            cursor: action.cursor,
         };
 
     case SET_IS_LOADING:
@@ -11,6 +11,7 @@ class NotificationList extends React.Component {
         this.state = {displayItems: false};
 
         this.renderNotification = this.renderNotification.bind(this);
+        this.getCount = this.getCount.bind(this);
         this.toggleDisplay = this.toggleDisplay.bind(this);
     }
 
@@ -24,8 +25,15 @@ class NotificationList extends React.Component {
         this.elem && $(this.elem).tooltip('dispose'); // make sure it's gone
     }
 
+    getCount() {
+        return this.props.count || (this.props.notifications ? this.props.notifications.length : 0);
+    }
+
     toggleDisplay() {
-        if (!this.state.displayItems && (!this.props.notifications || this.props.notifications.length == 0)) return;
+        if (!this.state.displayItems && this.getCount() == 0) return;
+        if (!this.state.displayItems && this.props.loadNotifications) {
+            this.props.loadNotifications();
+        }
         this.setState({displayItems:!this.state.displayItems});
         if (!this.state.displayItems) {
             document.getElementById('header-notification').classList.add('notif--open');
@@ -41,9 +49,9 @@ class NotificationList extends React.Component {
     render() {
         return (
             <div className="badge--top-right">
-                {this.props.notifications && this.props.notifications.length > 0 &&
+                {this.getCount() > 0 &&
                     <div className="badge badge-pill badge-info badge-secondary">
-                        {this.props.notifications && this.props.notifications.length}
+                        {this.getCount()}
                     </div>
                 }
 
@@ -73,6 +81,8 @@ class NotificationList extends React.Component {
 
 NotificationList.propTypes = {
     notifications: PropTypes.array,
+    count: PropTypes.number,
+    loadNotifications: PropTypes.func,
     clearNotification: PropTypes.func,
     clearAll: PropTypes.func,
 };
@@ -15,6 +15,12 @@ export function initData(data) {
 }
 
 
+export const RECEIVE_NOTIFICATIONS = 'RECEIVE_NOTIFICATIONS';
+export function receiveNotifications(data) {
+    return {type: RECEIVE_NOTIFICATIONS, data};
+}
+
+
 export const CLEAR_ALL_NOTIFICATIONS = 'CLEAR_ALL_NOTIFICATIONS';
 export function clearAllNotifications() {
     return {type: CLEAR_ALL_NOTIFICATIONS};
@@ -27,6 +33,20 @@ export function clearNotification(id) {
 }
 
 
+/**
+ * Loads all notifications of the user,
+ * only the latest ones are rendered with the page
+ *
+ */
+export function fetchNotifications() {
+    return function (dispatch) {
+        return server.get('/notifications')
+            .then((data) => dispatch(receiveNotifications(data)))
+            .catch((error) => errorHandler(error, dispatch));
+    };
+}
+
+
 /**
  * Deletes the given notification of the user
  *
@@ -3,7 +3,8 @@ import PropTypes from 'prop-types';
 import { connect } from 'react-redux';
 import {
     deleteNotification,
-    deleteAllNotifications
+    deleteAllNotifications,
+    fetchNotifications,
 } from '../actions';
 
 import NotificationList from 'components/NotificationList';
@@ -17,6 +18,8 @@ class NotificationsApp extends React.Component {
         return [
             <NotificationList key="notifications"
                 notifications={this.props.notifications}
+                count={this.props.count}
+                loadNotifications={this.props.loaded ? null : this.props.loadNotifications}
                 clearNotification={this.props.clearNotification}
                 clearAll={this.props.clearAll}
             />,
@@ -27,6 +30,9 @@ class NotificationsApp extends React.Component {
 NotificationsApp.propTypes = {
     user: PropTypes.string,
     notifications: PropTypes.arrayOf(PropTypes.object),
+    count: PropTypes.number,
+    loaded: PropTypes.bool,
+    loadNotifications: PropTypes.func,
     clearNotification: PropTypes.func,
     clearAll: PropTypes.func,
 };
@@ -34,11 +40,14 @@ NotificationsApp.propTypes = {
 const mapStateToProps = (state) => ({
     user: state.user,
     notifications: state.notifications,
+    count: state.count,
+    loaded: state.loaded,
 });
 
 const mapDispatchToProps = (dispatch) => ({
     clearNotification: (id) => dispatch(deleteNotification(id)),
     clearAll: () => dispatch(deleteAllNotifications()),
+    loadNotifications: () => dispatch(fetchNotifications()),
 });
 
 export default connect(mapStateToProps, mapDispatchToProps)(NotificationsApp);
@@ -2,6 +2,7 @@
 import {
     NEW_NOTIFICATION,
     INIT_DATA,
+    RECEIVE_NOTIFICATIONS,
     CLEAR_NOTIFICATION,
     CLEAR_ALL_NOTIFICATIONS,
 } from './actions';
@@ -9,17 +10,22 @@ import {
 const initialState = {
     user: null,
     notifications: [],
+    count: 0,
+    loaded: false,
 };
 
 export default function notificationReducer(state = initialState, action) {
     switch (action.type) {
 
     case NEW_NOTIFICATION: {
-        const notifications = state.notifications.concat([action.notification.item]);
+        const item = action.notification.item;
+        const exists = state.notifications.some((n) => n._id === item._id);
+        const notifications = state.notifications.filter((n) => n._id !== item._id).concat([item]);
 
         return {
             ...state,
             notifications,
+            count: exists ? state.count : state.count + 1,
         };
     }
 
@@ -27,6 +33,7 @@ export default function notificationReducer(state = initialState, action) {
         return {
             ...state,
             notifications: [],
+            count: 0,
         };
 
 
@@ -35,14 +42,28 @@ export default function notificationReducer(state = initialState, action) {
         return {
             ...state,
             notifications,
+            count: Math.max(state.count - 1, notifications.length),
         };
     }
 
     case INIT_DATA: {
+        const notifications = action.data.notifications || [];
         return {
             ...state,
             user: action.data.user || null,
-            notifications: action.data.notifications || [],
+            notifications,
+            count: action.data.count || notifications.length,
+            loaded: false,
+        };
+    }
+
+    case RECEIVE_NOTIFICATIONS: {
+        const notifications = action.data.notifications || [];
+        return {
+            ...state,
+            notifications,
+            count: notifications.length,
+            loaded: true,
         };
     }
 
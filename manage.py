@@ -1,12 +1,16 @@
 #!/usr/bin/env python
 
+import json
+
 from flask_script import Manager
 
 from superdesk import get_resource_service
 
 from newsroom.web import NewsroomWebApp
 from newsroom.elastic_utils import rebuild_elastic_index
-from newsroom.mongo_utils import index_elastic_from_mongo, index_elastic_from_mongo_from_timestamp
+from newsroom.topics.percolator import index_topics as index_topics_percolator
+from newsroom.mongo_utils import index_elastic_from_mongo, index_elastic_from_mongo_from_timestamp, \
+    index_elastic_from_mongo_parallel
 from newsroom.auth import get_user_by_email
 from newsroom.company_expiry_alerts import CompanyExpiryAlerts
 from newsroom.monitoring .email_alerts import MonitoringEmailAlerts
@@ -54,13 +58,24 @@ def elastic_init():
     app.data.init_elastic(app)
 
 
+@manager.command
+def index_topics():
+    if not app.config.get('WIRE_TOPICS_PERCOLATOR'):
+        print('Topics percolator is not enabled (WIRE_TOPICS_PERCOLATOR)')
+        return
+
+    print('Registered {} topics in percolator index'.format(index_topics_percolator()))
+
+
 @manager.option('-h', '--hours', dest='hours', default=None)
 @manager.option('-c', '--collection', dest='collection', default=None)
 @manager.option('-t', '--timestamp', dest='timestamp', default=None)
 @manager.option('-d', '--direction', dest='direction', choices=['older', 'newer'], default='older')
 @manager.option('-s', '--start_id', dest='start_id', default=None)
 @manager.option('-i', '--skip_init', dest='skip_init', default=False)
-def index_from_mongo(hours, collection, timestamp, direction, start_id, skip_init):
+@manager.option('-w', '--workers', dest='workers', type=int, default=None)
+@manager.option('-r', '--resume', dest='resume', action='store_true', default=False)
+def index_from_mongo(hours, collection, timestamp, direction, start_id, skip_init, workers, resume):
     if not skip_init:
         print('Checking if elastic index exists, a new one will be created if not')
         app.data.init_elastic(app)
@@ -70,6 +85,9 @@ def index_from_mongo(hours, collection, timestamp, direction, start_id, skip_ini
 
     if timestamp:
         index_elastic_from_mongo_from_timestamp(collection, timestamp, direction)
+    elif workers or resume:
+        index_elastic_from_mongo_parallel(hours=hours, collection=collection, start_id=start_id,
+                                          workers=workers, resume=resume)
     else:
         index_elastic_from_mongo(hours=hours, collection=collection, start_id=start_id)
 
@@ -147,5 +165,25 @@ def data_downgrade(data_update_id=None, fake=False, dry=False):
     cmd.run(data_update_id, fake, dry)
 
 
+@manager.option('-s', '--scenario', dest='scenario', required=True, help='Benchmark scenario name')
+@manager.option('-n', '--items', dest='items', type=int, default=1000, help='Number of generated items')
+@manager.option('-u', '--users', dest='users', type=int, default=100, help='Number of generated users')
+@manager.option('-t', '--topics', dest='topics', type=int, default=1000, help='Number of generated topics')
+@manager.option('-i', '--iterations', dest='iterations', type=int, default=100)
+@manager.option('-o', '--output', dest='output', default=None, help='Json file to append results to')
+def benchmark(scenario, items, users, topics, iterations, output):
+    """Run benchmark scenario using generated data.
+
+    Data is inserted into configured mongo and elastic and removed afterwards,
+    so use it with local databases.
+    """
+    from newsroom.benchmarks import run_scenario, save_results
+
+    results = run_scenario(scenario, iterations=iterations, items=items, users=users, topics=topics)
+    print(json.dumps(results, indent=2))
+    if output:
+        save_results(results, output)
+
+
 if __name__ == "__main__":
     manager.run()
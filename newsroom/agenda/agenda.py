@@ -14,9 +14,10 @@ from superdesk.utils import ListCursor
 
 import newsroom
 from newsroom.agenda.email import send_coverage_notification_email, send_agenda_notification_email
+from newsroom.email import email_render_cache
 from newsroom.auth import get_user
 from newsroom.companies import get_user_company
-from newsroom.notifications import push_notification
+from newsroom.notifications import push_notification, save_user_notifications
 from newsroom.template_filters import is_admin_or_internal, is_admin
 from newsroom.utils import get_user_dict, get_company_dict, get_entity_or_404, parse_date_str
 from newsroom.utils import get_local_date, get_end_date
@@ -237,6 +238,8 @@ class AgendaResource(newsroom.Resource):
                 },
                 'ednote': {'type': 'string'},
                 'internal_note': not_indexed,
+                'fingerprint': not_indexed,
+                'version': not_indexed,
                 'place': planning_schema['place']['mapping'],
                 'state': not_analyzed,
                 'state_reason': {'type': 'string'},
@@ -979,9 +982,10 @@ class AgendaService(BaseSearchService):
         user_dict = get_user_dict()
         company_dict = get_company_dict()
         notify_user_ids = filter_active_users(agenda.get('watches', []), user_dict, company_dict, events_only=True)
-        for user_id in notify_user_ids:
-            user = user_dict[str(user_id)]
-            send_coverage_notification_email(user, agenda, wire_item)
+        with email_render_cache():
+            for user_id in notify_user_ids:
+                user = user_dict[str(user_id)]
+                send_coverage_notification_email(user, agenda, wire_item)
 
     def notify_agenda_update(self, update_agenda, original_agenda, item=None, events_only=False,
                              related_planning_removed=None, coverage_updated=None):
@@ -1142,23 +1146,20 @@ class AgendaService(BaseSearchService):
                         users = users + [user_dict[str(user_id)] for user_id in notify_user_ids]
 
                 # Send notifications to users
-                for user in users:
-                    app.data.insert('notifications', [{
-                        'item': agenda.get('_id'),
-                        'user': user['_id']
-                    }])
-
-                    send_agenda_notification_email(
-                        user,
-                        agenda,
-                        message,
-                        subject,
-                        original_agenda,
-                        coverage_updates,
-                        related_planning_removed,
-                        coverage_updated,
-                        time_updated,
-                    )
+                save_user_notifications([(user['_id'], agenda.get('_id'), 'agenda_update') for user in users])
+                with email_render_cache():
+                    for user in users:
+                        send_agenda_notification_email(
+                            user,
+                            agenda,
+                            message,
+                            subject,
+                            original_agenda,
+                            coverage_updates,
+                            related_planning_removed,
+                            coverage_updated,
+                            time_updated,
+                        )
 
     def get_saved_items_count(self):
         search = SearchQuery()
@@ -1,7 +1,7 @@
 from flask import render_template
 from flask_babel import gettext
 
-from newsroom.email import send_email
+from newsroom.email import send_email, render_notification_template
 from newsroom.utils import get_agenda_dates, get_location_string, get_links, get_public_contacts, url_for_agenda
 from newsroom.template_filters import is_admin_or_internal
 from newsroom.settings import get_settings_collection, GENERAL_SETTINGS_LOOKUP
@@ -18,8 +18,8 @@ def send_coverage_notification_email(user, agenda, wire_item):
         send_email(
             to=[user['email']],
             subject=gettext('New coverage'),
-            text_body=render_template('agenda_new_coverage_email.txt', **kwargs),
-            html_body=render_template('agenda_new_coverage_email.html', **kwargs)
+            text_body=render_notification_template('agenda_new_coverage_email.txt', **kwargs),
+            html_body=render_notification_template('agenda_new_coverage_email.html', **kwargs)
         )
 
 
@@ -43,8 +43,8 @@ def send_agenda_notification_email(user, agenda, message, subject, original_agen
         send_email(
             to=[user['email']],
             subject=subject,
-            text_body=render_template('agenda_updated_email.txt', **kwargs),
-            html_body=render_template('agenda_updated_email.html', **kwargs)
+            text_body=render_notification_template('agenda_updated_email.txt', **kwargs),
+            html_body=render_notification_template('agenda_updated_email.html', **kwargs)
         )
 
 
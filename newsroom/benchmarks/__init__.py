@@ -0,0 +1,180 @@
+"""
+Benchmarks
+----------
+
+Benchmark scenarios for the hot paths, run against local mongo and elastic
+using generated data, which is removed afterwards::
+
+    python manage.py benchmark -s wire_search -n 10000 -o results.json
+
+For every scenario it measures latency, throughput, number of mongo and elastic
+queries per iteration and peak memory allocated by python while running the scenario.
+
+Mongo queries are counted by the listener from :mod:`newsroom.search_metrics`,
+which is registered before the app creates mongo clients.
+"""
+
+import gc
+import time
+import json
+import logging
+import tracemalloc
+
+import elasticsearch
+
+from contextlib import contextmanager
+from flask import current_app as app
+
+from newsroom.celery_app import celery
+from newsroom.search_metrics import get_mongo_commands_count
+from .data import BenchmarkData
+from .scenarios import SCENARIOS, get_news_api_app
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def count_queries():
+    """Count mongo and elastic requests made within the block."""
+    counts = {'mongo': 0, 'elastic': 0}
+    perform_request = elasticsearch.Transport.perform_request
+
+    def counting_perform_request(transport, *args, **kwargs):
+        counts['elastic'] += 1
+        return perform_request(transport, *args, **kwargs)
+
+    mongo_count = get_mongo_commands_count()
+    elasticsearch.Transport.perform_request = counting_perform_request
+    try:
+        yield counts
+    finally:
+        elasticsearch.Transport.perform_request = perform_request
+        counts['mongo'] = get_mongo_commands_count() - mongo_count
+
+
+@contextmanager
+def timed(results, key):
+    """Store the duration of the block in ms into ``results[key]``."""
+    start = time.perf_counter()
+    yield
+    results[key] = round((time.perf_counter() - start) * 1000, 3)
+
+
+@contextmanager
+def sandbox(app):
+    """Run celery tasks in process and suppress emails, so the benchmark doesn't send anything."""
+    always_eager = celery.conf.task_always_eager
+    mail = app.extensions.get('mail')
+    suppress = getattr(mail, 'suppress', None)
+    celery.conf.task_always_eager = True
+    if mail is not None:
+        mail.suppress = True
+    try:
+        yield
+    finally:
+        celery.conf.task_always_eager = always_eager
+        if mail is not None:
+            mail.suppress = suppress
+
+
+def percentile(values, percent):
+    """Get percentile of sorted values using nearest rank method."""
+    if not values:
+        return 0
+    index = max(0, int(round(percent / 100.0 * len(values) + 0.5)) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def measure(func, iterations=100, warmup=5, memory_iterations=5):
+    """Measure given function.
+
+    :param func: function to call in every iteration
+    :param iterations: number of measured iterations
+    :param warmup: number of iterations to run before measuring
+    :param memory_iterations: number of iterations to run with tracemalloc
+    :return: dict with latency in ms, throughput per second, queries per iteration and peak memory in kB
+    """
+    for _i in range(warmup):
+        func()
+
+    gc.collect()
+    durations = []
+    with count_queries() as queries:
+        start = time.perf_counter()
+        for _i in range(iterations):
+            iteration_start = time.perf_counter()
+            func()
+            durations.append((time.perf_counter() - iteration_start) * 1000)
+        total = time.perf_counter() - start
+
+    # tracemalloc slows things down, so memory is measured separately
+    tracemalloc.start()
+    try:
+        for _i in range(memory_iterations):
+            func()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'iterations': iterations,
+        'latency_ms': {
+            'min': round(durations[0], 3) if durations else 0,
+            'mean': round(sum(durations) / len(durations), 3) if durations else 0,
+            'p50': round(percentile(durations, 50), 3),
+            'p95': round(percentile(durations, 95), 3),
+            'p99': round(percentile(durations, 99), 3),
+            'max': round(durations[-1], 3) if durations else 0,
+        },
+        'throughput': round(iterations / total, 3) if total else 0,
+        'queries': {
+            'mongo': round(queries['mongo'] / iterations, 2) if iterations else 0,
+            'elastic': round(queries['elastic'] / iterations, 2) if iterations else 0,
+        },
+        'peak_memory_kb': round(peak / 1024),
+    }
+
+
+def run_scenario(name, iterations=100, warmup=5, **data_params):
+    """Seed data, measure scenario and remove the data.
+
+    :param name: scenario name
+    :param iterations: number of measured iterations
+    :param warmup: number of iterations to run before measuring
+    :param data_params: params for :class:`BenchmarkData`
+    :return: benchmark results
+    """
+    if name not in SCENARIOS:
+        raise ValueError('Unknown scenario {}, available: {}'.format(name, ', '.join(SCENARIOS)))
+
+    scenario = SCENARIOS[name]
+    scenario_app = get_news_api_app(app) if scenario.news_api else app._get_current_object()
+    data = BenchmarkData(**data_params)
+    with scenario_app.app_context(), sandbox(scenario_app):
+        logger.info('Seeding data for benchmark %s', name)
+        data.seed(scenario_app)
+        try:
+            results = measure(scenario.setup(scenario_app, data), iterations=iterations, warmup=warmup)
+        finally:
+            data.cleanup(scenario_app)
+
+    results['scenario'] = name
+    results['data'] = data_params
+    return results
+
+
+def save_results(results, filename):
+    """Store results as json, appended to results already stored in the file.
+
+    :param results: benchmark results
+    :param filename: output file name
+    """
+    try:
+        with open(filename) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = []
+    stored.append(results)
+    with open(filename, 'w') as f:
+        json.dump(stored, f, indent=2)
@@ -0,0 +1,205 @@
+import random
+
+from datetime import timedelta
+from bson import ObjectId
+from superdesk.utc import utcnow
+
+WORDS = [
+    'police', 'election', 'budget', 'weather', 'cricket', 'football', 'market', 'shares', 'health', 'court',
+    'fire', 'flood', 'minister', 'council', 'school', 'hospital', 'drought', 'energy', 'mining', 'tourism',
+]
+
+#: prefix of generated string ids
+ID_PREFIX = 'benchmark-'
+
+#: resources in the order these are inserted
+RESOURCES = (
+    'companies', 'users', 'products', 'news_api_tokens', 'items', 'agenda', 'topics', 'monitoring',
+)
+
+INSERT_CHUNK_SIZE = 1000
+
+
+class BenchmarkData():
+    """Generate and seed benchmark data.
+
+    Data is generated using seeded random generator, so it's the same for every run
+    with the same parameters. Only resources registered in the app are seeded,
+    so the same data can be used with the web app and the news api app.
+
+    :param items: number of wire items, agenda items are 1/10 of these
+    :param companies: number of companies
+    :param users: number of users, spread over companies
+    :param products: number of products of each type
+    :param topics: number of wire topics, spread over users
+    :param seed: random seed
+    """
+
+    def __init__(self, items=1000, companies=10, users=100, products=20, topics=1000, seed=0):
+        self.random = random.Random(seed)
+        self.now = utcnow()
+        self.docs = {resource: [] for resource in RESOURCES}
+        self.inserted = {resource: [] for resource in RESOURCES}
+        self._generate_companies(companies)
+        self._generate_users(users)
+        self._generate_products(products)
+        self._generate_items(items)
+        self._generate_agenda(max(1, items // 10))
+        self._generate_topics(topics)
+        self._generate_monitoring()
+
+    @property
+    def user(self):
+        """User used for web requests."""
+        return self.docs['users'][0]
+
+    @property
+    def token(self):
+        """Token used for news api requests."""
+        return self.docs['news_api_tokens'][0]
+
+    def get_words(self, count=2):
+        return ' '.join(self.random.sample(WORDS, count))
+
+    def get_item(self, _id, versioncreated=None):
+        """Get generated wire item.
+
+        :param _id: item id
+        :param versioncreated: item version time
+        """
+        products = self.random.sample(self.docs['products'], min(2, len(self.docs['products'])))
+        return {
+            '_id': _id,
+            'guid': _id,
+            'type': 'text',
+            'version': 1,
+            'pubstatus': 'usable',
+            'headline': self.get_words(3).capitalize(),
+            'slugline': self.get_words(1).upper(),
+            'body_html': ''.join('<p>{}</p>'.format(self.get_words(10)) for _i in range(10)),
+            'firstcreated': versioncreated or self.now,
+            'versioncreated': versioncreated or self.now,
+            'service': [{'code': 'a', 'name': 'Service A'}],
+            'products': [{'code': product['sd_product_id'], 'name': product['name']} for product in products],
+        }
+
+    def seed(self, app):
+        """Insert generated data using app data layer.
+
+        :param app: app to insert data with
+        """
+        for resource in RESOURCES:
+            if resource not in app.config['DOMAIN']:
+                continue
+            docs = self.docs[resource]
+            for i in range(0, len(docs), INSERT_CHUNK_SIZE):
+                app.data.insert(resource, docs[i:i + INSERT_CHUNK_SIZE])
+                self.inserted[resource].extend(doc['_id'] for doc in docs[i:i + INSERT_CHUNK_SIZE])
+
+    def track(self, resource, _id):
+        """Track doc created during benchmark, so it's removed on cleanup.
+
+        :param resource: resource name
+        :param _id: doc id
+        """
+        self.inserted.setdefault(resource, []).append(_id)
+
+    def cleanup(self, app):
+        """Remove inserted data.
+
+        :param app: app used to seed the data
+        """
+        users = self.inserted.get('users') or []
+        if users and 'notifications' in app.config['DOMAIN']:
+            app.data.remove('notifications', {'user': {'$in': users}})
+        for resource, ids in self.inserted.items():
+            for i in range(0, len(ids), INSERT_CHUNK_SIZE):
+                app.data.remove(resource, {'_id': {'$in': ids[i:i + INSERT_CHUNK_SIZE]}})
+        self.inserted = {resource: [] for resource in RESOURCES}
+
+    def _generate_companies(self, count):
+        self.docs['companies'] = [{
+            '_id': ObjectId(),
+            'name': 'Benchmark company {}'.format(i),
+            'is_enabled': True,
+        } for i in range(count)]
+        self.docs['news_api_tokens'] = [{
+            '_id': ObjectId(),
+            'company': company['_id'],
+            'enabled': True,
+        } for company in self.docs['companies']]
+
+    def _generate_users(self, count):
+        self.docs['users'] = [{
+            '_id': ObjectId(),
+            'email': 'benchmark{}@example.com'.format(i),
+            'first_name': 'Benchmark',
+            'last_name': str(i),
+            'user_type': 'public',
+            'is_enabled': True,
+            'is_approved': True,
+            'is_validated': True,
+            'receive_email': True,
+            'company': self.docs['companies'][i % len(self.docs['companies'])]['_id'],
+        } for i in range(count)]
+
+    def _generate_products(self, count):
+        companies = [str(company['_id']) for company in self.docs['companies']]
+        self.docs['products'] = [{
+            '_id': ObjectId(),
+            'name': 'Benchmark {} product {}'.format(product_type, i),
+            'sd_product_id': '{}{}-{}'.format(ID_PREFIX, product_type, i),
+            'product_type': product_type,
+            'is_enabled': True,
+            'companies': self.random.sample(companies, max(1, len(companies) // 2)),
+        } for product_type in ('wire', 'agenda', 'news_api') for i in range(count)]
+
+    def _generate_items(self, count):
+        self.docs['items'] = [
+            self.get_item('{}item-{}'.format(ID_PREFIX, i), self.now - timedelta(minutes=i))
+            for i in range(count)
+        ]
+
+    def _generate_agenda(self, count):
+        self.docs['agenda'] = [{
+            '_id': '{}agenda-{}'.format(ID_PREFIX, i),
+            'guid': '{}agenda-{}'.format(ID_PREFIX, i),
+            'type': 'agenda',
+            'state': 'scheduled',
+            'name': self.get_words(3).capitalize(),
+            'slugline': self.get_words(1).upper(),
+            'definition_short': self.get_words(10),
+            'versioncreated': self.now,
+            'dates': {
+                'start': self.now + timedelta(hours=i),
+                'end': self.now + timedelta(hours=i + 1),
+                'tz': 'UTC',
+            },
+            'planning_items': [],
+            'coverages': [],
+            'products': [{'code': self.random.choice(self.docs['products'])['sd_product_id']}],
+        } for i in range(count)]
+
+    def _generate_topics(self, count):
+        self.docs['topics'] = [{
+            '_id': ObjectId(),
+            'label': 'Benchmark topic {}'.format(i),
+            'query': self.get_words(2),
+            'notifications': True,
+            'topic_type': 'wire',
+            'user': self.docs['users'][i % len(self.docs['users'])]['_id'],
+        } for i in range(count)]
+
+    def _generate_monitoring(self):
+        self.docs['monitoring'] = [{
+            '_id': ObjectId(),
+            'name': 'Benchmark monitoring {}'.format(i),
+            'subject': 'Benchmark monitoring {}'.format(i),
+            'is_enabled': True,
+            'company': company['_id'],
+            'users': [user['_id'] for user in self.docs['users'] if user['company'] == company['_id']],
+            'alert_type': 'full_text',
+            'format_type': 'monitoring_pdf',
+            'query': 'headline:({})'.format(self.get_words(1)),
+            'schedule': {'interval': 'immediate'},
+        } for i, company in enumerate(self.docs['companies'])]
@@ -0,0 +1,147 @@
+import hmac
+import itertools
+import collections
+
+import superdesk
+import newsroom
+
+from flask import json
+from superdesk import get_resource_service
+
+from .data import WORDS, ID_PREFIX
+
+#: benchmark scenario, ``setup(app, data)`` returns function called in every iteration
+Scenario = collections.namedtuple('Scenario', ['name', 'setup', 'news_api'])
+
+SCENARIOS = collections.OrderedDict()
+
+#: config prefixes shared by web app and news api app
+SHARED_CONFIG_PREFIXES = ('MONGO_', 'CONTENTAPI_', 'ELASTICSEARCH_', 'REDIS_', 'CACHE_')
+
+
+def scenario(name, news_api=False):
+    """Register benchmark scenario.
+
+    :param name: scenario name
+    :param news_api: scenario runs in the news api app
+    """
+    def decorator(setup):
+        SCENARIOS[name] = Scenario(name, setup, news_api)
+        return setup
+    return decorator
+
+
+def get_news_api_app(app):
+    """Create news api app using the same storage as given app.
+
+    :param app: current app
+    """
+    from newsroom.news_api.app import NewsroomNewsAPI
+
+    config = {key: value for key, value in app.config.items() if key.startswith(SHARED_CONFIG_PREFIXES)}
+    config.update({
+        'NEWS_API_ENABLED': True,
+        'RATE_LIMIT_REQUESTS': 0,
+        'RESOURCE_CACHE': app.config.get('RESOURCE_CACHE'),
+        'WRITE_BUFFER_ENABLED': app.config.get('WRITE_BUFFER_ENABLED'),
+    })
+
+    # keep the current app as the default one
+    flask_app, superdesk_app = newsroom.flask_app, superdesk.app
+    try:
+        return NewsroomNewsAPI(config=config, testing=app.testing)
+    finally:
+        newsroom.flask_app, superdesk.app = flask_app, superdesk_app
+
+
+def check_response(response):
+    if response.status_code >= 400:
+        raise RuntimeError('Request failed with status {}: {}'.format(
+            response.status_code, response.get_data(as_text=True)[:500]))
+    return response
+
+
+def get_user_client(app, user):
+    """Get test client with session for given user.
+
+    :param app: app
+    :param user: user doc
+    """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = str(user['_id'])
+        session['name'] = user['first_name']
+        session['user_type'] = user['user_type']
+    return client
+
+
+@scenario('wire_search')
+def wire_search(app, data):
+    client = get_user_client(app, data.user)
+    words = itertools.cycle(WORDS)
+
+    def run():
+        check_response(client.get('/wire/search?q={}'.format(next(words))))
+    return run
+
+
+@scenario('wire_items')
+def wire_items(app, data):
+    service = get_resource_service('wire_search')
+    ids = [item['_id'] for item in data.docs['items']]
+    chunks = itertools.cycle([ids[i:i + 100] for i in range(0, len(ids), 100)])
+
+    def run():
+        list(service.get_items(next(chunks)))
+    return run
+
+
+@scenario('agenda_search')
+def agenda_search(app, data):
+    client = get_user_client(app, data.user)
+    words = itertools.cycle(WORDS)
+
+    def run():
+        check_response(client.get('/agenda/search?q={}'.format(next(words))))
+    return run
+
+
+@scenario('news_api_search', news_api=True)
+def news_api_search(app, data):
+    client = app.test_client()
+    headers = {'Authorization': str(data.token['_id'])}
+    words = itertools.cycle(WORDS)
+
+    def run():
+        check_response(client.get('/{}/news/search?q={}&include_fields=body_html'.format(
+            app.config['URL_PREFIX'], next(words)), headers=headers))
+    return run
+
+
+@scenario('push')
+def push(app, data):
+    client = app.test_client()
+    counter = itertools.count()
+
+    def run():
+        _id = '{}push-{}'.format(ID_PREFIX, next(counter))
+        item = data.get_item(_id)
+        item.pop('_id')
+        payload = json.dumps(item)
+        headers = {}
+        if app.config.get('PUSH_KEY'):
+            key = app.config['PUSH_KEY']
+            mac = hmac.new(key.encode() if isinstance(key, str) else key, payload.encode(), 'sha1')
+            headers['x-superdesk-signature'] = 'sha1=%s' % mac.hexdigest()
+        data.track('items', _id)
+        check_response(client.post('/push', data=payload, content_type='application/json', headers=headers))
+    return run
+
+
+@scenario('monitoring_alerts')
+def monitoring_alerts(app, data):
+    from newsroom.monitoring.email_alerts import MonitoringEmailAlerts
+
+    def run():
+        MonitoringEmailAlerts().run(immediate=True)
+    return run
@@ -10,6 +10,7 @@ from werkzeug.exceptions import NotFound
 
 from newsroom.decorator import admin_only, account_manager_only, login_required
 from newsroom.companies import blueprint
+from newsroom.resource_cache import invalidate
 from newsroom.utils import query_resource, find_one, get_entity_or_404, get_json_or_400, set_original_creator, \
     set_version_creator
 import ipaddress
@@ -152,6 +153,7 @@ def update_products(updates, company_id):
             db.update_one({'_id': product['_id']}, {'$addToSet': {'companies': company_id}})
         else:
             db.update_one({'_id': product['_id']}, {'$pull': {'companies': company_id}})
+    invalidate('products')
 
 
 def update_company(data, _id):
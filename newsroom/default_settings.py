@@ -96,6 +96,7 @@ BLUEPRINTS = [
     'newsroom.settings',
     'newsroom.news_api.api_tokens',
     'newsroom.monitoring',
+    'newsroom.metrics',
 ]
 
 CORE_APPS = [
@@ -129,6 +130,7 @@ CORE_APPS = [
     'newsroom.news_api.api_audit',
     'newsroom.monitoring',
     'newsroom.company_expiry_alerts',
+    'newsroom.search_metrics',
 ]
 
 SITE_NAME = 'AAP Newsroom'
@@ -234,6 +236,9 @@ DISPLAY_ABSTRACT = False
 
 WATERMARK_IMAGE = os.path.join(os.path.dirname(__file__), 'static', 'watermark.png')
 
+#: If enabled the large thumbnail is generated by celery workers instead of on push
+RENDITIONS_DRAFT_MODE = strtobool(env('RENDITIONS_DRAFT_MODE', 'false'))
+
 GOOGLE_MAPS_KEY = os.environ.get('GOOGLE_MAPS_KEY')
 GOOGLE_ANALYTICS = os.environ.get('GOOGLE_ANALYTICS')
 
@@ -331,3 +336,101 @@ PLYR = strtobool(env('PLYR', 'false'))
 
 # If enabled Superdesk product filtering will be applied to the media items embedded in the stories
 EMBED_PRODUCT_FILTERING = strtobool(env('EMBED_PRODUCT_FILTERING', 'false'))
+
+#: If enabled the /push endpoint only verifies and queues the items, these are processed by celery workers
+PUSH_ASYNC = strtobool(env('PUSH_ASYNC', 'false'))
+
+#: The number of seconds a pushed item version is remembered as processed by async push,
+#: use shared cache (``CACHE_TYPE=redis``) when running multiple workers
+PUSH_IDEMPOTENCY_TIMEOUT = int(env('PUSH_IDEMPOTENCY_TIMEOUT', 3600))
+
+#: If enabled pushed items which content didn't change since the previous push are not published again
+PUSH_FINGERPRINT_ENABLED = strtobool(env('PUSH_FINGERPRINT_ENABLED', 'true'))
+
+#: Fields not visible to subscribers, changes in these fields don't get pushed items published again
+PUSH_FINGERPRINT_IGNORED_FIELDS = [
+    '_id', '_etag', '_type', 'version', '_current_version', 'versioncreated', 'version_creator', 'original_creator',
+    'operation', 'expiry', 'lock_user', 'lock_session', 'lock_action', 'lock_time',
+]
+
+#: If enabled wire topics are registered in elastic percolator index
+#: and only topics with query matching a new item are tested for notifications.
+#: Agenda topics are not percolated, these are matched by the watched item id in mongo
+WIRE_TOPICS_PERCOLATOR = strtobool(env('WIRE_TOPICS_PERCOLATOR', 'false'))
+
+#: Name of the topics percolator index, defaults to ``<CONTENTAPI_ELASTICSEARCH_INDEX>_topics``
+TOPICS_PERCOLATOR_INDEX = env('TOPICS_PERCOLATOR_INDEX')
+
+#: If enabled multi item and media downloads are streamed to client while the zip archive is being created
+DOWNLOAD_STREAMING = strtobool(env('DOWNLOAD_STREAMING', 'false'))
+
+#: If enabled products, navigations and section filters are cached in memory,
+#: workers check for changes once per request
+RESOURCE_CACHE = strtobool(env('RESOURCE_CACHE', 'true'))
+
+#: If enabled api audit and history records are written in batches by a background thread,
+#: history is then available with a delay of up to ``WRITE_BUFFER_FLUSH_INTERVAL`` seconds
+#: which delays history match notifications
+WRITE_BUFFER_ENABLED = strtobool(env('WRITE_BUFFER_ENABLED', 'false'))
+
+#: Max number of records waiting in the write buffer, new records are dropped when it's full
+WRITE_BUFFER_MAX_SIZE = int(env('WRITE_BUFFER_MAX_SIZE', 10000))
+
+#: Number of records written in a single batch, reaching it triggers the write
+WRITE_BUFFER_BATCH_SIZE = int(env('WRITE_BUFFER_BATCH_SIZE', 500))
+
+#: Max number of seconds records are waiting in the write buffer
+WRITE_BUFFER_FLUSH_INTERVAL = int(env('WRITE_BUFFER_FLUSH_INTERVAL', 5))
+
+#: Number of milliseconds websocket notifications are buffered and merged per channel, 0 to send right away
+NOTIFICATION_COALESCE_WINDOW = int(env('NOTIFICATION_COALESCE_WINDOW', 500))
+
+#: Number of emails sent by a single celery task when emails are sent in batches
+MAIL_BATCH_SIZE = int(env('MAIL_BATCH_SIZE', 100))
+
+#: Max number of emails sent per second by each worker process, ``0`` means no limit
+MAIL_RATE_LIMIT = int(env('MAIL_RATE_LIMIT', 0))
+
+#: Number of seconds the SMTP connection can be idle before it's checked using ``NOOP``
+MAIL_KEEPALIVE_CHECK = int(env('MAIL_KEEPALIVE_CHECK', 30))
+
+#: Number of times an email which failed to send is retried
+MAIL_MAX_RETRIES = int(env('MAIL_MAX_RETRIES', 3))
+
+#: Number of seconds before failed emails are retried, multiplied by the attempt number
+MAIL_RETRY_DELAY = int(env('MAIL_RETRY_DELAY', 30))
+
+#: Number of seconds items of home page cards are cached, pushed items invalidate matching cards right away,
+#: use shared cache (``CACHE_TYPE=redis``) when running multiple workers
+HOME_CARD_CACHE_TIMEOUT = int(env('HOME_CARD_CACHE_TIMEOUT', 60))
+
+#: Number of seconds expired or invalidated home page cards are served while a single request recomputes them
+HOME_CARD_CACHE_STALE = int(env('HOME_CARD_CACHE_STALE', 5))
+
+#: Max number of seconds a request waits for other request computing a home page card
+HOME_CARD_CACHE_LOCK_TIMEOUT = int(env('HOME_CARD_CACHE_LOCK_TIMEOUT', 10))
+
+#: Number of the latest notifications rendered with every page, all notifications are loaded when opened
+NOTIFICATIONS_SUMMARY_SIZE = int(env('NOTIFICATIONS_SUMMARY_SIZE', 10))
+
+#: If enabled search permission filters are compiled once per company, user type, section and navigations,
+#: requires ``RESOURCE_CACHE`` which is used to detect product and section filter changes
+PERMISSION_FILTER_CACHE = strtobool(env('PERMISSION_FILTER_CACHE', 'true'))
+
+#: Max number of compiled search permission filters kept in memory per process
+PERMISSION_FILTER_CACHE_SIZE = int(env('PERMISSION_FILTER_CACHE_SIZE', 1000))
+
+#: If enabled first page search aggregations are cached and reused by searches with the same query
+AGGREGATIONS_CACHE = strtobool(env('AGGREGATIONS_CACHE', 'true'))
+
+#: Number of seconds search aggregations are cached, these are invalidated on push
+AGGREGATIONS_CACHE_TIMEOUT = int(env('AGGREGATIONS_CACHE_TIMEOUT', 5))
+
+#: If enabled searches record time spent per stage, available via ``/metrics`` endpoint
+SEARCH_METRICS = strtobool(env('SEARCH_METRICS', 'true'))
+
+#: If enabled search metrics of a request are sent to administrators via ``Server-Timing`` header
+SEARCH_SERVER_TIMING = strtobool(env('SEARCH_SERVER_TIMING', 'false'))
+
+#: Searches taking longer than this number of ms are logged with their elastic queries, ``0`` disables it
+SEARCH_SLOW_THRESHOLD = int(env('SEARCH_SLOW_THRESHOLD', 1000))
@@ -1,44 +1,128 @@
-from superdesk.emails import SuperdeskMessage  # it handles some encoding issues
-from flask import current_app, render_template, url_for
-from flask_babel import gettext
+import json
+import uuid
+
+from contextlib import contextmanager
+from flask import current_app, render_template, url_for, g
+from flask_babel import gettext, get_locale, get_timezone
+from markupsafe import escape
 from newsroom.celery_app import celery
-from flask_mail import Attachment
+from newsroom.email_delivery import deliver_emails
 
 from newsroom.utils import get_agenda_dates, get_location_string, get_links, \
     get_public_contacts
 from newsroom.template_filters import is_admin_or_internal
 from newsroom.utils import url_for_agenda
 from superdesk.logging import logger
-import base64
 
 
 @celery.task(bind=True, soft_time_limit=120)
-def _send_email(self, to, subject, text_body, html_body=None, sender=None, attachments_info=None):
-    if attachments_info is None:
-        attachments_info = []
-
-    if sender is None:
-        sender = current_app.config['MAIL_DEFAULT_SENDER']
-
-    decoded_attachments = []
-    for a in attachments_info:
-        try:
-            content = base64.b64decode(a['file'])
-            decoded_attachments.append(Attachment(a['file_name'],
-                                                  a['content_type'], data=content, headers=a.get('headers')))
-        except Exception as e:
-            logger.error('Error attaching {} file to mail. Receipient(s): {}. Error: {}'.format(
-                a['file_desc'], to, e))
-
-    msg = SuperdeskMessage(subject=subject, sender=sender, recipients=to, attachments=decoded_attachments)
-    msg.body = text_body
-    msg.html = html_body
-    app = current_app._get_current_object()
-    with app.mail.connect() as connection:
-        if connection:
-            return connection.send(msg)
-
-        return app.mail.send(msg)
+def _send_email(self, to, subject, text_body, html_body=None, sender=None, attachments_info=None, attempts=0):
+    _deliver([{
+        'to': to,
+        'subject': subject,
+        'text_body': text_body,
+        'html_body': html_body,
+        'sender': sender,
+        'attachments_info': attachments_info,
+        'attempts': attempts,
+    }])
+
+
+@celery.task(bind=True, soft_time_limit=600)
+def _send_emails(self, messages):
+    _deliver(messages)
+
+
+def _deliver(messages):
+    """Send messages and schedule the ones which failed to be sent again."""
+    failed = deliver_emails(messages)
+    max_retries = current_app.config.get('MAIL_MAX_RETRIES', 3)
+    retry = [message for message in failed if message['attempts'] <= max_retries]
+    if len(retry) < len(failed):
+        logger.error('Failed to send {} emails after {} attempts'.format(len(failed) - len(retry), max_retries + 1))
+    if retry:
+        countdown = current_app.config.get('MAIL_RETRY_DELAY', 30) * max(message['attempts'] for message in retry)
+        _send_emails.apply_async(kwargs={'messages': retry}, countdown=countdown)
+
+
+@contextmanager
+def email_batch():
+    """Collect emails sent within the block and queue these using tasks of ``MAIL_BATCH_SIZE`` emails."""
+    if g.get('email_batch') is not None:
+        yield
+        return
+
+    g.email_batch = []
+    try:
+        yield
+    finally:
+        messages, g.email_batch = g.email_batch, None
+        batch_size = current_app.config.get('MAIL_BATCH_SIZE') or 100
+        for i in range(0, len(messages), batch_size):
+            _send_emails.apply_async(kwargs={'messages': messages[i:i + batch_size]})
+
+
+#: template context fields which differ per recipient, rendered using placeholders and substituted afterwards
+PERSONALIZED_FIELDS = ('name', )
+
+PLACEHOLDER = '__email_{}_{{}}__'.format(uuid.uuid4().hex)
+
+HTML_TEMPLATE_EXTENSIONS = ('.html', '.htm', '.xml', '.xhtml')
+
+
+@contextmanager
+def email_render_cache():
+    """Cache notification emails rendered within the block.
+
+    Templates are rendered once per template, locale and item version and personalized
+    for every recipient by replacing ``PERSONALIZED_FIELDS`` placeholders.
+    """
+    if g.get('email_render_cache') is not None:
+        yield
+        return
+
+    g.email_render_cache = {}
+    try:
+        yield
+    finally:
+        g.email_render_cache = None
+
+
+def _get_render_key(value):
+    if isinstance(value, dict) and value.get('_id'):
+        # items are identified by version, these don't change while being sent
+        return json.dumps([value['_id'], value.get('version') or value.get('_current_version'),
+                           value.get('_etag'), value.get('_updated')], default=str)
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def render_notification_template(template_name, **kwargs):
+    """Render notification email template, using cache if enabled via :func:`email_render_cache`.
+
+    :param template_name: template name
+    :param kwargs: template context
+    """
+    cache = g.get('email_render_cache')
+    if cache is None:
+        return render_template(template_name, **kwargs)
+
+    personalized = {field: kwargs.pop(field) for field in PERSONALIZED_FIELDS if kwargs.get(field)}
+    key = (
+        template_name,
+        str(get_locale()),
+        str(get_timezone()),
+        tuple(sorted(personalized)),
+        tuple((field, _get_render_key(value)) for field, value in sorted(kwargs.items())),
+    )
+    if key not in cache:
+        kwargs.update({field: PLACEHOLDER.format(field) for field in personalized})
+        cache[key] = render_template(template_name, **kwargs)
+
+    rendered = cache[key]
+    is_html = template_name.endswith(HTML_TEMPLATE_EXTENSIONS)
+    for field, value in personalized.items():
+        rendered = rendered.replace(PLACEHOLDER.format(field), str(escape(value)) if is_html else str(value))
+    return rendered
 
 
 def send_email(to, subject, text_body, html_body=None, sender=None, attachments_info=[]):
@@ -59,6 +143,9 @@ def send_email(to, subject, text_body, html_body=None, sender=None, attachments_
         'sender': sender,
         'attachments_info': attachments_info,
     }
+    if g.get('email_batch') is not None:
+        g.email_batch.append(kwargs)
+        return
     _send_email.apply_async(kwargs=kwargs)
 
 
@@ -158,8 +245,8 @@ def _send_new_wire_notification_email(user, topic_name, item, section):
         type='wire',
         section=section
     )
-    text_body = render_template('new_item_notification.txt', **kwargs)
-    html_body = render_template('new_item_notification.html', **kwargs)
+    text_body = render_notification_template('new_item_notification.txt', **kwargs)
+    html_body = render_notification_template('new_item_notification.html', **kwargs)
     send_email(to=recipients, subject=subject, text_body=text_body, html_body=html_body)
 
 
@@ -182,8 +269,8 @@ def _send_new_agenda_notification_email(user, topic_name, item):
         is_admin=is_admin_or_internal(user),
         section='agenda'
     )
-    text_body = render_template('new_item_notification.txt', **kwargs)
-    html_body = render_template('new_item_notification.html', **kwargs)
+    text_body = render_notification_template('new_item_notification.txt', **kwargs)
+    html_body = render_notification_template('new_item_notification.html', **kwargs)
     send_email(to=recipients, subject=subject, text_body=text_body, html_body=html_body)
 
 
@@ -199,7 +286,7 @@ def _send_history_match_wire_notification_email(user, item, section):
     url = url_for('wire.item', _id=item['guid'], _external=True)
     recipients = [user['email']]
     subject = gettext('New update for your previously accessed story: {}'.format(item['headline']))
-    text_body = render_template(
+    text_body = render_notification_template(
         'new_item_notification.txt',
         app_name=app_name,
         is_topic=False,
@@ -218,7 +305,7 @@ def _send_history_match_agenda_notification_email(user, item):
     url = url_for_agenda(item, _external=True)
     recipients = [user['email']]
     subject = gettext('New update for your previously accessed agenda: {}'.format(item['name']))
-    text_body = render_template(
+    text_body = render_notification_template(
         'new_item_notification.txt',
         app_name=app_name,
         is_topic=False,
@@ -0,0 +1,161 @@
+"""
+Email delivery
+--------------
+
+Emails are sent by celery workers in batches, each worker process keeps
+a single SMTP connection open and reuses it for all the emails it sends.
+
+The connection is checked using ``NOOP`` if it was idle for more than ``MAIL_KEEPALIVE_CHECK`` seconds
+and it's reopened when the server disconnects. Sending is limited to ``MAIL_RATE_LIMIT``
+emails per second per worker process.
+"""
+
+import os
+import time
+import base64
+import atexit
+import logging
+import smtplib
+import threading
+
+from flask import current_app as app
+from flask_mail import Attachment
+from superdesk.emails import SuperdeskMessage
+
+logger = logging.getLogger(__name__)
+
+#: errors after which the message is sent again using new connection
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+
+class SMTPConnectionPool():
+    """Keep-alive SMTP connection shared by all emails sent from the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+        self.last_used = 0
+
+    def send(self, message):
+        """Send message, reconnecting and trying again once if the connection was closed.
+
+        :param message: flask mail message
+        """
+        with self.lock:
+            try:
+                self._get_connection().send(message)
+            except RECONNECT_ERRORS as exc:
+                logger.info('SMTP connection lost, reconnecting: %s', exc)
+                self._close()
+                self._get_connection().send(message)
+            self.last_used = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def _get_connection(self):
+        mail = app.extensions['mail']
+        if self.connection is not None:
+            if self.pid != os.getpid():
+                # connection inherited from parent process, leave its socket alone
+                self.connection = None
+            elif self.connection.mail is not mail:
+                self._close()
+            elif (self.connection.host is None) != bool(mail.suppress):
+                self._close()
+            elif self.connection.host is not None and not self._is_alive():
+                self._close()
+
+        if self.connection is None:
+            self.connection = app.mail.connect().__enter__()
+            self.pid = os.getpid()
+            self.last_used = time.monotonic()
+        return self.connection
+
+    def _is_alive(self):
+        if time.monotonic() - self.last_used < app.config.get('MAIL_KEEPALIVE_CHECK', 30):
+            return True
+        try:
+            return self.connection.host.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _close(self):
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+
+class RateLimiter():
+    """Spread calls to :meth:`wait` so there are at most ``rate`` per second."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_at = 0
+
+    def wait(self, rate):
+        """Wait until next call is allowed.
+
+        :param rate: max number of calls per second, no limit if not set
+        """
+        if not rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if self.next_at > now:
+                time.sleep(self.next_at - now)
+                now = self.next_at
+            self.next_at = now + 1.0 / rate
+
+
+smtp_pool = SMTPConnectionPool()
+rate_limiter = RateLimiter()
+atexit.register(smtp_pool.close)
+
+
+def build_message(to, subject, text_body, html_body=None, sender=None, attachments_info=None, **kwargs):
+    """Create message using params passed to ``send_email``."""
+    if attachments_info is None:
+        attachments_info = []
+
+    if sender is None:
+        sender = app.config['MAIL_DEFAULT_SENDER']
+
+    decoded_attachments = []
+    for a in attachments_info:
+        try:
+            content = base64.b64decode(a['file'])
+            decoded_attachments.append(Attachment(a['file_name'],
+                                                  a['content_type'], data=content, headers=a.get('headers')))
+        except Exception as e:
+            logger.error('Error attaching {} file to mail. Receipient(s): {}. Error: {}'.format(
+                a['file_desc'], to, e))
+
+    msg = SuperdeskMessage(subject=subject, sender=sender, recipients=to, attachments=decoded_attachments)
+    msg.body = text_body
+    msg.html = html_body
+    return msg
+
+
+def deliver_emails(messages):
+    """Send emails using pooled connection.
+
+    :param messages: list of ``send_email`` params
+    :return: list of messages which failed to send, with increased ``attempts``
+    """
+    failed = []
+    for message in messages:
+        rate_limiter.wait(app.config.get('MAIL_RATE_LIMIT'))
+        try:
+            smtp_pool.send(build_message(**message))
+        except smtplib.SMTPRecipientsRefused as exc:
+            logger.error('Email recipients refused: %s', exc.recipients)
+        except (smtplib.SMTPException, OSError) as exc:
+            logger.warning('Failed to send email to %s: %s', message.get('to'), exc)
+            failed.append(dict(message, attempts=message.get('attempts', 0) + 1))
+    return failed
@@ -21,6 +21,7 @@ from flask_cache import Cache
 
 from newsroom.utils import is_json_request
 from newsroom.gettext import setup_babel
+from newsroom.search_metrics import register_listener
 import newsroom
 from superdesk.logging import configure_logging
 
@@ -55,6 +56,9 @@ class NewsroomApp(eve.Eve):
         self.mail = None
         self.cache = None
 
+        # must be done before data layer creates mongo clients
+        register_listener()
+
         super(NewsroomApp, self).__init__(
             import_name,
             data=self.DATALAYER,
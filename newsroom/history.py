@@ -1,7 +1,5 @@
 
 import newsroom
-import pymongo.errors
-import werkzeug.exceptions
 from bson import ObjectId
 
 from superdesk import get_resource_service
@@ -13,9 +11,13 @@ from eve.utils import ParsedRequest
 from newsroom.utils import get_json_or_400
 from newsroom.auth import get_user
 from newsroom.products.products import get_products_by_company
+from newsroom.write_buffer import buffered_write
+from newsroom.search import iter_search, search_page
 
 blueprint = Blueprint('history', __name__)
 
+EXPORT_PAGE_SIZE = 500
+
 
 class HistoryResource(newsroom.Resource):
     item_methods = ['GET']
@@ -75,11 +77,7 @@ class HistoryService(newsroom.Service):
                 'monitoring': monitoring,
             }
 
-        for doc in docs:
-            try:
-                super().create([transform(doc)])
-            except (werkzeug.exceptions.Conflict, pymongo.errors.BulkWriteError):
-                continue
+        buffered_write(self.datasource, [transform(doc) for doc in docs])
 
     def create_history_record(self, items, action, user, section, monitoring=None):
         self.create(items, action, user, section, monitoring)
@@ -107,10 +105,7 @@ class HistoryService(newsroom.Service):
             'section': section,
             'extra_data': association_name
         }
-        try:
-            super().create([entry])
-        except (werkzeug.exceptions.Conflict, pymongo.errors.BulkWriteError):
-            pass
+        buffered_write(self.datasource, [entry])
 
     def _find_association(self, item, media_id):
         """
@@ -198,46 +193,53 @@ class HistoryService(newsroom.Service):
         return super().get(req, None)
 
     def fetch_history(self, query, all=False):
-        results = self.query_items(query)
-        docs = results.docs
-        if all:
-            while results.hits['hits']['total'] > len(docs):
-                query['from'] = len(docs)
-                results = self.query_items(query)
-                docs.extend(results.docs)
+        if not all:
+            results = self.query_items(query)
+            return {
+                'items': results.docs,
+                'hits': results.hits
+            }
+
+        docs = []
+        hits = {}
+        for results in iter_search(self.datasource, query, EXPORT_PAGE_SIZE):
+            hits = hits or results.hits
+            docs.extend(results.docs)
 
         return {
             'items': docs,
-            'hits': results.hits
+            'hits': hits
         }
 
+    def fetch_history_page(self, query, cursor=None):
+        """Fetch single page of history records using cursor from previous page.
 
-def get_history_users(item_ids, active_user_ids, active_company_ids, section, action):
-    source = {
-        'query': {
-            'bool': {
-                'must': [
-                    {'terms': {'company': [str(a) for a in active_company_ids]}},
-                    {'terms': {'item': [str(i) for i in item_ids]}},
-                    {'term': {'section': section}},
-                    {'term': {'action': action}},
-                ]
-            }
-        },
-        'size': 25,
-        'from': 0
-    }
+        :param query: elastic query
+        :param cursor: cursor returned with previous page
+        """
+        results, next_cursor = search_page(self.datasource, query, cursor=cursor)
+        return {
+            'items': results.docs,
+            'hits': results.hits,
+            'cursor': next_cursor,
+        }
 
-    # Get the results
-    histories = get_resource_service('history').fetch_history(source, all=True).get('items') or []
 
-    # Filter out the users
-    user_ids = [str(uid) for uid in active_user_ids]
-    return [
-        str(h['user'])
-        for h in histories
-        if h.get('user') in user_ids
-    ]
+def get_history_audience(item_ids, action='download'):
+    """Get ids of users who did given action with any of the items per section using single aggregation.
+
+    :param item_ids: list of item ids
+    :param action: history action
+    :return: dict with set of user ids per section
+    """
+    audience = {}
+    for group in app.data.get_mongo_collection('history').aggregate([
+        {'$match': {'item': {'$in': [str(i) for i in item_ids]}, 'action': action}},
+        {'$group': {'_id': {'section': '$section', 'user': '$user'}}},
+    ]):
+        if group['_id'].get('user'):
+            audience.setdefault(group['_id'].get('section'), set()).add(str(group['_id']['user']))
+    return audience
 
 
 @blueprint.route('/history/new', methods=['POST'])
@@ -1,11 +1,61 @@
+"""
+Picture renditions
+------------------
+
+Renditions of pushed pictures are generated from the source images, each source image
+is decoded once per item and the watermark image is kept in memory per process.
+
+With ``RENDITIONS_DRAFT_MODE`` enabled only the thumbnail and watermarked preview
+and details renditions are generated while the item is published, so it's available sooner
+and the original pictures are never shown instead of the watermarked ones.
+The large thumbnail is generated by celery workers which add it to the item once done.
+
+Time spent generating each rendition is tracked, see :func:`get_rendition_stats`.
+"""
+
 import io
+import os
+import time
+import logging
+import threading
+
+import superdesk
+
 from PIL import Image, ImageEnhance
 from flask import current_app as app
+from newsroom.celery_app import celery
 from newsroom.upload import ASSETS_RESOURCE
+from newsroom.wire.home_cache import invalidate_home_cards_with_items
+
+logger = logging.getLogger(__name__)
 
 THUMBNAIL_SIZE = (640, 640)
 THUMBNAIL_QUALITY = 80
 
+#: renditions generated while the item is published in draft mode
+DRAFT_RENDITIONS = ('_newsroom_thumbnail', '_newsroom_base', '_newsroom_view')
+
+_watermark_lock = threading.Lock()
+_watermark_cache = {}
+
+_stats_lock = threading.Lock()
+_rendition_stats = {}
+
+
+class SourceImages():
+    """Decoded source images of single item, so each of these is decoded only once."""
+
+    def __init__(self):
+        self.images = {}
+
+    def get(self, media_id):
+        if media_id not in self.images:
+            binary = app.media.get(media_id, resource=ASSETS_RESOURCE)
+            image = Image.open(binary)
+            image.load()
+            self.images[media_id] = image
+        return self.images[media_id]
+
 
 def store_image(image, filename=None, _id=None):
     """Store the image to GridFs or AWS S3"""
@@ -34,20 +84,32 @@ def get_thumbnail(image):
     return image
 
 
+def get_watermark_image():
+    """Get decoded watermark image with opacity set, cached per process until the file changes."""
+    path = app.config['WATERMARK_IMAGE']
+    key = (path, os.path.getmtime(path))
+    with _watermark_lock:
+        if key not in _watermark_cache:
+            with open(path, mode='rb') as watermark_binary:
+                watermark_image = Image.open(watermark_binary)
+                set_opacity(watermark_image, 0.3)
+            _watermark_cache.clear()
+            _watermark_cache[key] = watermark_image
+        return _watermark_cache[key]
+
+
 def get_watermark(image):
     image = image.copy()
     if not app.config.get('WATERMARK_IMAGE'):
         return image
     if image.mode != 'RGBA':
         image = image.convert('RGBA')
-    with open(app.config['WATERMARK_IMAGE'], mode='rb') as watermark_binary:
-        watermark_image = Image.open(watermark_binary)
-        set_opacity(watermark_image, 0.3)
-        watermark_layer = Image.new('RGBA', image.size)
-        watermark_layer.paste(watermark_image, (
-            image.size[0] - watermark_image.size[0],
-            int((image.size[1] - watermark_image.size[1]) * 0.66),
-        ))
+    watermark_image = get_watermark_image()
+    watermark_layer = Image.new('RGBA', image.size)
+    watermark_layer.paste(watermark_image, (
+        image.size[0] - watermark_image.size[0],
+        int((image.size[1] - watermark_image.size[1]) * 0.66),
+    ))
 
     watermark = Image.alpha_composite(image, watermark_layer)
     return watermark.convert('RGB')
@@ -59,47 +121,140 @@ def set_opacity(image, opacity=1):
     image.putalpha(alpha)
 
 
+def get_rendition_stats():
+    """Get number of generated renditions and time spent generating these per rendition name."""
+    with _stats_lock:
+        return {
+            name: dict(stats, avg_ms=round(stats['total_ms'] / stats['count'], 3))
+            for name, stats in _rendition_stats.items()
+        }
+
+
+def _track_rendition(name, duration):
+    duration_ms = duration * 1000
+    with _stats_lock:
+        stats = _rendition_stats.setdefault(name, {'count': 0, 'total_ms': 0, 'max_ms': 0})
+        stats['count'] += 1
+        stats['total_ms'] = round(stats['total_ms'] + duration_ms, 3)
+        stats['max_ms'] = round(max(stats['max_ms'], duration_ms), 3)
+
+
+def get_rendition_jobs(picture, preview_details=True):
+    """Get list of ``(name, source media, function)`` for renditions generated for given picture.
+
+    :param picture: picture association
+    :param preview_details: include preview and details renditions
+    """
+    jobs = []
+    renditions = picture.get('renditions') or {}
+
+    # use 4-3 rendition for generated thumbs
+    rendition = renditions.get('4-3', renditions.get('viewImage'))
+    if rendition:
+        jobs.append(('_newsroom_thumbnail', rendition['media'], get_thumbnail))  # 4-3 rendition resized
+        jobs.append(('_newsroom_thumbnail_large', rendition['media'], get_watermark))  # 4-3 rendition with watermark
+
+    # add watermark to base/view images
+    for key in (['base', 'view'] if preview_details else []):
+        rendition = renditions.get('%sImage' % key)
+        if rendition:
+            jobs.append(('_newsroom_%s' % key, rendition['media'], get_watermark))
+
+    return jobs
+
+
+def run_rendition_jobs(picture, jobs, images=None):
+    """Generate renditions and add these to the picture.
+
+    :param picture: picture association
+    :param jobs: list of jobs from :func:`get_rendition_jobs`
+    :param images: decoded source images
+    """
+    images = images or SourceImages()
+    for name, media_id, generate in jobs:
+        start = time.perf_counter()
+        picture['renditions'][name] = store_image(generate(images.get(media_id)), _id='%s%s' % (media_id, name))
+        _track_rendition(name, time.perf_counter() - start)
+
+
 def generate_preview_details_renditions(picture):
     """Generate preview and details rendition"""
     if not picture or not picture.get('renditions'):
         return
 
-    # add watermark to base/view images
-    for key in ['base', 'view']:
-        rendition = picture.get('renditions', {}).get('%sImage' % key)
-        if rendition:
-            binary = app.media.get(rendition['media'], resource=ASSETS_RESOURCE)
-            im = Image.open(binary)
-            watermark = get_watermark(im)
-            picture['renditions'].update({
-                '_newsroom_%s' % key: store_image(watermark,
-                                                  _id='%s%s' % (rendition['media'], '_newsroom_%s' % key))
-            })
+    jobs = [job for job in get_rendition_jobs(picture) if job[0] in ('_newsroom_base', '_newsroom_view')]
+    run_rendition_jobs(picture, jobs)
 
 
 def generate_renditions(item):
+    """Generate renditions for item featuremedia.
+
+    :param item: item
+    :return: list of renditions which should be generated later using :func:`schedule_renditions`
+    """
     picture = item.get('associations', {}).get('featuremedia', {})
+    if not picture or not get_rendition_jobs(picture, False):
+        return []
+
+    # preview and details renditions are generated via app so these can be customized
+    custom_preview_details = app.generate_preview_details_renditions is not generate_preview_details_renditions
+    jobs = get_rendition_jobs(picture, not custom_preview_details)
+    pending = []
+    if app.config.get('RENDITIONS_DRAFT_MODE'):
+        pending = [job[0] for job in jobs if job[0] not in DRAFT_RENDITIONS]
+        jobs = [job for job in jobs if job[0] in DRAFT_RENDITIONS]
+
+    run_rendition_jobs(picture, jobs)
+    if custom_preview_details:
+        app.generate_preview_details_renditions(picture)
+    return pending
+
+
+def schedule_renditions(item_id, renditions):
+    """Generate renditions for item featuremedia by celery workers.
+
+    :param item_id: item id
+    :param renditions: list of rendition names
+    """
+    generate_item_renditions.apply_async(kwargs={'item_id': item_id, 'renditions': renditions})
+
+
+def get_featuremedia(item):
+    return ((item or {}).get('associations') or {}).get('featuremedia')
+
+
+def get_rendition_sources(picture, renditions):
+    """Get source media id per rendition name for given renditions of the picture."""
+    return {name: media_id for name, media_id, _generate in get_rendition_jobs(picture) if name in renditions}
+
+
+@celery.task(soft_time_limit=300)
+def generate_item_renditions(item_id, renditions):
+    """Generate remaining renditions for published item and add these to the item.
+
+    Generated renditions are added to the item as it's stored once these are done,
+    so changes pushed in the meantime are kept, and only if its featuremedia still uses
+    the same source pictures.
+    """
+    service = superdesk.get_resource_service('items')
+    picture = get_featuremedia(service.find_one(req=None, _id=item_id))
     if not picture:
+        logger.warning('Featuremedia of item %s not found, skipping renditions', item_id)
         return
 
-    # use 4-3 rendition for generated thumbs
-    renditions = picture.get('renditions', {})
-    rendition = renditions.get('4-3', renditions.get('viewImage'))
-    if not rendition:
+    sources = get_rendition_sources(picture, renditions)
+    generated = {'renditions': {}}
+    run_rendition_jobs(generated, [job for job in get_rendition_jobs(picture) if job[0] in renditions])
+
+    item = service.find_one(req=None, _id=item_id)
+    picture = get_featuremedia(item)
+    if not picture or get_rendition_sources(picture, renditions) != sources:
+        logger.info('Featuremedia of item %s changed while generating renditions, skipping', item_id)
         return
 
-    # generate thumbnails
-    binary = app.media.get(rendition['media'], resource=ASSETS_RESOURCE)
-    im = Image.open(binary)
-    thumbnail = get_thumbnail(im)  # 4-3 rendition resized
-    watermark = get_watermark(im)  # 4-3 rendition with watermark
-    picture['renditions'].update({
-        '_newsroom_thumbnail': store_image(thumbnail,
-                                           _id='%s%s' % (rendition['media'], '_newsroom_thumbnail')),
-        '_newsroom_thumbnail_large': store_image(watermark,
-                                                 _id='%s%s' % (rendition['media'], '_newsroom_thumbnail_large')),
-    })
-    app.generate_preview_details_renditions(picture)
+    picture['renditions'].update(generated['renditions'])
+    service.system_update(item['_id'], {'associations': item['associations']}, item)
+    invalidate_home_cards_with_items([item['_id']])
 
 
 def init_app(app):
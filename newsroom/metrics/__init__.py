@@ -0,0 +1,5 @@
+import flask
+
+blueprint = flask.Blueprint('metrics', __name__)
+
+from . import views  # noqa
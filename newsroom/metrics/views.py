@@ -0,0 +1,34 @@
+import flask
+
+from flask import current_app as app
+
+from newsroom.decorator import admin_only
+from newsroom.media_utils import get_rendition_stats
+from newsroom.metrics import blueprint
+from newsroom.push import get_push_stats
+from newsroom.resource_cache import get_cache_stats
+from newsroom.search import get_permission_filter_stats, get_aggregations_cache_stats
+from newsroom.search_metrics import get_search_stats
+from newsroom.wire.home_cache import get_home_cache_stats
+
+
+def get_extension_stats(name):
+    extension = app.extensions.get(name)
+    return extension.stats() if extension is not None else None
+
+
+@blueprint.route('/metrics', methods=['GET'])
+@admin_only
+def index():
+    """Get metrics collected by this process."""
+    return flask.jsonify({
+        'search': get_search_stats(),
+        'permission_filters': get_permission_filter_stats(),
+        'aggregations_cache': get_aggregations_cache_stats(),
+        'resource_cache': get_cache_stats(),
+        'home_cards': get_home_cache_stats(),
+        'push': get_push_stats(),
+        'renditions': get_rendition_stats(),
+        'notifications': get_extension_stats('notification_coalescer'),
+        'write_buffer': get_extension_stats('write_buffer'),
+    }), 200
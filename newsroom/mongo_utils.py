@@ -1,11 +1,16 @@
 
+import math
 import time
 import pymongo
+import threading
 import superdesk
+import elasticsearch
+import multiprocessing
 from bson import ObjectId
 from datetime import timedelta, datetime
 
 from flask import current_app as app
+from eve_elastic import get_es
 from superdesk.errors import BulkIndexError
 from superdesk import config
 from superdesk.utc import utcnow
@@ -13,6 +18,22 @@ from superdesk.utc import utcnow
 
 default_page_size = 500
 
+#: bounds for adaptive batch size used by parallel reindex
+min_batch_size = 50
+max_batch_size = 5000
+
+#: bulk request time the batch size is adjusted to
+target_bulk_seconds = 2.0
+
+#: number of slices per worker, so slow slices don't hold up the whole run
+slices_per_worker = 4
+
+#: max number of retries for a rejected or failed bulk request
+max_bulk_retries = 8
+
+#: seconds between progress reports
+progress_interval = 10
+
 
 def index_elastic_from_mongo(hours=None, collection=None, start_id=None):
     print('Starting indexing from mongodb for "{}" collection hours={}'.format(collection, hours))
@@ -200,3 +221,327 @@ def _get_mongo_items_from_timestamp(collection, timestamp, direction):
         ]
 
         yield items
+
+
+class AdaptiveBatchSize():
+    """Bulk batch size adjusted based on bulk response time.
+
+    It is halved when a bulk request is rejected or takes more than twice the target time
+    and it grows while bulk requests are faster than half of the target time.
+    """
+
+    def __init__(self, size=default_page_size, min_size=min_batch_size, max_size=max_batch_size,
+                 target=target_bulk_seconds):
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target = target
+
+    def update(self, elapsed, rejected=False):
+        """Adjust batch size based on last bulk request.
+
+        :param elapsed: bulk request time in seconds
+        :param rejected: set if any docs were rejected by elastic
+        :return: new batch size
+        """
+        if rejected or elapsed > self.target * 2:
+            self.size = max(self.min_size, self.size // 2)
+        elif elapsed < self.target / 2:
+            self.size = min(self.max_size, int(math.ceil(self.size * 1.25)))
+        return self.size
+
+
+def index_elastic_from_mongo_parallel(hours=None, collection=None, start_id=None, workers=1, resume=False):
+    """Index collections from mongo using worker processes, each indexing a range of ``_id`` values.
+
+    Progress is stored in ``reindex_checkpoints`` collection after every bulk request,
+    so an interrupted run can continue using ``resume``.
+
+    :param hours: only index items updated in last hours
+    :param collection: collection to index, all elastic collections if not set
+    :param start_id: only index items with ``_id`` greater than this
+    :param workers: number of worker processes
+    :param resume: continue previous run using stored checkpoints
+    """
+    workers = max(1, int(workers or 1))
+    print('Starting parallel indexing from mongodb for "{}" collection hours={} workers={} resume={}'.format(
+        collection, hours, workers, resume))
+
+    resources = app.data.get_elastic_resources()
+    if collection:
+        if collection not in resources:
+            raise SystemExit('Cannot find collection: {}'.format(collection))
+        resources = [collection]
+
+    for resource in resources:
+        checkpoints = get_checkpoints_collection(resource)
+        if resume and checkpoints.count_documents({'resource': resource}):
+            print('Resuming indexing collection {}'.format(resource))
+        else:
+            print('Starting indexing collection {}'.format(resource))
+            since = utcnow() - timedelta(hours=float(hours)) if hours else None
+            create_checkpoints(resource, since, start_id, workers * slices_per_worker)
+
+        slices = [
+            (resource, checkpoint['_id'])
+            for checkpoint in checkpoints.find({'resource': resource, 'done': False}, sort=[('slice', 1)])
+        ]
+
+        progress = ReindexProgress(resource)
+        pool = multiprocessing.Pool(min(workers, len(slices)), initializer=_init_worker) \
+            if workers > 1 and len(slices) > 1 else None
+        progress.start()
+        try:
+            if pool is not None:
+                for _count in pool.imap_unordered(_index_slice, slices):
+                    pass
+                pool.close()
+            else:
+                for resource_slice in slices:
+                    _index_slice(resource_slice)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            progress.stop()
+
+        checkpoints.delete_many({'resource': resource})
+        print('Finished indexing collection {}'.format(resource))
+
+
+def get_checkpoints_collection(resource):
+    return app.data.mongo.pymongo(resource).db.reindex_checkpoints
+
+
+def create_checkpoints(resource, since, start_id, slices):
+    """Split collection into ranges of ``_id`` values and store a checkpoint for each.
+
+    Boundaries are sampled using sorted ``_id`` index, so slices have similar size.
+
+    :param resource: resource name
+    :param since: only index items updated since this time
+    :param start_id: only index items with ``_id`` greater than this
+    :param slices: max number of slices
+    :return: list of checkpoints
+    """
+    db = app.data.get_mongo_collection(resource)
+    mongo_filter = _get_mongo_filter(since, start_id)
+    total = db.count_documents(mongo_filter)
+    slices = max(1, min(slices, int(math.ceil(total / default_page_size))))
+    step = int(math.ceil(total / slices)) if total else 0
+
+    boundaries = [None]
+    for i in range(1, slices):
+        docs = list(db.find(mongo_filter, {config.ID_FIELD: 1}).sort(config.ID_FIELD, pymongo.ASCENDING)
+                    .skip(i * step).limit(1))
+        if docs and docs[0][config.ID_FIELD] != boundaries[-1]:
+            boundaries.append(docs[0][config.ID_FIELD])
+    boundaries.append(None)
+
+    now = utcnow()
+    checkpoints = [{
+        '_id': '{}:{}'.format(resource, i),
+        'resource': resource,
+        'slice': i,
+        'since': since,
+        'start_id': start_id,
+        'total': total,
+        'start': boundaries[i],
+        'end': boundaries[i + 1],
+        'last_id': None,
+        'indexed': 0,
+        'done': False,
+        'updated': now,
+    } for i in range(len(boundaries) - 1)]
+
+    collection = get_checkpoints_collection(resource)
+    collection.delete_many({'resource': resource})
+    collection.insert_many(checkpoints)
+    print('Indexing {} items from {} in {} slices'.format(total, resource, len(checkpoints)))
+    return checkpoints
+
+
+class ReindexProgress():
+    """Prints reindex throughput and ETA based on checkpoints, periodically in a background thread.
+
+    :param resource: resource name
+    """
+
+    def __init__(self, resource):
+        self.app = app._get_current_object()
+        self.resource = resource
+        self.stopped = threading.Event()
+        self.thread = None
+        self.started = None
+        self.indexed_before = 0
+
+    def get_indexed(self):
+        """Get number of indexed items and total number of items to index."""
+        indexed = 0
+        total = 0
+        for checkpoint in get_checkpoints_collection(self.resource).find({'resource': self.resource}):
+            indexed += checkpoint.get('indexed') or 0
+            total = checkpoint.get('total') or 0
+        return indexed, total
+
+    def start(self):
+        self.started = time.time()
+        self.indexed_before, _total = self.get_indexed()
+        self.thread = threading.Thread(target=self._run, name='reindex-progress', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.report()
+
+    def report(self):
+        indexed, total = self.get_indexed()
+        elapsed = time.time() - self.started
+        rate = (indexed - self.indexed_before) / elapsed if elapsed else 0
+        eta = timedelta(seconds=int((total - indexed) / rate)) if rate and total > indexed else timedelta(0)
+        print('{} Indexed {}/{} items from {} ({:.1f}%), {:.0f} items/s, eta {}'.format(
+            time.strftime('%X %x %Z'),
+            indexed,
+            total,
+            self.resource,
+            100.0 * indexed / total if total else 100.0,
+            rate,
+            eta,
+        ))
+
+    def _run(self):
+        with self.app.app_context():
+            while not self.stopped.wait(progress_interval):
+                self.report()
+
+
+def _init_worker():
+    # mongo clients inherited from parent process are not fork safe, drop them
+    # so the data layer creates new ones on first use
+    superdesk.app.extensions['pymongo'] = {}
+    superdesk.app.data.mongo.driver.clear()
+
+    # elastic clients inherited from parent process share connections, so create new ones
+    superdesk.app.data.elastic.elastics = {}
+    superdesk.app.data.elastic.es = get_es(superdesk.app.config['ELASTICSEARCH_URL'],
+                                           **superdesk.app.data.elastic.kwargs)
+
+
+def _index_slice(resource_slice):
+    """Index items in given slice, continuing from its last checkpoint.
+
+    :param resource_slice: tuple of resource name and checkpoint id
+    :return: number of indexed items
+    """
+    resource, checkpoint_id = resource_slice
+    with superdesk.app.app_context():
+        checkpoints = get_checkpoints_collection(resource)
+        checkpoint = checkpoints.find_one({'_id': checkpoint_id})
+        if not checkpoint or checkpoint.get('done'):
+            return 0
+
+        indexed = 0
+        batch_size = AdaptiveBatchSize()
+        items = []
+        for item in _get_mongo_slice_items(resource, checkpoint):
+            items.append(item)
+            if len(items) >= batch_size.size:
+                indexed += _index_items(resource, checkpoint_id, items, batch_size)
+                items = []
+
+        if items:
+            indexed += _index_items(resource, checkpoint_id, items, batch_size)
+
+        checkpoints.update_one({'_id': checkpoint_id}, {'$set': {'done': True, 'updated': utcnow()}})
+        return indexed
+
+
+def _get_mongo_slice_items(resource, checkpoint):
+    """Generate items in ``_id`` range of given checkpoint.
+
+    Range is set via index bounds, so it works with ``_id`` values of mixed types.
+
+    :param resource: resource name
+    :param checkpoint: slice checkpoint
+    """
+    db = app.data.get_mongo_collection(resource)
+    mongo_filter = _get_mongo_filter(checkpoint.get('since'), checkpoint.get('start_id'))
+    cursor = db.find(mongo_filter).sort(config.ID_FIELD, pymongo.ASCENDING).hint([(config.ID_FIELD, 1)])
+    start = checkpoint['last_id'] if checkpoint.get('last_id') is not None else checkpoint.get('start')
+    if start is not None:
+        cursor = cursor.min([(config.ID_FIELD, start)])
+    if checkpoint.get('end') is not None:
+        cursor = cursor.max([(config.ID_FIELD, checkpoint['end'])])
+
+    for item in cursor:
+        if checkpoint.get('last_id') is not None and item[config.ID_FIELD] == checkpoint['last_id']:
+            continue
+        yield item
+
+
+def _index_items(resource, checkpoint_id, items, batch_size):
+    """Index items using bulk request, retrying rejected items, and store checkpoint.
+
+    :param resource: resource name
+    :param checkpoint_id: slice checkpoint id
+    :param items: list of items to index
+    :param batch_size: adaptive batch size, updated based on bulk response
+    :return: number of indexed items
+    """
+    pending = items
+    retries = 0
+    while pending:
+        start = time.time()
+        try:
+            # copy items as bulk helper pops metadata fields from docs
+            _success, errors = app.data._search_backend(resource).bulk_insert(
+                resource,
+                [dict(item) for item in pending],
+                chunk_size=len(pending),
+                raise_on_error=False,
+            )
+        except elasticsearch.TransportError as ex:
+            errors = None
+            error = ex
+        else:
+            error = None
+
+        rejected_ids = set()
+        if errors:
+            failed = []
+            for item_error in errors:
+                info = next(iter(item_error.values()), {})
+                if info.get('status') == 429:
+                    rejected_ids.add(str(info.get('_id')))
+                else:
+                    failed.append(item_error)
+            if failed:
+                print('Failed to do bulk insert of items {}. Errors: {}'.format(len(failed), failed))
+                raise BulkIndexError(resource=resource, errors=failed)
+
+        batch_size.update(time.time() - start, rejected=error is not None or bool(rejected_ids))
+        if error is None:
+            pending = [item for item in pending if str(item[config.ID_FIELD]) in rejected_ids]
+        if pending:
+            retries += 1
+            if retries > max_bulk_retries:
+                raise BulkIndexError(resource=resource, errors=[str(error)] if error else list(rejected_ids))
+            print('Bulk insert of {} items rejected, retrying with batch size {}'.format(len(pending), batch_size.size))
+            time.sleep(min(2 ** retries, 60))
+
+    get_checkpoints_collection(resource).update_one({'_id': checkpoint_id}, {
+        '$set': {'last_id': items[-1][config.ID_FIELD], 'updated': utcnow()},
+        '$inc': {'indexed': len(items)},
+    })
+    return len(items)
+
+
+def _get_mongo_filter(since=None, start_id=None):
+    mongo_filter = {}
+    if since:
+        mongo_filter['versioncreated'] = {'$gte': since}
+    if start_id:
+        mongo_filter[config.ID_FIELD] = {'$gt': ObjectId(start_id)}
+    return mongo_filter
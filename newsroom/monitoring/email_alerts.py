@@ -35,6 +35,8 @@ logger = logging.getLogger(__name__)
 
 class MonitoringEmailAlerts(Command):
     def run(self, immediate=False):
+        from newsroom.email import email_batch
+
         self.log_msg = 'Monitoring Scheduled Alerts: {}'.format(utcnow())
         logger.info('{} Starting to send alerts.'.format(self.log_msg))
 
@@ -50,10 +52,11 @@ class MonitoringEmailAlerts(Command):
 
             now_to_minute = now_local.replace(second=0, microsecond=0)
 
-            if immediate:
-                self.immediate_worker(now_to_minute)
-            else:
-                self.scheduled_worker(now_to_minute)
+            with email_batch():
+                if immediate:
+                    self.immediate_worker(now_to_minute)
+                else:
+                    self.scheduled_worker(now_to_minute)
         except Exception as e:
             logger.exception(e)
 
@@ -1,7 +1,8 @@
+import copy
 import newsroom
-import superdesk
 
 from newsroom.products.products import get_products_by_company
+from newsroom.resource_cache import CachedResourceService, get_cached_docs
 
 
 class NavigationsResource(newsroom.Resource):
@@ -46,7 +47,7 @@ class NavigationsResource(newsroom.Resource):
     resource_methods = ['GET', 'POST']
 
 
-class NavigationsService(newsroom.Service):
+class NavigationsService(CachedResourceService):
     pass
 
 
@@ -70,5 +71,6 @@ def get_navigations_by_ids(navigation_ids):
     if not navigation_ids:
         return []
 
-    return list(superdesk.get_resource_service('navigations')
-                .get(req=None, lookup={'_id': {'$in': navigation_ids}, 'is_enabled': True}))
+    ids = {str(_id) for _id in navigation_ids}
+    return copy.deepcopy([navigation for navigation in get_cached_docs('navigations')
+                          if str(navigation['_id']) in ids])
@@ -1,14 +1,12 @@
 import superdesk
 from flask import Blueprint
-from flask_babel import gettext
 from .resource import NewsApiTokensResource
 from .service import NewsApiTokensService
+from .rate_limit import check_rate_limit
 from eve.auth import TokenAuth
 import ipaddress
-from flask import g, current_app as app, abort, request
+from flask import g, current_app as app, request
 from superdesk.utc import utcnow
-from superdesk import get_resource_service
-from datetime import timedelta
 
 API_TOKENS = 'news_api_tokens'
 
@@ -51,29 +49,7 @@ class CompanyTokenAuth(TokenAuth):
             if not valid_network:
                 return False
 
-        # Check rate_limit
-        updates = {}
-        new_period = False
-        if app.config.get('RATE_LIMIT_REQUESTS'):
-            new_period = (not token.get('rate_limit_expiry') or token['rate_limit_expiry'] <= now)
-            if new_period:
-                updates['rate_limit_requests'] = 1
-            elif token.get('rate_limit_expiry'):
-                if token.get('rate_limit_requests', 0) >= app.config.get('RATE_LIMIT_REQUESTS'):
-                    abort(429, gettext('Rate limit exceeded'))
-                else:
-                    updates['rate_limit_requests'] = token.get('rate_limit_requests', 0) + 1
-
-        if app.config.get('RATE_LIMIT_PERIOD') and new_period:
-            updates['rate_limit_expiry'] = now + timedelta(seconds=app.config.get('RATE_LIMIT_PERIOD'))
-
-        if updates:
-            get_resource_service(API_TOKENS).patch(token_id, updates)
-
-            # Set Flask global variables
-            g.rate_limit_requests = updates['rate_limit_requests']
-            if (updates.get('rate_limit_expiry')):
-                g.rate_limit_expiry = updates['rate_limit_expiry']
+        check_rate_limit(token)
 
         g.user = str(token.get('company'))
         return g.user
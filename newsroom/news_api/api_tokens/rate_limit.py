@@ -0,0 +1,201 @@
+"""
+News API rate limiting
+----------------------
+
+Requests are limited per company using ``RATE_LIMIT_REQUESTS`` per ``RATE_LIMIT_PERIOD`` seconds.
+
+Backend is configured via ``RATE_LIMIT_BACKEND``:
+
+- ``redis`` - sliding window log stored in redis, checked atomically via lua script,
+  when redis fails the ``mongo`` backend is used for the request
+- ``memory`` - sliding window log stored in process memory, for tests and single process setups
+- ``mongo`` - fixed window counter stored on the token, updated on every request, it's the default
+
+With ``redis`` and ``memory`` backends the usage is only written to the token
+periodically, every ``RATE_LIMIT_SNAPSHOT_INTERVAL`` seconds.
+"""
+
+import time
+import uuid
+import logging
+import threading
+import collections
+
+import redis
+
+from datetime import timedelta
+from flask import g, current_app as app, abort
+from flask_babel import gettext
+from superdesk import get_resource_service
+from superdesk.utc import utcnow
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERIOD = 3600
+
+#: result of rate limit check, ``reset`` is number of seconds until next request is allowed
+RateLimit = collections.namedtuple('RateLimit', ['allowed', 'limit', 'remaining', 'reset'])
+
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    count = count + 1
+    allowed = 1
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {allowed, count, tonumber(oldest[2]) + window - now}
+"""
+
+
+class RedisBackend():
+    """Sliding window log in redis sorted set, all the work is done via single lua script call."""
+
+    def __init__(self, client):
+        self.client = client
+        self.script = client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def hit(self, key, limit, period):
+        window = int(period * 1000)
+        allowed, count, reset = self.script(
+            keys=['news_api:rate_limit:{}'.format(key)],
+            args=[int(time.time() * 1000), window, limit, uuid.uuid4().hex],
+        )
+        return RateLimit(bool(allowed), limit, max(limit - count, 0), _seconds(reset))
+
+    def should_snapshot(self, key, interval):
+        return bool(self.client.set('news_api:rate_limit_snapshot:{}'.format(key), 1, nx=True, ex=interval))
+
+
+class MemoryBackend():
+    """Sliding window log in process memory."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = collections.defaultdict(collections.deque)
+        self.snapshots = {}
+
+    def hit(self, key, limit, period):
+        now = time.time()
+        with self.lock:
+            hits = self.hits[key]
+            while hits and hits[0] <= now - period:
+                hits.popleft()
+            allowed = len(hits) < limit
+            if allowed:
+                hits.append(now)
+            return RateLimit(allowed, limit, max(limit - len(hits), 0), _seconds((hits[0] + period - now) * 1000))
+
+    def should_snapshot(self, key, interval):
+        now = time.time()
+        with self.lock:
+            if self.snapshots.get(key, 0) > now:
+                return False
+            self.snapshots[key] = now + interval
+            return True
+
+
+def _seconds(milliseconds):
+    return max(int(-(-milliseconds // 1000)), 0)
+
+
+def get_backend():
+    backend_name = app.config.get('RATE_LIMIT_BACKEND')
+    if backend_name == 'mongo':
+        return None
+
+    if 'rate_limit_backend' not in app.extensions:
+        if backend_name == 'redis':
+            client = getattr(app, 'redis', None) or redis.from_url(app.config['REDIS_URL'])
+            app.extensions['rate_limit_backend'] = RedisBackend(client)
+        else:
+            app.extensions['rate_limit_backend'] = MemoryBackend()
+    return app.extensions['rate_limit_backend']
+
+
+def check_rate_limit(token):
+    """Check and count the request for given token, abort with 429 if rate limit is exceeded.
+
+    Result is stored in ``g.rate_limit`` for response headers.
+
+    :param token: api token document
+    """
+    if not app.config.get('RATE_LIMIT_REQUESTS'):
+        return
+
+    backend = get_backend()
+    if backend is None:
+        g.rate_limit = check_mongo_rate_limit(token)
+    else:
+        key = str(token.get('company'))
+        period = app.config.get('RATE_LIMIT_PERIOD') or DEFAULT_PERIOD
+        try:
+            g.rate_limit = backend.hit(key, app.config['RATE_LIMIT_REQUESTS'], period)
+            snapshot = g.rate_limit.allowed and \
+                backend.should_snapshot(key, app.config.get('RATE_LIMIT_SNAPSHOT_INTERVAL', 60))
+        except redis.RedisError as exc:
+            logger.error('Rate limit check failed for company %s, using mongo: %s', key, exc)
+            g.rate_limit = check_mongo_rate_limit(token)
+            snapshot = False
+
+        if snapshot:
+            save_usage_snapshot(token, g.rate_limit)
+
+    if not g.rate_limit.allowed:
+        abort(429, gettext('Rate limit exceeded'))
+
+
+def check_mongo_rate_limit(token):
+    """Fixed window rate limit counted on the token document.
+
+    :param token: api token document
+    """
+    now = utcnow()
+    limit = app.config['RATE_LIMIT_REQUESTS']
+    updates = {}
+    new_period = (not token.get('rate_limit_expiry') or token['rate_limit_expiry'] <= now)
+    if new_period:
+        updates['rate_limit_requests'] = 1
+        if app.config.get('RATE_LIMIT_PERIOD'):
+            updates['rate_limit_expiry'] = now + timedelta(seconds=app.config.get('RATE_LIMIT_PERIOD'))
+    elif token.get('rate_limit_requests', 0) >= limit:
+        return RateLimit(False, limit, 0, _seconds((token['rate_limit_expiry'] - now).total_seconds() * 1000))
+    else:
+        updates['rate_limit_requests'] = token.get('rate_limit_requests', 0) + 1
+
+    get_resource_service('news_api_tokens').patch(token['_id'], updates)
+    expiry = updates.get('rate_limit_expiry', token.get('rate_limit_expiry'))
+    reset = _seconds((expiry - now).total_seconds() * 1000) if expiry else None
+    return RateLimit(True, limit, max(limit - updates['rate_limit_requests'], 0), reset)
+
+
+def save_usage_snapshot(token, rate_limit):
+    """Store current usage on the token, so it's visible without access to the rate limit backend.
+
+    :param token: api token document
+    :param rate_limit: current rate limit state
+    """
+    get_resource_service('news_api_tokens').patch(token['_id'], {
+        'rate_limit_requests': rate_limit.limit - rate_limit.remaining,
+        'rate_limit_expiry': utcnow() + timedelta(seconds=rate_limit.reset),
+    })
+
+
+def set_rate_limit_headers(response):
+    """Add ``X-RateLimit-*`` and ``Retry-After`` headers based on rate limit check for current request."""
+    rate_limit = g.get('rate_limit')
+    if rate_limit:
+        response.headers.add('X-RateLimit-Limit', rate_limit.limit)
+        response.headers.add('X-RateLimit-Remaining', rate_limit.remaining)
+        if rate_limit.reset is not None:
+            response.headers.add('X-RateLimit-Reset', rate_limit.reset)
+            if not rate_limit.allowed:
+                response.headers.add('Retry-After', rate_limit.reset)
+    return response
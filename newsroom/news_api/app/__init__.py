@@ -8,7 +8,7 @@ from superdesk.errors import SuperdeskApiError
 
 from newsroom.factory import NewsroomApp
 from newsroom.news_api.api_tokens import CompanyTokenAuth
-from superdesk.utc import utcnow
+from newsroom.news_api.api_tokens.rate_limit import set_rate_limit_headers
 from newsroom.template_filters import (
     datetime_short, datetime_long, time_short, date_short,
     plain_text, word_count, char_count, date_header
@@ -42,6 +42,8 @@ class NewsroomNewsAPI(NewsroomApp):
             jinja2.FileSystemLoader(template_folder),
         ])
 
+        self.after_request(set_rate_limit_headers)
+
     def load_app_config(self):
         super(NewsroomNewsAPI, self).load_app_config()
         self.config.from_object('newsroom.news_api.settings')
@@ -103,17 +105,6 @@ class NewsroomNewsAPI(NewsroomApp):
 def get_app(config=None):
     app = NewsroomNewsAPI(__name__, config=config)
 
-    @app.after_request
-    def after_request(response):
-        if flask.g.get('rate_limit_requests'):
-            response.headers.add('X-RateLimit-Remaining',
-                                 app.config.get('RATE_LIMIT_REQUESTS') - flask.g.get('rate_limit_requests'))
-            response.headers.add('X-RateLimit-Limit', app.config.get('RATE_LIMIT_REQUESTS'))
-
-            if flask.g.get('rate_limit_expiry'):
-                response.headers.add('X-RateLimit-Reset', (flask.g.get('rate_limit_expiry') - utcnow()).seconds)
-        return response
-
     return app
 
 
@@ -53,7 +53,7 @@ class NewsAPINewsService(BaseSearchService):
 
     # set of fields that will be removed from all responses, we are not currently supporting associations and
     # the products embedded in the items are the superdesk products
-    mandatory_exclude_fields = {'_current_version', 'products'}
+    mandatory_exclude_fields = {'_current_version', 'products', 'fingerprint'}
 
     section = 'news_api'
     limit_days_setting = 'news_api_time_limit_days'
@@ -6,7 +6,8 @@ from lxml.etree import SubElement
 from superdesk.utc import utcnow
 from flask import current_app as app, g, Response, url_for
 import logging
-from newsroom.news_api.utils import check_featuremedia_association_permission, update_embed_urls
+from newsroom.news_api.utils import check_featuremedia_association_permission, update_embed_urls, \
+    get_permitted_sd_products
 from newsroom.wire.formatters.utils import remove_unpermissioned_embeds
 from datetime import timedelta
 from email import utils
@@ -80,6 +81,21 @@ class NewsAPISyndicateService(NewsAPINewsService):
     def _format_date_publish(date):
         return utils.format_datetime(date)
 
+    @staticmethod
+    def get_complete_items(response):
+        """Fetch complete items for the search response using a single query.
+
+        :param response: search response
+        :return: dict of items by ``_id``
+        """
+        ids = [item.get('_id') for item in response['_items']]
+        if not ids:
+            return {}
+
+        # same lookup as used by ``find_one`` of the items service
+        lookup = {'_id': {'$in': ids}, 'subscribers': g.get('user')}
+        return {item['_id']: item for item in get_resource_service('items').find(lookup)}
+
     @staticmethod
     def generate_atom_feed(response, token=None):
         XML_ROOT = '<?xml version="1.0" encoding="UTF-8"?>'
@@ -99,16 +115,17 @@ class NewsAPISyndicateService(NewsAPINewsService):
         SubElement(feed, 'id').text = feed_url
         SubElement(feed, 'link',
                    attrib={'href': feed_url, 'rel': 'self'})
-        item_resource = get_resource_service('items')
+        complete_items = __class__.get_complete_items(response)
+        sd_products = get_permitted_sd_products(g.user)
         image = None
         for item in response['_items']:
             try:
-                complete_item = item_resource.find_one(req=None, _id=item.get('_id'))
+                complete_item = complete_items.get(item.get('_id'))
                 # If featuremedia is not allowed for the company don't add the item
                 if ((complete_item.get('associations') or {}).get('featuremedia') or {}).get('renditions'):
-                    if not check_featuremedia_association_permission(complete_item):
+                    if not check_featuremedia_association_permission(complete_item, sd_products):
                         continue
-                remove_unpermissioned_embeds(complete_item, g.user, 'news_api')
+                remove_unpermissioned_embeds(complete_item, g.user, 'news_api', sd_products)
                 entry = SubElement(feed, 'entry')
                 # If the item has any parents we use the id of the first, this should be constant throught the update
                 # history
@@ -215,16 +232,17 @@ class NewsAPISyndicateService(NewsAPINewsService):
                            _external=True,
                            formatter='rss')
         SubElement(channel, 'link').text = feed_url
-        item_resource = get_resource_service('items')
+        complete_items = __class__.get_complete_items(response)
+        sd_products = get_permitted_sd_products(g.user)
         image = None
         for item in response['_items']:
             try:
-                complete_item = item_resource.find_one(req=None, _id=item.get('_id'))
+                complete_item = complete_items.get(item.get('_id'))
 
                 if ((complete_item.get('associations') or {}).get('featuremedia') or {}).get('renditions'):
-                    if not check_featuremedia_association_permission(complete_item):
+                    if not check_featuremedia_association_permission(complete_item, sd_products):
                         continue
-                remove_unpermissioned_embeds(complete_item, g.user, 'news_api')
+                remove_unpermissioned_embeds(complete_item, g.user, 'news_api', sd_products)
 
                 entry = SubElement(channel, 'item')
                 if complete_item.get('ancestors') and len(complete_item.get('ancestors')):
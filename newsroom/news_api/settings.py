@@ -22,7 +22,8 @@ CORE_APPS = [
     'newsroom.news_api.api_audit',
     'newsroom.news_api.news.assets.assets',
     'newsroom.upload',
-    'newsroom.history'
+    'newsroom.history',
+    'newsroom.search_metrics',
 ]
 
 INSTALLED_APPS = []
@@ -46,3 +47,10 @@ CONTENTAPI_ELASTICSEARCH_INDEX = env('CONTENTAPI_ELASTICSEARCH_INDEX', CONTENTAP
 
 FILTER_AGGREGATIONS = False
 ELASTIC_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+#: rate limit backend, one of ``redis``, ``memory`` or ``mongo`` (counting on the token document),
+#: ``mongo`` is also used when ``redis`` is not available
+RATE_LIMIT_BACKEND = env('RATE_LIMIT_BACKEND', 'mongo')
+
+#: number of seconds between rate limit usage snapshots written to api tokens (``redis`` and ``memory`` backends)
+RATE_LIMIT_SNAPSHOT_INTERVAL = int(env('RATE_LIMIT_SNAPSHOT_INTERVAL', 60))
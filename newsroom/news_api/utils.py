@@ -1,8 +1,8 @@
-from superdesk import get_resource_service
 from superdesk.utc import utcnow
 from flask import request, g, current_app as app, url_for
 from newsroom.products.products import get_products_by_company
 from newsroom.utils import update_embeds_in_body
+from newsroom.write_buffer import buffered_write
 
 
 def post_api_audit(doc):
@@ -18,7 +18,7 @@ def post_api_audit(doc):
     if 'user' in g:
         audit_doc['subscriber'] = g.user
 
-    get_resource_service('api_audit').post([audit_doc])
+    buffered_write('api_audit', [audit_doc])
 
 
 def format_report_results(search_result, unique_endpoints, companies):
@@ -37,11 +37,23 @@ def format_report_results(search_result, unique_endpoints, companies):
     return results
 
 
-def check_featuremedia_association_permission(item):
+def get_permitted_sd_products(company_id, section='news_api'):
+    """
+    Get the list of superdesk product ids the company is permissioned for
+    :param company_id:
+    :param section:
+    :return:
+    """
+    return [p.get('sd_product_id') for p in get_products_by_company(company_id, None, section) if
+            p.get('sd_product_id')]
+
+
+def check_featuremedia_association_permission(item, sd_products=None):
     """
     Check if any of the products that the passed image item matches are permissioned superdesk products for the
      company
     :param item:
+    :param sd_products: permitted superdesk product ids, fetched for the company if not provided
     :return:
     """
     if not app.config.get('NEWS_API_IMAGE_PERMISSIONS_ENABLED'):
@@ -54,8 +66,8 @@ def check_featuremedia_association_permission(item):
 
         # Check if the one of the companies products that has a superdesk product id matches one of the
         # image product id's
-        sd_products = [p.get('sd_product_id') for p in get_products_by_company(g.user, None, 'news_api') if
-                       p.get('sd_product_id')]
+        if sd_products is None:
+            sd_products = get_permitted_sd_products(g.user)
 
         return True if len(set(im_products) & set(sd_products)) else False
     else:
@@ -1,9 +1,10 @@
 import flask
 import superdesk
 
-from superdesk.notification import push_notification  # noqa
 from newsroom.auth import get_user_id
 
+from .coalescer import push_notification, get_coalescer  # noqa
+
 blueprint = flask.Blueprint('notifications', __name__)
 
 
@@ -11,7 +12,9 @@ def push_user_notification(name, **kwargs):
     push_notification(':'.join(map(str, [name, get_user_id()])), **kwargs)
 
 
-from .notifications import NotificationsResource, NotificationsService, get_user_notifications  # noqa
+from .notifications import NotificationsResource, NotificationsService, get_user_notifications, \
+    save_user_notifications  # noqa
+from . import views  # noqa
 
 
 def init_app(app):
@@ -0,0 +1,217 @@
+"""
+Notification coalescing
+-----------------------
+
+Websocket notifications sent while ingesting content come in bursts, every pushed item
+triggers ``new_item`` and possibly ``topic_matches`` or ``history_matches`` events.
+Instead of sending each of these right away they are buffered per channel for
+``NOTIFICATION_COALESCE_WINDOW`` milliseconds and merged into a single event:
+
+- ``new_item`` events are merged into one event per item type with all the ``_items``
+- ``items_deleted`` events are merged into one event with all the ``ids``
+- ``topic_matches``, ``history_matches`` and ``agenda_update`` events for the same item
+  are merged into one event with the latest item and all the ``topics``/``users``
+
+Merged events carry ``item_ids`` with ids of all the items merged into the event
+and ``max_rate`` with max number of events per second sent for single channel,
+so clients know how often to expect updates.
+
+Other events, like user channel events triggered by user actions, and all events
+with ``NOTIFICATION_COALESCE_WINDOW`` set to ``0`` are sent right away.
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+import collections
+
+from flask import current_app as app
+from superdesk.notification import push_notification as send_notification
+
+logger = logging.getLogger(__name__)
+
+
+def _get_item_id(extra):
+    return (extra.get('item') or {}).get('_id')
+
+
+def _get_items_type(extra):
+    return tuple(sorted(set(str(item.get('type')) for item in extra.get('_items') or [])))
+
+
+#: events which are coalesced, with function returning channel key for event data
+#: and names of list fields merged for events on the same channel,
+#: other fields are replaced by values from the latest event
+COALESCED_EVENTS = {
+    'new_item': (_get_items_type, ('_items', )),
+    'items_deleted': (None, ('ids', )),
+    'topic_matches': (_get_item_id, ('topics', )),
+    'history_matches': (lambda extra: (_get_item_id(extra), extra.get('section')), ('users', )),
+    'agenda_update': (_get_item_id, ('users', )),
+}
+
+
+def _get_value_key(value):
+    return str(value['_id']) if isinstance(value, dict) and '_id' in value else str(value)
+
+
+def merge_values(values, updates):
+    """Merge list of values with updates, keeping the order and replacing values with the same id.
+
+    :param values: current values
+    :param updates: new values
+    """
+    merged = collections.OrderedDict((_get_value_key(value), value) for value in values or [])
+    for value in updates or []:
+        merged[_get_value_key(value)] = value
+    return list(merged.values())
+
+
+def get_item_ids(extra):
+    """Get ids of items referenced by event data.
+
+    :param extra: event data
+    """
+    ids = [item['_id'] for item in extra.get('_items') or [] if item.get('_id')]
+    ids.extend(extra.get('ids') or [])
+    if _get_item_id(extra):
+        ids.append(_get_item_id(extra))
+    return sorted(set(str(_id) for _id in ids))
+
+
+class NotificationCoalescer():
+    """Buffer of websocket notifications merged per channel and sent by a background thread.
+
+    :param app: flask app used for app context when sending
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.window = app.config.get('NOTIFICATION_COALESCE_WINDOW', 500) / 1000.0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.events = collections.OrderedDict()
+        self.events_in = 0
+        self.events_out = 0
+        self.failed = 0
+        self.thread = None
+        self.pid = None
+        self.stopped = False
+
+    @property
+    def max_rate(self):
+        """Max number of events per second sent for single channel."""
+        return round(1 / self.window, 3) if self.window else None
+
+    def add(self, name, **extra):
+        """Add event to the buffer, merging it with buffered event for the same channel.
+
+        :param name: event name
+        :param extra: event data
+        """
+        with self.lock:
+            self.events_in += 1
+            key = self._get_key(name, extra)
+            if key is None:
+                self.events_out += 1
+            else:
+                self._start()
+                self._merge(key, name, extra)
+                self.wakeup.set()
+                return
+
+        self._send(name, extra)
+
+    def flush(self):
+        """Send all buffered events."""
+        with self.lock:
+            events = list(self.events.values())
+            self.events.clear()
+            self.events_out += len(events)
+
+        if events:
+            with self.app.app_context():
+                for name, extra in events:
+                    extra['item_ids'] = get_item_ids(extra)
+                    extra['max_rate'] = self.max_rate
+                    self._send(name, extra)
+
+    def stop(self, timeout=10):
+        """Stop the background thread and send the remaining events."""
+        self.stopped = True
+        self.wakeup.set()
+        if self.thread is not None and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        return {
+            'buffered': len(self.events),
+            'events_in': self.events_in,
+            'events_out': self.events_out,
+            'failed': self.failed,
+        }
+
+    def _get_key(self, name, extra):
+        if not self.window or name not in COALESCED_EVENTS:
+            return None
+        get_key, _fields = COALESCED_EVENTS[name]
+        return (name, get_key(extra) if get_key else None)
+
+    def _merge(self, key, name, extra):
+        if key not in self.events:
+            self.events[key] = (name, dict(extra))
+            return
+        buffered = self.events[key][1]
+        _get_key, fields = COALESCED_EVENTS[name]
+        for field in fields:
+            extra[field] = merge_values(buffered.get(field), extra.get(field))
+        buffered.update(extra)
+
+    def _send(self, name, extra):
+        try:
+            send_notification(name, **extra)
+        except Exception:
+            self.failed += 1
+            logger.exception('Failed to send %s notification', name)
+
+    def _start(self):
+        # thread is not inherited by forked worker processes, so check it's running in this process
+        if self.pid == os.getpid() and self.thread is not None and self.thread.is_alive():
+            return
+        self.pid = os.getpid()
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name='notification-coalescer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            if not self.stopped:
+                # collect events for the rest of the window, so each channel gets at most one event per window
+                time.sleep(self.window)
+                self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush notifications')
+
+
+def get_coalescer():
+    if 'notification_coalescer' not in app.extensions:
+        coalescer = NotificationCoalescer(app._get_current_object())
+        atexit.register(coalescer.stop)
+        app.extensions['notification_coalescer'] = coalescer
+    return app.extensions['notification_coalescer']
+
+
+def push_notification(name, **kwargs):
+    """Send websocket notification, coalesced with other events on the same channel.
+
+    :param name: event name
+    :param kwargs: event data
+    """
+    get_coalescer().add(name, **kwargs)
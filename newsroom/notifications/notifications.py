@@ -2,14 +2,17 @@
 import datetime
 import newsroom
 import superdesk
-import pymongo.errors
-import werkzeug.exceptions
+import pymongo
 from html import escape
 
 from bson import ObjectId
+from superdesk import config
 from superdesk.utc import utcnow
 from flask import current_app as app, session
 
+#: item fields stored in notification summaries
+SUMMARY_FIELDS = ('type', 'headline', 'name', 'slugline', 'versioncreated')
+
 
 class NotificationsResource(newsroom.Resource):
     url = 'users/<regex("[a-f0-9]{24}"):user>/notifications'
@@ -21,6 +24,7 @@ class NotificationsResource(newsroom.Resource):
         '_id': {'type': 'string', 'unique': True},
         'item': newsroom.Resource.rel('items'),
         'user': newsroom.Resource.rel('users'),
+        'action': {'type': 'string', 'nullable': True},
         'created': {'type': 'dict', 'nullable': True},
     }
 
@@ -35,39 +39,155 @@ class NotificationsResource(newsroom.Resource):
 
 class NotificationsService(newsroom.Service):
     def create(self, docs):
-        now = utcnow()
+        return save_user_notifications([(doc['user'], doc['item'], doc.get('action')) for doc in docs])
+
+    def delete_action(self, lookup=None):
+        users = app.data.get_mongo_collection('notifications').distinct('user', lookup or {})
+        deleted = super().delete_action(lookup)
+        update_notification_summaries(users)
+        return deleted
+
+
+def get_notification_id(user, item):
+    return '_'.join(map(str, [user, item]))
+
+
+def save_user_notifications(notifications):
+    """Store notifications using single unordered bulk write.
+
+    Existing notification for the same user and item is updated, so it's shown as new.
+
+    :param notifications: list of ``(user, item, action)`` tuples
+    :return: list of notification ids
+    """
+    if not notifications:
+        return []
 
-        for doc in docs:
-            id = '_'.join(map(str, [doc['user'], doc['item']]))
-            try:
-                super().create([{
-                    '_id': id,
-                    'created': now, 'user': ObjectId(doc['user']), 'item': doc['item']
-                }])
-            except (werkzeug.exceptions.Conflict, pymongo.errors.BulkWriteError):
-                original = super().find_one(req=None, _id=id)
-                super().update(id=id, updates={'created': now}, original=original)
+    now = utcnow()
+    requests = {}
+    for user, item, action in notifications:
+        _id = get_notification_id(user, item)
+        requests[_id] = pymongo.UpdateOne({config.ID_FIELD: _id}, {
+            '$set': {'created': now, 'action': action, config.LAST_UPDATED: now},
+            '$setOnInsert': {'user': ObjectId(user), 'item': item, config.DATE_CREATED: now},
+        }, upsert=True)
+
+    app.data.get_mongo_collection('notifications').bulk_write(list(requests.values()), ordered=False)
+    update_notification_summaries([user for user, _item, _action in notifications])
+    return list(requests.keys())
 
 
 def get_user_notifications(user_id):
-    ttl = app.config.get('NOTIFICATIONS_TTL', 1)
     lookup = {
         'user': user_id,
-        'created': {'$gte': utcnow() - datetime.timedelta(days=ttl)}
+        'created': {'$gte': get_ttl_start()}
     }
 
     return list(superdesk.get_resource_service('notifications').get(req=None, lookup=lookup))
 
 
+def get_ttl_start():
+    return utcnow() - datetime.timedelta(days=app.config.get('NOTIFICATIONS_TTL', 1))
+
+
+def get_summaries_collection():
+    return app.data.pymongo('items').db.notification_summaries
+
+
+def get_summary_entries(item_ids):
+    """Get fields of wire and agenda items needed to display the notifications.
+
+    :param item_ids: list of item ids
+    :return: dict of entries per item id
+    """
+    entries = {}
+    for resource in ('items', 'agenda'):
+        if not item_ids or resource not in app.config['DOMAIN']:
+            continue
+        cursor = app.data.get_mongo_collection(resource).find({'_id': {'$in': item_ids}}, list(SUMMARY_FIELDS))
+        entries.update((entry['_id'], entry) for entry in cursor)
+    return entries
+
+
+def update_notification_summaries(users):
+    """Store the number of notifications and the latest notifications of given users.
+
+    Page renders read only the summary, see :func:`get_initial_notifications`.
+
+    :param users: list of user ids
+    :return: dict of summaries per user id
+    """
+    users = list(set(ObjectId(user) for user in users))
+    if not users:
+        return {}
+
+    ttl = datetime.timedelta(days=app.config.get('NOTIFICATIONS_TTL', 1))
+    size = app.config.get('NOTIFICATIONS_SUMMARY_SIZE', 10)
+    groups = {group['_id']: group for group in app.data.get_mongo_collection('notifications').aggregate([
+        {'$match': {'user': {'$in': users}, 'created': {'$gte': get_ttl_start()}}},
+        {'$sort': {'created': -1}},
+        {'$group': {'_id': '$user', 'count': {'$sum': 1}, 'items': {'$push': '$item'}, 'oldest': {'$min': '$created'}}},
+    ])}
+
+    entries = get_summary_entries(list(set(item for group in groups.values() for item in group['items'][:size])))
+    now = utcnow()
+    summaries = {}
+    for user in users:
+        group = groups.get(user) or {'count': 0, 'items': []}
+        summaries[user] = {
+            'count': group['count'],
+            'items': [entries[item] for item in group['items'][:size] if item in entries],
+            'expires': group['oldest'] + ttl if group.get('oldest') else None,
+            config.LAST_UPDATED: now,
+        }
+
+    get_summaries_collection().bulk_write([
+        pymongo.UpdateOne({config.ID_FIELD: user}, {'$set': summary}, upsert=True)
+        for user, summary in summaries.items()
+    ], ordered=False)
+    return summaries
+
+
+def get_notification_summary(user_id):
+    """Get the number of notifications and the latest notifications of given user.
+
+    Summary is updated when the oldest notification counted in it expires.
+
+    :param user_id: user id
+    """
+    user_id = ObjectId(user_id)
+    summary = get_summaries_collection().find_one({
+        config.ID_FIELD: user_id,
+        '$or': [{'expires': None}, {'expires': {'$gt': utcnow()}}],
+    })
+    if summary is None:
+        summary = update_notification_summaries([user_id])[user_id]
+    return summary
+
+
 def get_initial_notifications():
     """
-    Returns the stories that user has notifications for
-    :return: List of stories
+    Returns the number of notifications and the latest notified stories,
+    all stories are loaded via :func:`get_notification_items` when needed
+    :return: dict with count and list of stories
     """
     if not session.get('user'):
         return None
 
-    saved_notifications = get_user_notifications(session['user'])
+    summary = get_notification_summary(session['user'])
+    return {
+        'user': str(session['user']),
+        'count': summary['count'],
+        'notifications': summary['items'],
+    }
+
+
+def get_notification_items(user_id):
+    """
+    Returns the stories that user has notifications for
+    :return: List of stories
+    """
+    saved_notifications = get_user_notifications(user_id)
     item_ids = [n['item'] for n in saved_notifications]
     items = []
     try:
@@ -80,7 +200,4 @@ def get_initial_notifications():
         items.extend(superdesk.get_resource_service('agenda').get_items(item_ids))
     except KeyError:  # agenda disabled
         pass
-    return {
-        'user': str(session['user']) if session['user'] else None,
-        'notifications': list(items),
-    }
+    return list(items)
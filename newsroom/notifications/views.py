@@ -0,0 +1,18 @@
+import flask
+
+from newsroom.auth import get_user_id
+from newsroom.decorator import login_required
+from newsroom.notifications import blueprint
+from newsroom.notifications.notifications import get_notification_items
+
+
+@blueprint.route('/notifications', methods=['GET'])
+@login_required
+def get_notifications():
+    """Get all stories current user has notifications for, used once the user opens notifications."""
+    items = get_notification_items(get_user_id())
+    return flask.jsonify({
+        'user': str(get_user_id()),
+        'count': len(items),
+        'notifications': items,
+    }), 200
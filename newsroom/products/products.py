@@ -1,7 +1,10 @@
+import copy
+
 from bson import ObjectId
 
 import newsroom
-import superdesk
+
+from newsroom.resource_cache import CachedResourceService, get_cached_docs
 
 
 class ProductsResource(newsroom.Resource):
@@ -55,41 +58,40 @@ class ProductsResource(newsroom.Resource):
     internal_resource = True
 
 
-class ProductsService(newsroom.Service):
+class ProductsService(CachedResourceService):
     pass
 
 
-def _get_navigation_query(ids):
-    return {'$in': [str(oid) for oid in ids]} \
+def _get_navigation_ids(ids):
+    return [str(oid) for oid in ids] \
         if type(ids) is list \
-        else str(ids)
-
+        else [str(ids)]
 
-def get_products_by_navigation(navigation_id, product_type=None):
-    lookup = {
-        'is_enabled': True,
-        'navigations': _get_navigation_query(navigation_id)
-    }
 
-    if product_type is not None:
-        lookup['product_type'] = product_type
+def _contains(values, value):
+    """Test if the list field contains given value, or equals to it for non list values."""
+    if isinstance(values, list):
+        return value in values
+    return values == value
 
-    return list(superdesk.get_resource_service('products').get(req=None, lookup=lookup))
 
+def _filter_products(company_id=None, navigation_id=None, product_type=None, product_id=None):
+    navigation_ids = _get_navigation_ids(navigation_id) if navigation_id is not None else None
+    return copy.deepcopy([
+        product for product in get_cached_docs('products')
+        if (company_id is None or _contains(product.get('companies'), str(company_id))) and
+        (navigation_ids is None or any(_contains(product.get('navigations'), _id) for _id in navigation_ids)) and
+        (not product_type or product.get('product_type') == product_type) and
+        (product_id is None or product.get('_id') == product_id)
+    ])
 
-def get_product_by_id(product_id, product_type=None, company_id=None):
-    lookup = {
-        '_id': ObjectId(product_id),
-        'is_enabled': True
-    }
 
-    if company_id is not None:
-        lookup['companies'] = str(company_id)
+def get_products_by_navigation(navigation_id, product_type=None):
+    return _filter_products(navigation_id=navigation_id, product_type=product_type)
 
-    if product_type is not None:
-        lookup['product_type'] = product_type
 
-    return list(superdesk.get_resource_service('products').get(req=None, lookup=lookup))
+def get_product_by_id(product_id, product_type=None, company_id=None):
+    return _filter_products(product_id=ObjectId(product_id), company_id=company_id, product_type=product_type)
 
 
 def get_products_by_company(company_id, navigation_id=None, product_type=None):
@@ -99,16 +101,9 @@ def get_products_by_company(company_id, navigation_id=None, product_type=None):
     :param navigation_id: Navigation Id
     :param product_type: Type of the product
     """
-    lookup = {'is_enabled': True, 'companies': str(company_id)}
-    if navigation_id:
-        lookup['navigations'] = _get_navigation_query(navigation_id)
-    if product_type:
-        lookup['product_type'] = product_type
-
-    products = list(superdesk.get_resource_service('products').get(req=None, lookup=lookup))
-    return products
+    return _filter_products(company_id=str(company_id), navigation_id=navigation_id or None,
+                            product_type=product_type)
 
 
 def get_products_dict_by_company(company_id):
-    lookup = {'is_enabled': True, 'companies': str(company_id)}
-    return list(superdesk.get_resource_service('products').get(req=None, lookup=lookup))
+    return _filter_products(company_id=str(company_id))
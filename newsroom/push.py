@@ -1,24 +1,31 @@
 import hmac
+import time
+import hashlib
 import flask
 import logging
 import superdesk
 from datetime import datetime
 
-from copy import copy, deepcopy
+from copy import copy
 from flask import current_app as app
 from flask_babel import gettext
+from celery.exceptions import SoftTimeLimitExceeded
 from superdesk.text_utils import get_word_count, get_char_count
 
 from superdesk.utc import utcnow
-from newsroom.notifications import push_notification
+from superdesk.timer import timer
+from newsroom.celery_app import celery
+from newsroom.notifications import push_notification, save_user_notifications
 from newsroom.topics.topics import get_wire_notification_topics, get_agenda_notification_topics
-from newsroom.utils import parse_dates, get_user_dict, get_company_dict, parse_date_str
-from newsroom.email import send_new_item_notification_email, \
+from newsroom.utils import parse_dates, get_user_dict, get_company_dict, get_users_by_ids, parse_date_str
+from newsroom.email import email_batch, email_render_cache, send_new_item_notification_email, \
     send_history_match_notification_email, send_item_killed_notification_email
-from newsroom.history import get_history_users
-from newsroom.wire.views import HOME_ITEMS_CACHE_KEY
+from newsroom.history import get_history_audience
+from newsroom.wire.home_cache import invalidate_home_cards
+from newsroom.search import invalidate_aggregations
 from newsroom.wire import url_for_wire
 from newsroom.upload import ASSETS_RESOURCE
+from newsroom.media_utils import schedule_renditions
 from newsroom.signals import publish_item as publish_item_signal
 from newsroom.agenda.utils import get_latest_available_delivery, TO_BE_CONFIRMED_FIELD
 
@@ -28,6 +35,17 @@ logger = logging.getLogger(__name__)
 blueprint = flask.Blueprint('push', __name__)
 
 KEY = 'PUSH_KEY'
+PUSH_TYPES = ('event', 'planning', 'text', 'planning_featured')
+
+#: types of pushed items which are not published again if the content didn't change
+FINGERPRINT_TYPES = ('event', 'planning', 'text')
+
+#: fields of wire items updated with every push even if the content didn't change,
+#: these are excluded from fingerprint via ``PUSH_FINGERPRINT_IGNORED_FIELDS``
+BOOKKEEPING_FIELDS = ('version', '_current_version', 'versioncreated', 'version_creator')
+
+#: number of published and skipped pushes per item type in this process
+push_stats = {}
 
 
 def test_signature(request):
@@ -66,30 +84,243 @@ def push():
     assert 'guid' in item or '_id' in item, {'guid': 1}
     assert 'type' in item, {'type': 1}
 
+    if item['type'] not in PUSH_TYPES:
+        flask.abort(400, gettext('Unknown type {}'.format(item.get('type'))))
+
+    if app.config.get('PUSH_ASYNC'):
+        # only acknowledge the push here, the item is processed by the ingest workers
+        ingest_pushed_item.apply_async(kwargs={
+            'payload': flask.request.get_data(as_text=True),
+            'enqueued': time.time(),
+        })
+        return flask.jsonify({}), 202
+
+    process_push_item(item)
+    return flask.jsonify({})
+
+
+def process_push_item(item):
+    """Publish pushed item and notify users synchronously."""
+    published = publish_pushed_item(item)
+    if published is False:
+        # content didn't change, there is nothing to refresh
+        return
+    invalidate_aggregations()
+    if published:
+        resource, _id, check_topics = published
+        if resource == 'items':
+            invalidate_home_cards(item)
+        notify_new_item(item if resource == 'items' else get_pushed_item(resource, _id), check_topics=check_topics)
+
+
+def publish_pushed_item(item):
+    """Store pushed item.
+
+    Items which content didn't change since the previous push are not published again,
+    see :func:`get_fingerprint`.
+
+    :param item: pushed item
+    :return: tuple of (resource, _id, check_topics) for the item to notify about, ``None``
+        if there is nothing to notify about or ``False`` if the item didn't change
+    """
+    if item.get('type') in FINGERPRINT_TYPES:
+        item['fingerprint'] = get_fingerprint(item)
+
+    start = time.perf_counter()
+    published = _publish_pushed_item(item)
+    stats = push_stats.setdefault(item['type'], {'published': 0, 'skipped': 0, 'publish_ms': 0})
+    if published is False:
+        stats['skipped'] += 1
+    else:
+        stats['published'] += 1
+        stats['publish_ms'] += (time.perf_counter() - start) * 1000
+    return published
+
+
+def _publish_pushed_item(item):
     if item.get('type') == 'event':
         orig = app.data.find_one('agenda', req=None, guid=item['guid'])
-        id = publish_event(item, orig)
-        agenda = app.data.find_one('agenda', req=None, _id=id)
-        if agenda:
-            superdesk.get_resource_service('agenda').enhance_items([agenda])
-        notify_new_item(agenda, check_topics=True)
+        if is_unchanged(item, (orig or {}).get('event')):
+            return False
+        return 'agenda', publish_event(item, orig), True
     elif item.get('type') == 'planning':
+        if is_unchanged(item, get_published_planning(item)):
+            return False
         published = publish_planning(item)
-        agenda = app.data.find_one('agenda', req=None, _id=published['_id'])
-        if agenda:
-            superdesk.get_resource_service('agenda').enhance_items([agenda])
-        notify_new_item(agenda, check_topics=True)
+        return 'agenda', published['_id'], True
     elif item.get('type') == 'text':
         orig = superdesk.get_resource_service('items').find_one(req=None, _id=item['guid'])
+        if is_unchanged(item, orig):
+            update_bookkeeping_fields(item, orig)
+            return False
         item['_id'] = publish_item(item, orig)
-        notify_new_item(item, check_topics=orig is None)
+        return 'items', item['_id'], orig is None
     elif item['type'] == 'planning_featured':
         publish_planning_featured(item)
-    else:
-        flask.abort(400, gettext('Unknown type {}'.format(item.get('type'))))
 
-    app.cache.delete(HOME_ITEMS_CACHE_KEY)
-    return flask.jsonify({})
+
+def get_fingerprint(item):
+    """Get hash of pushed item content visible to subscribers.
+
+    Fields listed in ``PUSH_FINGERPRINT_IGNORED_FIELDS`` are not part of the hash.
+
+    :param item: pushed item
+    """
+    ignored = set(app.config.get('PUSH_FINGERPRINT_IGNORED_FIELDS') or [])
+    ignored.add('fingerprint')
+    content = {key: value for key, value in item.items() if key not in ignored}
+    return hashlib.sha1(flask.json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def is_unchanged(item, published):
+    """Test if pushed item has the same fingerprint as the published version.
+
+    :param item: pushed item
+    :param published: published version of the item
+    """
+    return bool(
+        app.config.get('PUSH_FINGERPRINT_ENABLED') and
+        published and
+        published.get('fingerprint') == item.get('fingerprint')
+    )
+
+
+def get_published_planning(planning):
+    """Get planning item stored in agenda for given pushed planning."""
+    ids = [_id for _id in [planning.get('event_item'), planning['guid']] if _id]
+    for agenda in superdesk.get_resource_service('agenda').find(where={'_id': {'$in': ids}}):
+        for plan in agenda.get('planning_items') or []:
+            if plan.get('guid') == planning['guid']:
+                return plan
+
+
+def update_bookkeeping_fields(item, orig):
+    """Update fields which change with every push for item which content didn't change."""
+    parse_dates(item)
+    updates = {field: item[field] for field in BOOKKEEPING_FIELDS if field in item and item[field] != orig.get(field)}
+    if updates:
+        superdesk.get_resource_service('items').system_update(orig['_id'], updates, orig)
+
+
+def get_push_stats():
+    """Get number of published and skipped pushes per item type, with estimated time saved by skipping."""
+    stats = {}
+    for item_type, counts in push_stats.items():
+        avg_ms = counts['publish_ms'] / counts['published'] if counts['published'] else 0
+        stats[item_type] = {
+            'published': counts['published'],
+            'skipped': counts['skipped'],
+            'avg_publish_ms': round(avg_ms, 3),
+            'saved_ms': round(avg_ms * counts['skipped'], 3),
+        }
+    return stats
+
+
+def get_pushed_item(resource, _id):
+    if resource == 'agenda':
+        agenda = app.data.find_one('agenda', req=None, _id=_id)
+        if agenda:
+            superdesk.get_resource_service('agenda').enhance_items([agenda])
+        return agenda
+    return superdesk.get_resource_service('items').find_one(req=None, _id=_id)
+
+
+def get_push_idempotency_key(item):
+    """Get the key identifying single pushed payload.
+
+    It contains hash of the whole payload, so items without version (like ``planning_featured``)
+    or pushed again with the same version but different content are not skipped.
+    """
+    content_hash = hashlib.sha1(flask.json.dumps(item, sort_keys=True).encode('utf-8')).hexdigest()
+    return 'push:{}:{}:{}:{}'.format(
+        item['type'], item.get('guid', item.get('_id')), get_pushed_version(item), content_hash)
+
+
+def get_pushed_version(doc):
+    """Get version of pushed or stored item as int, ``None`` if it's not set."""
+    if not doc:
+        return None
+    try:
+        return int(doc.get('version', doc.get(app.config['VERSION'])))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_stored_version(item):
+    """Get version of the published copy of pushed item."""
+    if item['type'] == 'text':
+        return get_pushed_version(superdesk.get_resource_service('items').find_one(req=None, _id=item['guid']))
+    elif item['type'] == 'event':
+        return get_pushed_version((app.data.find_one('agenda', req=None, guid=item['guid']) or {}).get('event'))
+    elif item['type'] == 'planning':
+        return get_pushed_version(get_published_planning(item))
+    return None
+
+
+def is_stale_push(item):
+    """Test if pushed item is older than the published one.
+
+    Async pushes can be processed out of order by multiple workers or after a retry,
+    so an older version must not overwrite the newer one.
+    """
+    version = get_pushed_version(item)
+    if version is None:
+        return False
+    stored_version = get_stored_version(item)
+    return stored_version is not None and version < stored_version
+
+
+@celery.task(bind=True, soft_time_limit=300, max_retries=3, default_retry_delay=10)
+def ingest_pushed_item(self, payload, enqueued=None):
+    """Store item pushed via async ``/push`` and schedule the notifications.
+
+    Each payload is only processed once, so it's safe to retry the task or to receive
+    the same push multiple times. Versions older than the published one are skipped.
+    """
+    item = flask.json.loads(payload)
+    key = get_push_idempotency_key(item)
+    if enqueued:
+        logger.info('push %s waited in queue for %.3fs', key, time.time() - enqueued)
+
+    if app.cache.get(key):
+        logger.info('push %s was already processed, skipping', key)
+        return
+
+    try:
+        if is_stale_push(item):
+            logger.warning('push %s is older than the published version, skipping', key)
+            return
+        with timer('{} publish'.format(key)):
+            published = publish_pushed_item(item)
+    except SoftTimeLimitExceeded:
+        raise
+    except Exception as exc:
+        logger.exception('push %s failed', key)
+        raise self.retry(exc=exc)
+
+    app.cache.set(key, 1, timeout=app.config.get('PUSH_IDEMPOTENCY_TIMEOUT', 3600))
+    if published is False:
+        # content didn't change, there is nothing to refresh
+        return
+
+    invalidate_aggregations()
+    if published:
+        resource, _id, check_topics = published
+        if resource == 'items':
+            invalidate_home_cards(item)
+        notify_pushed_item.apply_async(kwargs={
+            'resource': resource,
+            '_id': str(_id),
+            'check_topics': check_topics,
+            'key': key,
+        })
+
+
+@celery.task(soft_time_limit=600)
+def notify_pushed_item(resource, _id, check_topics=True, key=None):
+    """Notification fan-out stage of the async push."""
+    with timer('{} notify'.format(key or _id)):
+        notify_new_item(get_pushed_item(resource, str(_id)), check_topics=check_topics)
 
 
 def set_dates(doc):
@@ -126,8 +357,9 @@ def publish_item(doc, original):
     for assoc in doc.get('associations', {}).values():
         if assoc:
             assoc.setdefault('subscribers', [])
+    pending_renditions = None
     if doc.get('associations', {}).get('featuremedia'):
-        app.generate_renditions(doc)
+        pending_renditions = app.generate_renditions(doc)
 
     # If there is a function defined that generates renditions for embedded images call it.
     if app.generate_embed_renditions:
@@ -146,6 +378,8 @@ def publish_item(doc, original):
     _id = service.create([doc])[0]
     if 'associations' not in doc and original is not None and bool(original.get('associations', {})):
         service.patch(_id, updates={'associations': None})
+    if pending_renditions:
+        schedule_renditions(_id, pending_renditions)
     if 'evolvedfrom' in doc and parent_item:
         service.system_update(parent_item['_id'], {'nextversion': _id}, parent_item)
     return _id
@@ -257,7 +491,7 @@ def publish_planning(planning):
         if orig_agendas.count() > 0:
             orig_agenda = orig_agendas[0]
 
-        agenda = deepcopy(orig_agenda)
+        agenda = copy_agenda(orig_agenda)
         if not agenda:
             # event id exists in planning item but event is not in the system
             logger.warning('Event {} for planning {} couldn\'t be found'.format(planning['event_item'], planning))
@@ -270,13 +504,13 @@ def publish_planning(planning):
                 # remove the planning item from the list
                 set_agenda_planning_items(agenda, orig_agenda, planning, action='remove')
 
-                service.patch(agenda['_id'], agenda)
+                service.patch(agenda['_id'], get_agenda_updates(agenda, orig_agenda))
                 return agenda
 
     else:
         # there's no event item (ad-hoc planning item)
         orig_agenda = app.data.find_one('agenda', req=None, _id=planning['guid']) or {}
-        agenda = deepcopy(orig_agenda)
+        agenda = copy_agenda(orig_agenda)
         init_adhoc_agenda(planning, agenda)
 
     # update agenda metadata
@@ -291,11 +525,35 @@ def publish_planning(planning):
         agenda.setdefault('guid', planning.get('event_item', planning['guid']) or planning['guid'])
         service.post([agenda])[0]
     else:
-        # replace the original document
-        service.patch(agenda['_id'], agenda)
+        # update only the fields which changed
+        service.patch(agenda['_id'], get_agenda_updates(agenda, orig_agenda))
     return agenda
 
 
+def copy_agenda(agenda):
+    """Copy agenda for planning updates without copying the whole document.
+
+    Planning updates only set top level agenda fields and planning item fields,
+    so copying these keeps the original agenda untouched.
+
+    :param agenda: original agenda
+    """
+    if not agenda:
+        return {} if agenda is not None else None
+    updated = agenda.copy()
+    updated['planning_items'] = [plan.copy() for plan in agenda.get('planning_items') or []]
+    return updated
+
+
+def get_agenda_updates(agenda, orig_agenda):
+    """Get agenda fields which differ from the original agenda.
+
+    :param agenda: updated agenda
+    :param orig_agenda: original agenda
+    """
+    return {key: value for key, value in agenda.items() if key not in orig_agenda or orig_agenda[key] != value}
+
+
 def init_adhoc_agenda(planning, agenda):
     """
     Inits an adhoc agenda item
@@ -409,6 +667,8 @@ def set_agenda_metadata_from_planning(agenda, planning_item):
     plan['products'] = planning_item.get('products')
     plan['agendas'] = planning_item.get('agendas')
     plan[TO_BE_CONFIRMED_FIELD] = planning_item.get(TO_BE_CONFIRMED_FIELD)
+    plan['fingerprint'] = planning_item.get('fingerprint')
+    plan['version'] = planning_item.get('version')
 
     if new_plan:
         agenda['planning_items'].append(plan)
@@ -471,8 +731,9 @@ def get_coverages(planning_items, original_coverages, new_plan):
     Returns list of coverages for given planning items
     """
 
-    def get_existing_coverage(id):
-        return next((o for o in original_coverages if o['coverage_id'] == id), {})
+    existing_coverages = {}
+    for original_coverage in original_coverages:
+        existing_coverages.setdefault(original_coverage['coverage_id'], original_coverage)
 
     def set_delivery(coverage, deliveries, orig_coverage=None):
         cov_deliveries = []
@@ -521,10 +782,11 @@ def get_coverages(planning_items, original_coverages, new_plan):
 
     coverages = []
     coverage_changes = {}
+    completed_coverages = []
     for planning_item in planning_items:
         if planning_item.get('state') != WORKFLOW_STATE.KILLED:
             for coverage in planning_item.get('coverages') or []:
-                existing_coverage = get_existing_coverage(coverage['coverage_id'])
+                existing_coverage = existing_coverages.get(coverage['coverage_id']) or {}
                 coverage_planning = coverage.get('planning') or {}
 
                 new_coverage = {
@@ -554,7 +816,7 @@ def get_coverages(planning_items, original_coverages, new_plan):
 
                         if new_coverage.get('workflow_status') == 'completed':
                             coverage_changes['coverage_modified'] = True
-                            set_item_reference(new_coverage)
+                            completed_coverages.append(new_coverage)
 
                     if existing_coverage.get('scheduled') != new_coverage.get('scheduled') and \
                             existing_coverage.get('workflow_status') != 'completed':
@@ -563,19 +825,41 @@ def get_coverages(planning_items, original_coverages, new_plan):
     if len(original_coverages or []) > len(coverages):
         coverage_changes['coverage_cancelled'] = True
 
+    set_items_reference(completed_coverages)
+
     return coverages, coverage_changes
 
 
-def set_item_reference(coverage):
+def set_items_reference(coverages):
+    """
+    Set the reference to agenda item and coverage for items delivered for the passed coverages.
+    Items are fetched using a single query.
+    :param coverages: list of completed coverages
+    :return:
+    """
+    item_ids = [coverage['delivery_id'] for coverage in coverages if coverage.get('delivery_id') is not None]
+    if not item_ids:
+        return
+    items = superdesk.get_resource_service('items').find({'_id': {'$in': item_ids}})
+    items_by_id = {item['_id']: item for item in items}
+    for coverage in coverages:
+        item = items_by_id.get(coverage.get('delivery_id'))
+        if item:
+            set_item_reference(coverage, item)
+
+
+def set_item_reference(coverage, item=None):
     """
     Check if the delivery in the passed coverage refers back to the agenda item and coverage.
     If the item is fulfilled after the item is published it will not have this reference
     :param coverage:
+    :param item: delivered item if already fetched
     :return:
     """
     if coverage.get('delivery_id') is None:
         return
-    item = superdesk.get_resource_service('items').find_one(req=None, _id=coverage.get('delivery_id'))
+    if item is None:
+        item = superdesk.get_resource_service('items').find_one(req=None, _id=coverage.get('delivery_id'))
     if item:
         if 'planning_id' not in item and 'coverage_id' not in item:
             service = superdesk.get_resource_service('content_api')
@@ -590,75 +874,78 @@ def notify_new_item(item, check_topics=True):
     if not item or item.get('type') == 'composite':
         return
 
-    user_dict = get_user_dict()
-    user_ids = [u['_id'] for u in user_dict.values()]
+    push_notification('new_item', _items=[item])
 
-    company_dict = get_company_dict()
-    company_ids = [c['_id'] for c in company_dict.values()]
+    with email_batch(), email_render_cache():
+        if check_topics:
+            user_dict = get_user_dict()
+            company_dict = get_company_dict()
+            if item.get('type') == 'text':
+                notify_wire_topic_matches(item, user_dict, company_dict)
+            else:
+                notify_agenda_topic_matches(item, user_dict)
 
-    push_notification('new_item', _items=[item])
+        notify_user_matches(item)
 
-    if check_topics:
-        if item.get('type') == 'text':
-            notify_wire_topic_matches(item, user_dict, company_dict)
-        else:
-            notify_agenda_topic_matches(item, user_dict)
 
-    notify_user_matches(item, user_dict, company_dict, user_ids, company_ids)
+def get_notified_sections():
+    """Get ids of sections in order users are notified about their item matches.
 
+    Wire takes precedence over all other sections, in case items appear in multiple sections.
+    """
+    return ['wire'] + [
+        section['_id']
+        for section in app.sections
+        if section['_id'] != 'wire' and section['group'] not in ['api', 'monitoring']
+    ]
 
-def notify_user_matches(item, users_dict, companies_dict, user_ids, company_ids):
-    """Send notification to users who have downloaded or bookmarked the provided item"""
 
-    related_items = item.get('ancestors', [])
-    related_items.append(item['_id'])
-    is_text = item.get('type') == 'text'
+def get_item_audience(item, sections):
+    """Get ids of users who have downloaded or bookmarked any version of the item per section.
 
-    users_processed = []
+    Downloads are resolved using single history aggregation and bookmarks using single search
+    for all the sections.
 
-    def _get_users(section):
-        """Get the list of users who have downloaded or bookmarked the items"""
-        # Get users who have downloaded any of the items
-        user_list = get_history_users(
+    :param item: item
+    :param sections: list of section ids
+    :return: dict with set of user ids per section
+    """
+    related_items = list(item.get('ancestors') or [])
+    related_items.append(item['_id'])
+    audience = get_history_audience(related_items, 'download')
+
+    if item.get('type') == 'text':
+        bookmarks = superdesk.get_resource_service('wire_search').get_bookmarks_audience(
             related_items,
-            user_ids,
-            company_ids,
-            section,
-            'download'
+            [section for section in sections if section != 'agenda']
         )
+        for section, users in bookmarks.items():
+            audience.setdefault(section, set()).update(users)
 
-        if is_text and section != 'agenda':
-            # Add users who have bookmarked any of the items
-            service = superdesk.get_resource_service('{}_search'.format(section))
-            bookmarked_users = service.get_matching_bookmarks(
-                related_items,
-                users_dict,
-                companies_dict
-            )
-
-            user_list.extend(bookmarked_users)
+    return audience
 
-        # Add users if this section is wire
-        # Or if the user is not already in the list of users for wire
-        user_list = [
-            user_id
-            for user_id in user_list
-            if user_id not in users_processed
-        ]
 
-        users_processed.extend(user_list)
+def notify_user_matches(item):
+    """Send notification to users who have downloaded or bookmarked the provided item
 
-        # Remove duplicates and return the list
-        return list(set(user_list))
-
-    def _send_notification(section, users_ids):
+    Only the users found via :func:`get_item_audience` are loaded, each of them
+    is notified once for the first section where the item matches.
+    """
+    sections = get_notified_sections()
+    audience = get_item_audience(item, sections)
+    users_dict = get_users_by_ids(list(set().union(*audience.values())))
+
+    users_processed = set()
+    for section in sections:
+        users_ids = sorted(
+            user_id for user_id in audience.get(section) or []
+            if user_id in users_dict and user_id not in users_processed
+        )
+        users_processed.update(users_ids)
         if not users_ids:
-            return
+            continue
 
-        app.data.insert('notifications', [
-            {'item': item['_id'], 'user': user}
-            for user in users_ids
-        ])
+        save_user_notifications([(user, item['_id'], 'history_matches') for user in users_ids])
 
         push_notification(
             'history_matches',
@@ -673,20 +960,6 @@ def notify_user_matches(item, users_dict, companies_dict, user_ids, company_ids)
             section
         )
 
-    # First add users for the 'wire' section and send the notification
-    # As this takes precedence over all other sections
-    # (in case items appear in multiple sections)
-    _send_notification('wire', _get_users('wire'))
-
-    # Next iterate over the registered sections (excluding wire and api)
-    for section_id in [
-        section['_id']
-        for section in app.sections
-        if section['_id'] != 'wire' and section['group'] not in ['api', 'monitoring']
-    ]:
-        # Add the users for those sections and send the notification
-        _send_notification(section_id, _get_users(section_id))
-
 
 def send_user_notification_emails(item, user_matches, users, section):
     for user_id in user_matches:
@@ -699,7 +972,7 @@ def send_user_notification_emails(item, user_matches, users, section):
 
 
 def notify_wire_topic_matches(item, users_dict, companies_dict):
-    topics = get_wire_notification_topics()
+    topics = get_wire_notification_topics(item['_id'])
 
     topic_matches = superdesk.get_resource_service('wire_search'). \
         get_matching_topics(item['_id'], topics, users_dict, companies_dict)
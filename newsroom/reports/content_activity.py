@@ -9,6 +9,7 @@ from superdesk.utc import utc_to_local
 from newsroom.wire.search import items_query
 from newsroom.agenda.agenda import get_date_filters
 from newsroom.utils import query_resource
+from newsroom.search import iter_search
 
 
 CHUNK_SIZE = 100
@@ -27,7 +28,6 @@ def get_items(args):
     source = {
         'query': items_query(True),
         'size': CHUNK_SIZE,
-        'from': 0,
         'sort': [{'versioncreated': 'asc'}],
         '_source': ['headline', 'place', 'subject', 'service', 'versioncreated', 'anpa_take_key']
     }
@@ -55,16 +55,8 @@ def get_items(args):
         section
     )
 
-    while True:
-        results = get_resource_service('{}_search'.format(section)).search(source)
-        items = list(results)
-
-        if not len(items):
-            break
-
-        source['from'] += CHUNK_SIZE
-
-        yield items
+    for results in iter_search('{}_search'.format(section), source, CHUNK_SIZE):
+        yield results.docs
 
 
 def get_aggregations(args, ids):
@@ -182,12 +182,18 @@ def get_subscriber_activity_report():
     source['from'] = int(args.get('from', 0))
     source['aggs'] = aggregations
 
-    if source['from'] >= 1000:
+    # Get the results
+    history_service = superdesk.get_resource_service('history')
+    if args.get('export'):
+        results = history_service.fetch_history(source, True)
+    elif args.get('cursor') or not source['from']:
+        results = history_service.fetch_history_page(source, args.get('cursor'))
+    elif source['from'] >= 1000:
         # https://www.elastic.co/guide/en/elasticsearch/guide/current/pagination.html#pagination
         return abort(400)
+    else:
+        results = history_service.fetch_history(source)
 
-    # Get the results
-    results = superdesk.get_resource_service('history').fetch_history(source, args.get('export'))
     docs = results['items']
     hits = results['hits']
 
@@ -253,7 +259,8 @@ def get_subscriber_activity_report():
         results = {
             'results': docs,
             'name': gettext('SubscriberActivity'),
-            'aggregations': hits.get('aggregations')
+            'aggregations': hits.get('aggregations'),
+            'cursor': results.get('cursor'),
         }
         return results
     else:
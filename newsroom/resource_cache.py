@@ -0,0 +1,147 @@
+"""
+Resource cache
+--------------
+
+Products, navigations and section filters are small and rarely changing,
+but they are used by every search request. Enabled documents of these resources
+are kept in process memory together with the generation they were loaded for.
+
+Every write done via the resource service bumps the resource generation stored in mongo,
+workers read the generations once per request (app context) and reload the resource
+only if it was changed, so all workers see the changes with their next request.
+"""
+
+import copy
+import logging
+import superdesk
+
+from flask import current_app as app, g
+from pymongo import ReturnDocument
+
+import newsroom
+
+logger = logging.getLogger(__name__)
+
+CACHED_RESOURCES = ('products', 'navigations', 'section_filters')
+
+
+class ResourceCache():
+    """Enabled documents per resource with hit/miss counters."""
+
+    def __init__(self):
+        self.docs = {}
+        self.hits = {resource: 0 for resource in CACHED_RESOURCES}
+        self.misses = {resource: 0 for resource in CACHED_RESOURCES}
+
+
+class CachedResourceService(newsroom.Service):
+    """Service invalidating the resource cache on every write."""
+
+    def on_created(self, docs):
+        super().on_created(docs)
+        invalidate(self.datasource)
+
+    def on_updated(self, updates, original):
+        super().on_updated(updates, original)
+        invalidate(self.datasource)
+
+    def on_replaced(self, document, original):
+        super().on_replaced(document, original)
+        invalidate(self.datasource)
+
+    def on_deleted(self, doc):
+        super().on_deleted(doc)
+        invalidate(self.datasource)
+
+
+def is_cache_enabled():
+    return bool(app.config.get('RESOURCE_CACHE'))
+
+
+def get_cache():
+    if 'resource_cache' not in app.extensions:
+        app.extensions['resource_cache'] = ResourceCache()
+    return app.extensions['resource_cache']
+
+
+def get_generations_collection():
+    return app.data.pymongo('items').db.resource_cache
+
+
+def get_generations():
+    """Get current generations of cached resources.
+
+    Generations are read only once per request, so the data is consistent within request.
+    """
+    if 'resource_cache_generations' not in g:
+        generations = {resource: 0 for resource in CACHED_RESOURCES}
+        for doc in get_generations_collection().find({'_id': {'$in': list(CACHED_RESOURCES)}}):
+            generations[doc['_id']] = doc.get('generation', 0)
+        g.resource_cache_generations = generations
+    return g.resource_cache_generations
+
+
+def invalidate(resource):
+    """Bump generation of given resource so every worker will reload it.
+
+    :param resource: resource name
+    """
+    if resource not in CACHED_RESOURCES:
+        return
+
+    doc = get_generations_collection().find_one_and_update(
+        {'_id': resource},
+        {'$inc': {'generation': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+    if 'resource_cache_generations' in g:
+        g.resource_cache_generations[resource] = doc['generation']
+
+
+def get_enabled_docs(resource):
+    """Get all enabled documents of given resource.
+
+    Returned documents are copies, so it's safe to modify these.
+
+    :param resource: resource name
+    """
+    return copy.deepcopy(get_cached_docs(resource))
+
+
+def get_cached_docs(resource):
+    """Get cached enabled documents of given resource, these must not be modified.
+
+    :param resource: resource name
+    """
+    if not is_cache_enabled():
+        return _load_docs(resource)
+
+    cache = get_cache()
+    generation = get_generations()[resource]
+    cached = cache.docs.get(resource)
+    if cached is not None and cached[0] == generation:
+        cache.hits[resource] += 1
+        return cached[1]
+
+    cache.misses[resource] += 1
+    docs = _load_docs(resource)
+    cache.docs[resource] = (generation, docs)
+    return docs
+
+
+def get_cache_stats():
+    """Get hit and miss counters of the resource cache per resource."""
+    cache = get_cache()
+    return {
+        resource: {
+            'hits': cache.hits[resource],
+            'misses': cache.misses[resource],
+            'cached': resource in cache.docs,
+        } for resource in CACHED_RESOURCES
+    }
+
+
+def _load_docs(resource):
+    return list(superdesk.get_resource_service(resource).get(req=None, lookup={'is_enabled': True}))
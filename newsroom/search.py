@@ -1,7 +1,14 @@
 from flask import current_app as app, json, abort
 from flask_babel import gettext
-from eve.utils import ParsedRequest
+from eve.utils import ParsedRequest, config
+from copy import deepcopy
+import time
+import base64
+import hashlib
 import logging
+import threading
+import collections
+import elasticsearch
 
 from superdesk import get_resource_service
 from content_api.errors import BadParameterValueError
@@ -11,11 +18,22 @@ from newsroom.products.products import get_products_by_navigation, get_products_
 from newsroom.auth import get_user
 from newsroom.companies import get_user_company
 from newsroom.settings import get_setting
+from newsroom.resource_cache import get_generations, is_cache_enabled
+from newsroom.search_metrics import search_stage, record_search
 from newsroom.template_filters import is_admin
 from newsroom.utils import get_local_date, get_end_date
 
 logger = logging.getLogger(__name__)
 
+#: methods generating the permission filters, these are compiled and cached only if not overridden
+PERMISSION_FILTER_METHODS = (
+    'apply_section_filter',
+    'apply_company_filter',
+    'apply_time_limit_filter',
+    'apply_products_filter',
+    'apply_product_filter',
+)
+
 
 def query_string(query, default_operator='AND'):
     return {
@@ -27,6 +45,305 @@ def query_string(query, default_operator='AND'):
     }
 
 
+#: how long elastic keeps the scroll context between pages of :func:`iter_search`
+SCROLL_KEEP_ALIVE = '2m'
+
+
+def encode_cursor(data):
+    """Encode cursor data as opaque url safe token."""
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode cursor token created by :func:`encode_cursor`, abort with 400 if it's not valid."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (ValueError, TypeError):
+        abort(400, gettext('Invalid cursor'))
+
+
+def get_elastic_major_version(resource):
+    if 'elastic_major_version' not in app.extensions:
+        version = app.data.elastic.elastic(resource).info()['version']['number']
+        app.extensions['elastic_major_version'] = int(version.split('.')[0])
+    return app.extensions['elastic_major_version']
+
+
+def _get_search_query(resource, query):
+    query = query or {'match_all': {}}
+    elastic_filter = config.SOURCES[resource].get('elastic_filter')
+    if elastic_filter:
+        query = {'bool': {'must': [query], 'filter': [elastic_filter]}}
+    return query
+
+
+def _get_search_body(resource, source, page_size):
+    body = deepcopy(source)
+    body.pop('from', None)
+    body['size'] = page_size
+    body['query'] = _get_search_query(resource, body.get('query'))
+    return body
+
+
+def msearch(resource, sources):
+    """Run multiple searches using single ``_msearch`` request.
+
+    :param resource: search resource name
+    :param sources: list of elastic queries
+    :return: list of results in the same order as sources
+    """
+    if not sources:
+        return []
+
+    elastic = app.data.elastic
+    es_args = elastic._es_args(resource)
+    header = {'index': es_args['index']}
+    if es_args.get('doc_type'):
+        header['type'] = es_args['doc_type']
+
+    body = []
+    for source in sources:
+        search_body = dict(source)
+        search_body['query'] = _get_search_query(resource, source.get('query'))
+        body.extend([header, search_body])
+
+    with search_stage('elastic'):
+        responses = elastic.elastic(resource).msearch(body=body)['responses']
+    for search_body, response in zip(body[1::2], responses):
+        if response.get('error'):
+            raise elasticsearch.TransportError(response.get('status', 500), 'msearch', response['error'])
+        record_search(search_body, response.get('took'))
+    return [elastic._parse_hits(response, resource) for response in responses]
+
+
+def search_page(resource, source, page_size=None, cursor=None):
+    """Get single page of search results using cursor instead of ``from``.
+
+    It uses ``search_after`` with ``_uid`` (``_id`` for elastic 7+) as a tiebreaker sort
+    on elastic 5+, so there is no limit on the number of pages and each page costs the same.
+
+    Older versions have no ``search_after`` and scroll contexts expire between requests,
+    so the cursor contains ``from`` of the next page there.
+
+    :param resource: search resource name
+    :param source: elastic query, ``from`` is ignored
+    :param page_size: number of items per page, defaults to ``size`` from source
+    :param cursor: cursor returned with the previous page
+    :return: tuple of page results and cursor for next page, ``None`` for last page
+    """
+    elastic = app.data.elastic
+    es_args = elastic._es_args(resource)
+    page_size = page_size or source.get('size') or BaseSearchService.default_page_size
+    state = decode_cursor(cursor) if cursor else {}
+    if not isinstance(state, dict):
+        abort(400, gettext('Invalid cursor'))
+
+    body = _get_search_body(resource, source, page_size)
+    if get_elastic_major_version(resource) >= 5:
+        tiebreaker = '_id' if get_elastic_major_version(resource) >= 7 else '_uid'
+        body['sort'] = (body.get('sort') or []) + [{tiebreaker: 'asc'}]
+        if state.get('search_after'):
+            body['search_after'] = state['search_after']
+            body.pop('aggs', None)
+    elif state.get('from'):
+        if not isinstance(state['from'], int) or state['from'] < 0:
+            abort(400, gettext('Invalid cursor'))
+        body['from'] = state['from']
+        body.pop('aggs', None)
+
+    response = elastic.elastic(resource).search(body=body, **es_args)
+    hits = response.get('hits', {}).get('hits', [])
+    next_cursor = None
+    if len(hits) >= page_size:
+        if get_elastic_major_version(resource) >= 5:
+            next_cursor = encode_cursor({'search_after': hits[-1]['sort']})
+        else:
+            next_cursor = encode_cursor({'from': body.get('from', 0) + len(hits)})
+
+    return elastic._parse_hits(response, resource), next_cursor
+
+
+def iter_search(resource, source, page_size=None):
+    """Iterate over all search results page by page.
+
+    On elastic 5+ it uses :func:`search_page`, on older versions it uses scroll
+    which is cleared once the iteration is over.
+
+    :param resource: search resource name
+    :param source: elastic query, ``from`` is ignored
+    :param page_size: number of items per page, defaults to ``size`` from source
+    """
+    if get_elastic_major_version(resource) < 5:
+        yield from _iter_scroll(resource, source, page_size)
+        return
+
+    cursor = None
+    while True:
+        results, cursor = search_page(resource, source, page_size, cursor)
+        if results.docs:
+            yield results
+        if not cursor:
+            break
+
+
+def _iter_scroll(resource, source, page_size=None):
+    elastic = app.data.elastic
+    es = elastic.elastic(resource)
+    page_size = page_size or source.get('size') or BaseSearchService.default_page_size
+    body = _get_search_body(resource, source, page_size)
+    response = es.search(body=body, scroll=SCROLL_KEEP_ALIVE, **elastic._es_args(resource))
+    try:
+        while response.get('hits', {}).get('hits'):
+            yield elastic._parse_hits(response, resource)
+            if len(response['hits']['hits']) < page_size:
+                break
+            response = es.scroll(scroll_id=response['_scroll_id'], scroll=SCROLL_KEEP_ALIVE)
+    finally:
+        if response.get('_scroll_id'):
+            try:
+                es.clear_scroll(scroll_id=response['_scroll_id'])
+            except elasticsearch.ElasticsearchException as exc:
+                logger.warning('Failed to clear scroll: %s', exc)
+
+
+class PermissionFilterCache():
+    """Compiled permission filters per principal, least recently used are removed when it's full.
+
+    :param max_size: max number of compiled filters
+    """
+
+    def __init__(self, max_size):
+        self.lock = threading.Lock()
+        self.filters = collections.OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.compile_ms = 0
+
+    def get(self, key):
+        with self.lock:
+            compiled = self.filters.get(key)
+            if compiled is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.filters.move_to_end(key)
+            return compiled
+
+    def set(self, key, compiled, duration):
+        with self.lock:
+            self.compile_ms += duration * 1000
+            self.filters[key] = compiled
+            while len(self.filters) > self.max_size:
+                self.filters.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'compiled': len(self.filters),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'compile_ms': round(self.compile_ms, 3),
+                'avg_compile_ms': round(self.compile_ms / self.misses, 3) if self.misses else None,
+            }
+
+
+def get_permission_filter_cache():
+    if 'permission_filter_cache' not in app.extensions:
+        app.extensions['permission_filter_cache'] = PermissionFilterCache(
+            app.config.get('PERMISSION_FILTER_CACHE_SIZE', 1000)
+        )
+    return app.extensions['permission_filter_cache']
+
+
+def get_permission_filter_stats():
+    """Get number of compiled permission filters, cache hit ratio and time spent compiling these."""
+    return get_permission_filter_cache().stats()
+
+
+AGGREGATIONS_CACHE_KEY = 'search_aggs:{}'
+AGGREGATIONS_INVALIDATED_KEY = 'search_aggs_invalidated'
+
+_aggs_stats_lock = threading.Lock()
+_aggs_stats = {'hits': 0, 'misses': 0, 'saved_ms': 0}
+
+
+def get_aggregations_timeout():
+    return app.config.get('AGGREGATIONS_CACHE_TIMEOUT', 5)
+
+
+def get_aggregations_cache_key(resource, source):
+    """Get cache key of aggregations for given search source.
+
+    Only the query and aggregations are used, so pages, sorting and post filter
+    of the search can change. Permission filters are part of the query.
+
+    :param resource: search resource name
+    :param source: elastic query
+    :return: cache key or ``None`` if aggregations should not be cached
+    """
+    if not app.config.get('AGGREGATIONS_CACHE') or not source.get('aggs'):
+        return None
+    body = json.dumps({
+        'source': config.SOURCES[resource].get('source', resource),
+        'query': source.get('query'),
+        'aggs': source['aggs'],
+    }, sort_keys=True, default=str)
+    return AGGREGATIONS_CACHE_KEY.format(hashlib.sha1(body.encode('utf-8')).hexdigest())
+
+
+def get_cached_aggregations(key):
+    """Get cached aggregations entry if it was computed after last invalidation.
+
+    :param key: cache key from :func:`get_aggregations_cache_key`
+    """
+    entry, invalidated = app.cache.get_many(key, AGGREGATIONS_INVALIDATED_KEY)
+    if entry is None or (invalidated is not None and invalidated >= entry['computed']):
+        with _aggs_stats_lock:
+            _aggs_stats['misses'] += 1
+        return None
+    return entry
+
+
+def set_cached_aggregations(key, aggregations, computed, took):
+    """Store aggregations in cache.
+
+    :param key: cache key from :func:`get_aggregations_cache_key`
+    :param aggregations: elastic aggregations response
+    :param computed: time when the search started
+    :param took: time in ms elastic spent on the search
+    """
+    app.cache.set(key, {
+        'aggs': aggregations,
+        'computed': computed,
+        'took': took,
+    }, timeout=get_aggregations_timeout())
+
+
+def track_cached_aggregations(entry, took):
+    """Track cache hit and time saved comparing to the search which computed the aggregations."""
+    with _aggs_stats_lock:
+        _aggs_stats['hits'] += 1
+        _aggs_stats['saved_ms'] += max((entry.get('took') or 0) - (took or 0), 0)
+
+
+def invalidate_aggregations():
+    """Invalidate all cached aggregations, called when content changes."""
+    app.cache.set(AGGREGATIONS_INVALIDATED_KEY, time.time(), timeout=get_aggregations_timeout())
+
+
+def get_aggregations_cache_stats():
+    """Get aggregations cache hits, misses, hit ratio and elastic time saved in this process."""
+    with _aggs_stats_lock:
+        lookups = _aggs_stats['hits'] + _aggs_stats['misses']
+        return dict(
+            _aggs_stats,
+            hit_ratio=round(_aggs_stats['hits'] / lookups, 3) if lookups else None,
+        )
+
+
 class SearchQuery(object):
     """ Class for storing the search parameters for validation and query generation """
 
@@ -65,13 +382,32 @@ class BaseSearchService(Service):
 
     def get(self, req, lookup):
         search = SearchQuery()
-        self.prefill_search_query(search, req, lookup)
-        self.validate_request(search)
-        self.apply_filters(search)
-        self.gen_source_from_search(search)
-
-        internal_req = self.get_internal_request(search)
-        return self.internal_get(internal_req, search.lookup)
+        with search_stage('prefill'):
+            self.prefill_search_query(search, req, lookup)
+            self.validate_request(search)
+        with search_stage('filters'):
+            self.apply_filters(search)
+        with search_stage('source'):
+            self.gen_source_from_search(search)
+            aggs_key = get_aggregations_cache_key(self.datasource, search.source)
+            cached_aggs = get_cached_aggregations(aggs_key) if aggs_key else None
+            if cached_aggs is not None:
+                search.source.pop('aggs')
+            internal_req = self.get_internal_request(search)
+
+        computed = time.time()
+        with search_stage('elastic'):
+            results = self.internal_get(internal_req, search.lookup)
+
+        hits = getattr(results, 'hits', None)
+        record_search(internal_req.args['source'], (hits or {}).get('took'))
+        if cached_aggs is not None and hits is not None:
+            hits['aggregations'] = cached_aggs['aggs']
+            track_cached_aggregations(cached_aggs, hits.get('took'))
+        elif aggs_key and hits and 'aggregations' in hits:
+            set_cached_aggregations(aggs_key, hits['aggregations'], computed, hits.get('took'))
+
+        return results
 
     def internal_get(self, req, lookup):
         return super().get(req, lookup)
@@ -99,16 +435,94 @@ class BaseSearchService(Service):
     def apply_filters(self, search):
         """ Generate and apply the different search filters
 
+        :param SearchQuery search: the search query instance
+        """
+        self.apply_permission_filters(search)
+        self.apply_request_filter(search)
+
+        if len(search.query['bool'].get('should', [])):
+            search.query['bool']['minimum_should_match'] = 1
+
+    def apply_permission_filters(self, search):
+        """ Apply the section, company, time limit and product filters
+
+        These are compiled once per principal, see :meth:`get_permission_filters_key`,
+        and the compiled clauses are added to the query.
+
+        :param SearchQuery search: the search query instance
+        """
+        key = self.get_permission_filters_key(search)
+        if key is None:
+            self.build_permission_filters(search)
+            return
+
+        cache = get_permission_filter_cache()
+        compiled = cache.get(key)
+        if compiled is None:
+            start = time.perf_counter()
+            compiled = self.compile_permission_filters(search)
+            cache.set(key, compiled, time.perf_counter() - start)
+
+        for clause, filters in json.loads(compiled).items():
+            search.query['bool'][clause].extend(filters)
+
+    def build_permission_filters(self, search):
+        """ Generate the section, company, time limit and product filters
+
         :param SearchQuery search: the search query instance
         """
         self.apply_section_filter(search)
         self.apply_company_filter(search)
         self.apply_time_limit_filter(search)
         self.apply_products_filter(search)
-        self.apply_request_filter(search)
 
-        if len(search.query['bool'].get('should', [])):
-            search.query['bool']['minimum_should_match'] = 1
+    def compile_permission_filters(self, search):
+        """ Generate the permission filters for an empty query
+
+        :param SearchQuery search: the search query instance
+        :return: json with the list of must, must_not and should clauses
+        """
+        compiled = SearchQuery()
+        for attr in ('user', 'is_admin', 'company', 'section', 'navigation_ids', 'products', 'requested_products',
+                     'args', 'req'):
+            setattr(compiled, attr, getattr(search, attr))
+        self.build_permission_filters(compiled)
+        return json.dumps(compiled.query['bool'])
+
+    def get_permission_filters_key(self, search):
+        """ Get the cache key of permission filters
+
+        It contains all values the filters depend on, with products and section filters
+        represented by the resource cache generations, so every change creates a new key.
+        Filters are not cached if the resource cache is disabled.
+
+        :param SearchQuery search: the search query instance
+        :return: key or ``None`` if the filters should not be cached
+        """
+        if not app.config.get('PERMISSION_FILTER_CACHE', True) or not is_cache_enabled() or any(
+            getattr(type(self), method) is not getattr(BaseSearchService, method)
+            for method in PERMISSION_FILTER_METHODS
+        ):
+            return None
+
+        company = search.company or {}
+        generations = get_generations()
+        return json.dumps([
+            self.limit_days_setting,
+            get_setting(self.limit_days_setting) if self.limit_days_setting is not None else None,
+            search.section,
+            search.is_admin,
+            (search.user or {}).get('user_type'),
+            str(company.get('_id')),
+            company.get('company_type'),
+            company.get('archive_access', False),
+            search.navigation_ids,
+            search.args.get('product'),
+            search.args.get('requested_products'),
+            [str(product.get('_id')) for product in search.products],
+            generations.get('products'),
+            generations.get('section_filters'),
+        ])
 
     def gen_source_from_search(self, search):
         """ Generate the eve source object from the search query instance
@@ -131,6 +545,22 @@ class BaseSearchService(Service):
         if search.highlight:
             search.source['highlight'] = search.highlight
 
+    def msearch(self, searches):
+        """Run searches using single ``_msearch`` request, see :func:`newsroom.search.msearch`.
+
+        :param searches: list of search query instances with source generated via :meth:`gen_source_from_search`
+        :return: list of results in the same order as searches
+        """
+        return msearch(self.datasource, [search.source for search in searches])
+
+    def search_page(self, source, page_size=None, cursor=None):
+        """Get single page of search results using cursor, see :func:`newsroom.search.search_page`."""
+        return search_page(self.datasource, source, page_size, cursor)
+
+    def iter_search(self, source, page_size=None):
+        """Iterate over all search results page by page, see :func:`newsroom.search.iter_search`."""
+        return iter_search(self.datasource, source, page_size)
+
     def get_internal_request(self, search):
         """ Creates an eve internal request object
 
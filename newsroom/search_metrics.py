@@ -0,0 +1,245 @@
+"""
+Search metrics
+--------------
+
+Searches record time spent in every stage of :meth:`newsroom.search.BaseSearchService.get`,
+time elastic reported as ``took``, size of generated elastic queries and number of mongo
+and elastic requests made while searching.
+
+Time between the search and the end of the request is reported as ``post_process``,
+it includes ``on_fetched`` hooks and response serialization.
+
+Metrics are aggregated per endpoint in every process, see :func:`get_search_stats`.
+Requests slower than ``SEARCH_SLOW_THRESHOLD`` ms are logged together with their elastic queries.
+With ``SEARCH_SERVER_TIMING`` metrics of a request are also sent to administrators
+via ``Server-Timing`` header.
+
+Mongo requests are only counted for clients created after :func:`register_listener`,
+so it's called by the app before the data layer is created.
+"""
+
+import time
+import logging
+import threading
+import collections
+
+import flask
+import pymongo.monitoring
+
+from contextlib import contextmanager
+from newsroom.template_filters import is_admin
+
+logger = logging.getLogger(__name__)
+
+#: search stages in the order these are done
+STAGES = ('prefill', 'filters', 'source', 'elastic', 'post_process')
+
+_stats_lock = threading.Lock()
+_search_stats = {}
+_listener_registered = False
+_mongo_commands = 0
+
+
+class SearchMetrics():
+    """Metrics of searches done within single request."""
+
+    def __init__(self, start):
+        self.start = start
+        self.stages = collections.OrderedDict()
+        self.active = 0
+        self.searched = None
+        self.took = 0
+        self.mongo = 0
+        self.elastic = 0
+        self.query_bytes = 0
+        self.sources = []
+
+    def add_stage(self, name, duration_ms):
+        self.stages[name] = self.stages.get(name, 0) + duration_ms
+
+    def add_search(self, source, took):
+        self.elastic += 1
+        self.took += took or 0
+        self.query_bytes += len(source)
+        self.sources.append(source)
+        self.searched = time.perf_counter()
+
+
+class MongoCommandListener(pymongo.monitoring.CommandListener):
+    """Count mongo commands started while a search stage is running and in total."""
+
+    def started(self, event):
+        global _mongo_commands
+        _mongo_commands += 1
+        if flask.has_request_context():
+            metrics = flask.g.get('search_metrics')
+            if metrics is not None and metrics.active:
+                metrics.mongo += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def is_enabled():
+    return flask.has_request_context() and flask.current_app.config.get('SEARCH_METRICS')
+
+
+def get_request_metrics():
+    """Get search metrics of current request, ``None`` if metrics are disabled or there is no request."""
+    if not is_enabled():
+        return None
+    if flask.g.get('search_metrics') is None:
+        flask.g.search_metrics = SearchMetrics(flask.g.get('search_request_start') or time.perf_counter())
+    return flask.g.search_metrics
+
+
+@contextmanager
+def search_stage(name):
+    """Record time spent within the block as search stage.
+
+    :param name: stage name
+    """
+    metrics = get_request_metrics()
+    if metrics is None:
+        yield
+        return
+
+    metrics.active += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active -= 1
+        metrics.add_stage(name, (time.perf_counter() - start) * 1000)
+
+
+def record_search(source, took):
+    """Record elastic search request.
+
+    :param source: elastic query, dict or json string
+    :param took: time in ms reported by elastic
+    """
+    metrics = get_request_metrics()
+    if metrics is not None:
+        metrics.add_search(source if isinstance(source, str) else flask.json.dumps(source), took)
+
+
+def get_server_timing(metrics, total_ms):
+    """Get ``Server-Timing`` header value for request search metrics."""
+    timings = ['{};dur={:.1f}'.format(name, duration) for name, duration in metrics.stages.items()]
+    timings.append('es_took;dur={};desc="elastic took"'.format(metrics.took))
+    timings.append('total;dur={:.1f}'.format(total_ms))
+    return ', '.join(timings)
+
+
+def track_request(endpoint, metrics, total_ms):
+    with _stats_lock:
+        stats = _search_stats.setdefault(endpoint, {
+            'count': 0,
+            'slow': 0,
+            'total_ms': 0,
+            'max_ms': 0,
+            'took_ms': 0,
+            'mongo': 0,
+            'elastic': 0,
+            'query_bytes': 0,
+            'stages_ms': {},
+        })
+        stats['count'] += 1
+        stats['total_ms'] += total_ms
+        stats['max_ms'] = max(stats['max_ms'], total_ms)
+        stats['took_ms'] += metrics.took
+        stats['mongo'] += metrics.mongo
+        stats['elastic'] += metrics.elastic
+        stats['query_bytes'] += metrics.query_bytes
+        for name, duration in metrics.stages.items():
+            stats['stages_ms'][name] = stats['stages_ms'].get(name, 0) + duration
+        if is_slow(total_ms):
+            stats['slow'] += 1
+
+
+def is_slow(total_ms):
+    threshold = flask.current_app.config.get('SEARCH_SLOW_THRESHOLD')
+    return bool(threshold) and total_ms >= threshold
+
+
+def get_search_stats():
+    """Get number of searches, slow searches and average time per stage for every endpoint in this process."""
+    with _stats_lock:
+        return {
+            endpoint: {
+                'count': stats['count'],
+                'slow': stats['slow'],
+                'avg_ms': round(stats['total_ms'] / stats['count'], 3),
+                'max_ms': round(stats['max_ms'], 3),
+                'avg_took_ms': round(stats['took_ms'] / stats['count'], 3),
+                'avg_mongo': round(stats['mongo'] / stats['count'], 3),
+                'avg_elastic': round(stats['elastic'] / stats['count'], 3),
+                'avg_query_bytes': round(stats['query_bytes'] / stats['count'], 3),
+                'avg_stages_ms': {
+                    name: round(stats['stages_ms'][name] / stats['count'], 3)
+                    for name in STAGES if name in stats['stages_ms']
+                },
+            } for endpoint, stats in _search_stats.items()
+        }
+
+
+def start_request():
+    if flask.current_app.config.get('SEARCH_METRICS'):
+        flask.g.search_request_start = time.perf_counter()
+
+
+def finish_request(response):
+    metrics = flask.g.get('search_metrics')
+    if metrics is None:
+        return response
+
+    now = time.perf_counter()
+    if metrics.searched is not None:
+        metrics.add_stage('post_process', (now - metrics.searched) * 1000)
+    total_ms = (now - metrics.start) * 1000
+    endpoint = flask.request.endpoint or flask.request.path
+    if flask.current_app.config.get('SEARCH_SERVER_TIMING') and is_admin():
+        response.headers['Server-Timing'] = get_server_timing(metrics, total_ms)
+    track_request(endpoint, metrics, total_ms)
+
+    if is_slow(total_ms):
+        logger.warning(
+            'Slow search %s %s took %.1fms (elastic took %dms, %d elastic and %d mongo requests, %d query bytes), '
+            'stages %s, queries %s',
+            flask.request.method,
+            flask.request.full_path,
+            total_ms,
+            metrics.took,
+            metrics.elastic,
+            metrics.mongo,
+            metrics.query_bytes,
+            ', '.join('{}={:.1f}ms'.format(name, duration) for name, duration in metrics.stages.items()),
+            ' '.join(metrics.sources),
+        )
+
+    return response
+
+
+def register_listener():
+    """Register mongo command listener, it only affects mongo clients created afterwards.
+
+    Listener only counts commands unless search metrics are enabled.
+    """
+    global _listener_registered
+    if not _listener_registered:
+        pymongo.monitoring.register(MongoCommandListener())
+        _listener_registered = True
+
+
+def get_mongo_commands_count():
+    """Get number of mongo commands started in this process, used by benchmarks."""
+    return _mongo_commands
+
+
+def init_app(app):
+    app.before_request(start_request)
+    app.after_request(finish_request)
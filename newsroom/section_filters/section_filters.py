@@ -1,6 +1,7 @@
+import copy
 import newsroom
-import superdesk
 from newsroom.search import query_string
+from newsroom.resource_cache import CachedResourceService, get_cached_docs, get_enabled_docs
 
 
 class SectionFiltersResource(newsroom.Resource):
@@ -46,22 +47,19 @@ class SectionFiltersResource(newsroom.Resource):
     query_objectid_as_string = True  # needed for companies/navigations lookup to work
 
 
-class SectionFiltersService(newsroom.Service):
+class SectionFiltersService(CachedResourceService):
     def get_section_filters(self, filter_type):
         """Get the list of section filter by filter type
 
         :param filter_type: Type of filter
         """
-        lookup = {'is_enabled': True, 'filter_type': filter_type}
-        section_filters = list(superdesk.get_resource_service('section_filters').get(req=None, lookup=lookup))
-        return section_filters
+        return copy.deepcopy([f for f in get_cached_docs('section_filters') if f.get('filter_type') == filter_type])
 
     def get_section_filters_dict(self):
         """Get the list of all section filters
 
         """
-        lookup = {'is_enabled': True}
-        section_filters = list(superdesk.get_resource_service('section_filters').get(req=None, lookup=lookup))
+        section_filters = get_enabled_docs('section_filters')
         filters = {}
         for f in section_filters:
             if not filters.get(f.get('filter_type')):
@@ -0,0 +1,142 @@
+"""
+Topics percolator
+-----------------
+
+Wire topics are registered as stored queries in a dedicated percolator index,
+so an incoming item can be matched against all of them via single percolate request.
+
+Only the topic part of the query (query string and filters) is registered,
+user/company permissions are applied afterwards on the matching topics only
+by :meth:`newsroom.wire.search.WireSearchService.get_matching_topics`.
+
+Only wire topics are percolated. Agenda topics are not, notifications for these
+are found by a single mongo lookup of topics watching the agenda item,
+see :func:`newsroom.topics.topics.get_agenda_notification_topics`.
+"""
+
+import logging
+import elasticsearch
+
+from copy import deepcopy
+from elasticsearch import helpers
+from flask import current_app as app
+from superdesk import get_resource_service
+
+logger = logging.getLogger(__name__)
+
+ITEMS_TYPE = 'items'
+PERCOLATOR_TYPE = '.percolator'
+
+
+def is_percolator_enabled():
+    return bool(app.config.get('WIRE_TOPICS_PERCOLATOR'))
+
+
+def get_percolator_index():
+    return app.config.get('TOPICS_PERCOLATOR_INDEX') or \
+        '{}_topics'.format(app.config['CONTENTAPI_ELASTICSEARCH_INDEX'])
+
+
+def get_es():
+    return app.data.elastic.elastic(ITEMS_TYPE)
+
+
+def init_percolator_index():
+    """Create percolator index using mapping of the items index if it does not exist."""
+    es = get_es()
+    index = get_percolator_index()
+    if es.indices.exists(index=index):
+        return
+
+    items_index = app.data.elastic.get_index_by_alias(app.config['CONTENTAPI_ELASTICSEARCH_INDEX'])
+    mapping = next(iter(es.indices.get_mapping(index=items_index, doc_type=ITEMS_TYPE).values()))
+    settings = deepcopy(app.config.get('CONTENTAPI_ELASTICSEARCH_SETTINGS') or {})
+    settings['mappings'] = mapping.get('mappings', {})
+    app.data.elastic.create_index(index, settings, es)
+
+
+def register_topic(topic):
+    """Store or remove the query for given topic in the percolator index.
+
+    :param topic: topic document
+    """
+    if not is_percolator_enabled():
+        return
+
+    if topic.get('topic_type') != 'wire':
+        unregister_topic(topic)
+        return
+
+    query = get_resource_service('wire_search').get_topic_percolator_query(topic)
+    try:
+        get_es().index(
+            index=get_percolator_index(),
+            doc_type=PERCOLATOR_TYPE,
+            id=str(topic['_id']),
+            body={'query': query, 'topic_type': topic['topic_type']},
+            refresh=True
+        )
+    except elasticsearch.ElasticsearchException as exc:
+        logger.error('Failed to register topic %s in percolator: %s', topic['_id'], exc)
+
+
+def unregister_topic(topic):
+    """Remove the query of given topic from the percolator index.
+
+    :param topic: topic document
+    """
+    if not is_percolator_enabled():
+        return
+
+    try:
+        get_es().delete(
+            index=get_percolator_index(),
+            doc_type=PERCOLATOR_TYPE,
+            id=str(topic['_id']),
+            refresh=True,
+            ignore=[404]
+        )
+    except elasticsearch.ElasticsearchException as exc:
+        logger.error('Failed to remove topic %s from percolator: %s', topic['_id'], exc)
+
+
+def index_topics():
+    """(Re)register all wire topics in the percolator index.
+
+    :return: number of registered topics
+    """
+    init_percolator_index()
+    service = get_resource_service('wire_search')
+    index = get_percolator_index()
+    actions = (
+        {
+            '_index': index,
+            '_type': PERCOLATOR_TYPE,
+            '_id': str(topic['_id']),
+            '_source': {'query': service.get_topic_percolator_query(topic), 'topic_type': 'wire'},
+        }
+        for topic in get_resource_service('topics').get_from_mongo(req=None, lookup={'topic_type': 'wire'})
+    )
+    count, _errors = helpers.bulk(get_es(), actions, refresh=True)
+    return count
+
+
+def percolate_item(item_id):
+    """Get ids of topics which queries are matching given item.
+
+    :param item_id: id of the item already stored in the items index
+    :return: list of topic ids or ``None`` if percolation failed
+    """
+    try:
+        response = get_es().percolate(
+            index=app.config['CONTENTAPI_ELASTICSEARCH_INDEX'],
+            doc_type=ITEMS_TYPE,
+            id=item_id,
+            percolate_index=get_percolator_index(),
+            percolate_type=ITEMS_TYPE
+        )
+    except elasticsearch.ElasticsearchException as exc:
+        logger.error('Failed to percolate item %s: %s', item_id, exc)
+        return None
+
+    return [match['_id'] for match in response.get('matches') or []]
@@ -1,7 +1,9 @@
 
 import newsroom
 import superdesk
+from bson import ObjectId
 from newsroom.user_roles import UserRole
+from newsroom.topics.percolator import is_percolator_enabled, percolate_item, register_topic, unregister_topic
 
 
 class TopicsResource(newsroom.Resource):
@@ -28,15 +30,41 @@ class TopicsResource(newsroom.Resource):
 
 
 class TopicsService(newsroom.Service):
-    pass
+    def on_created(self, docs):
+        super().on_created(docs)
+        for doc in docs:
+            register_topic(doc)
+
+    def on_updated(self, updates, original):
+        super().on_updated(updates, original)
+        register_topic(dict(original, **updates))
+
+    def on_deleted(self, doc):
+        super().on_deleted(doc)
+        unregister_topic(doc)
 
 
 def get_user_topics(user_id):
     return list(superdesk.get_resource_service('topics').get(req=None, lookup={'user': user_id}))
 
 
-def get_wire_notification_topics():
+def get_wire_notification_topics(item_id=None):
+    """
+    Returns wire topics with notifications enabled
+
+    If the topics percolator is enabled and item_id is provided,
+    only topics with query matching the item are returned.
+
+    :param item_id: optional id of an item to match topics against
+    :return: list of topics
+    """
     lookup = {'$and': [{'notifications': True}, {'topic_type': 'wire'}]}
+    if item_id and is_percolator_enabled():
+        topic_ids = percolate_item(item_id)
+        if topic_ids is not None:  # fallback to all topics if percolation fails
+            if not topic_ids:
+                return []
+            lookup['$and'].append({'_id': {'$in': [ObjectId(_id) for _id in topic_ids]}})
     return list(superdesk.get_resource_service('topics').get(req=None, lookup=lookup))
 
 
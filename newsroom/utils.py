@@ -297,6 +297,26 @@ def get_company_dict():
     return g.company_dict
 
 
+def get_users_by_ids(user_ids):
+    """Get active users with given ids indexed by _id.
+
+    Unlike :func:`get_user_dict` only these users and their companies are loaded.
+
+    :param user_ids: list of user ids
+    """
+    if not user_ids:
+        return {}
+    lookup = {'_id': {'$in': [ObjectId(_id) for _id in user_ids]}, 'is_enabled': True}
+    users = list(query_resource('users', lookup=lookup))
+    company_ids = list(set(user['company'] for user in users if user.get('company')))
+    companies = {
+        str(company['_id']): company
+        for company in query_resource('companies', lookup={'_id': {'$in': company_ids}})
+    } if company_ids else {}
+    return {str(user['_id']): user for user in users
+            if is_company_enabled(user, companies.get(str(user.get('company'))))}
+
+
 def get_cached_resource_by_id(resource, _id, black_list_keys=None):
     """If the document exist in cache then return the document form cache
     else fetch the document from the database store in the cache and return the document.
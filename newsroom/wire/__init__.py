@@ -5,6 +5,7 @@ from flask_babel import lazy_gettext
 from newsroom.wire.search import WireSearchResource, WireSearchService
 from . import utils
 from superdesk.metadata.item import not_analyzed
+from superdesk.resource import not_indexed
 
 blueprint = Blueprint('wire', __name__)
 
@@ -35,6 +36,10 @@ def init_app(app):
                 }
             }
         },
+        'fingerprint': {
+            'type': 'string',
+            'mapping': not_indexed,
+        },
     })
 
     superdesk.register_resource('wire_search', WireSearchResource, WireSearchService, _app=app)
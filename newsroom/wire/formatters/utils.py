@@ -39,7 +39,11 @@ def remove_internal_renditions(item, remove_media=False):
     return item
 
 
-def add_media(zf, item):
+def get_media_files(item):
+    """Generate ``(filename, file)`` for all the renditions of item associations.
+
+    Files are opened lazily, so these can be read one by one.
+    """
     added_files = []
     associations = item.get('associations', {})
     for associated_item in associations.values():
@@ -63,16 +67,18 @@ def add_media(zf, item):
                 flask.current_app.logger.warning(f"Media ID not found for rendition: {name}")
                 continue
 
-            file = flask.current_app.media.get(media_id, ASSETS_RESOURCE)
+            try:
+                file = flask.current_app.media.get(media_id, ASSETS_RESOURCE)
+            except Exception as e:
+                flask.current_app.logger.error(f"Error getting file: {name}. Error: {str(e)}")
+                continue
+
             if not file:
                 flask.current_app.logger.warning(f"File not found: {name}")
                 continue
 
-            try:
-                zf.writestr(name, file.read())
-                added_files.append(name)
-            except Exception as e:
-                flask.current_app.logger.error(f"Error adding file to zip: {name}. Error: {str(e)}")
+            added_files.append(name)
+            yield name, file
 
 
 def rewire_featuremedia(item):
@@ -99,11 +105,12 @@ def log_media_downloads(item):
                                                                     flask.request.args.get('type', 'wire'))
 
 
-def remove_unpermissioned_embeds(item, company_id=None, section='wire'):
+def remove_unpermissioned_embeds(item, company_id=None, section='wire', permitted_products=None):
     """
     :param item:
     :param company_id:
     :param section
+    :param permitted_products: superdesk product ids the company is permissioned for, fetched if not provided
     :return: The item with the embeds that the user is not allowed to download removed
     """
 
@@ -112,16 +119,17 @@ def remove_unpermissioned_embeds(item, company_id=None, section='wire'):
 
     kill_keys = []
 
-    if company_id is None:
-        user = get_user(required=False)
-        if user:
-            company_id = user.get('company')
-        else:
-            company_id = flask.g.user
+    if permitted_products is None:
+        if company_id is None:
+            user = get_user(required=False)
+            if user:
+                company_id = user.get('company')
+            else:
+                company_id = flask.g.user
 
-    # get the list of superdesk products that the company is permissioned for
-    permitted_products = [p.get('sd_product_id') for p in
-                          get_products_by_company(company_id, None, section) if p.get('sd_product_id')]
+        # get the list of superdesk products that the company is permissioned for
+        permitted_products = [p.get('sd_product_id') for p in
+                              get_products_by_company(company_id, None, section) if p.get('sd_product_id')]
 
     for key, embed_item in item.get("associations", {}).items():
         if key.startswith("editor_"):
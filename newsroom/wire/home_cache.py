@@ -0,0 +1,350 @@
+"""
+Home page cache
+---------------
+
+Items of every home page card are cached separately in ``app.cache``, keyed by the card id
+and the configuration of its product, so changing the card or its product
+creates a new cache entry instead of serving outdated items.
+
+Cards are fresh for ``HOME_CARD_CACHE_TIMEOUT`` seconds. When an item is pushed only cards
+which product is matching the item, or which contain the item or its previous versions,
+are invalidated. Products with a query are matched against the stored item using a single
+elastic request with a filter per card.
+
+Expired or invalidated cards are served stale for up to ``HOME_CARD_CACHE_STALE`` seconds
+while a single request recomputes them, all cards it has to recompute are searched
+using a single ``_msearch`` request. Requests for a card which is not cached at all
+wait up to ``HOME_CARD_CACHE_LOCK_TIMEOUT`` seconds for the request computing it.
+
+Cached items are shared by all users, embeds are filtered for the user requesting
+the cards after reading these from the cache.
+"""
+
+import time
+import logging
+import threading
+
+import elasticsearch
+import superdesk
+
+from html import escape
+from copy import deepcopy
+from bson import ObjectId
+from flask import current_app as app
+
+from newsroom.resource_cache import get_cached_docs
+from newsroom.search import query_string
+from newsroom.utils import query_resource
+
+logger = logging.getLogger(__name__)
+
+ITEMS_TYPE = 'items'
+CARD_KEY = 'home_card:{card}:{product}:{size}:{etag}'
+INVALIDATED_KEY = 'home_card_invalidated:{card}'
+
+#: how often a request waiting for other request computing the card checks the cache
+LOCK_POLL_INTERVAL = 0.05
+
+_stats_lock = threading.Lock()
+_cache_stats = {'fresh': 0, 'stale': 0, 'computed': 0, 'waited': 0, 'invalidated': 0}
+
+
+def get_home_cache_stats():
+    """Get number of fresh, stale and computed cards served and invalidated cards in this process."""
+    with _stats_lock:
+        return dict(_cache_stats)
+
+
+def _track(name, count=1):
+    with _stats_lock:
+        _cache_stats[name] += count
+
+
+def get_timeout():
+    return app.config.get('HOME_CARD_CACHE_TIMEOUT', 60)
+
+
+def get_stale_timeout():
+    return app.config.get('HOME_CARD_CACHE_STALE', 5)
+
+
+def get_products():
+    return {str(product['_id']): product for product in get_cached_docs('products')}
+
+
+def get_product_cards(cards):
+    """Get list of ``(card, product)`` for cards with product configured."""
+    products = get_products()
+    return [
+        (card, products.get(str(card['config']['product'])))
+        for card in cards if (card.get('config') or {}).get('product')
+    ]
+
+
+def get_card_key(card, product):
+    """Get cache key of card items, it changes with card and product configuration.
+
+    :param card: card
+    :param product: card product, ``None`` if it's not enabled
+    """
+    return CARD_KEY.format(
+        card=card['_id'],
+        product=card['config']['product'],
+        size=card['config'].get('size'),
+        etag=(product or {}).get('_etag') or (product or {}).get('_updated'),
+    )
+
+
+def get_invalidated_key(card):
+    return INVALIDATED_KEY.format(card=card['_id'])
+
+
+def is_fresh(entry, invalidated, now):
+    return now < entry['computed'] + get_timeout() and (invalidated is None or invalidated < entry['computed'])
+
+
+def is_stale(entry, invalidated, now):
+    outdated = entry['computed'] + get_timeout()
+    if invalidated is not None and invalidated >= entry['computed']:
+        outdated = min(outdated, invalidated)
+    return now < outdated + get_stale_timeout()
+
+
+def get_items_by_card(cards):
+    """Get items for every home page card using the cache.
+
+    Cards which must be recomputed by this request are searched using single ``_msearch`` request.
+
+    :param cards: list of cards
+    :return: dict with list of items per card label
+    """
+    items_by_card = {}
+    product_cards = get_product_cards(cards)
+    keys = [get_card_key(card, product) for card, product in product_cards]
+    invalidated_keys = [get_invalidated_key(card) for card, _product in product_cards]
+    cached = app.cache.get_many(*(keys + invalidated_keys)) if keys else []
+    now = time.time()
+    locked = []
+    waiting = []
+    for i, (card, product) in enumerate(product_cards):
+        entry, invalidated = cached[i], cached[len(keys) + i]
+        status = get_card_status(keys[i], entry, invalidated, now)
+        if status == 'lock':
+            locked.append((card, keys[i]))
+        elif status == 'wait':
+            waiting.append((card, keys[i], entry))
+        else:
+            items_by_card[card['label']] = entry['items']
+
+    if locked:
+        try:
+            items_by_card.update(compute_cards_items(locked))
+        finally:
+            app.cache.delete_many(*['{}:lock'.format(key) for _card, key in locked])
+
+    for card, key, entry in waiting:
+        items_by_card[card['label']] = wait_for_card_items(card, key, entry)
+
+    for label, items in items_by_card.items():
+        items_by_card[label] = get_user_card_items(items)
+
+    for card in cards:
+        if card['type'] == '4-photo-gallery' and card['label'] not in items_by_card:
+            # Omit external media, let the client manually request these
+            # using '/media_card_external' endpoint
+            items_by_card[card['label']] = None
+
+    return items_by_card
+
+
+def get_lock_timeout():
+    return app.config.get('HOME_CARD_CACHE_LOCK_TIMEOUT', 10)
+
+
+def get_card_status(key, entry, invalidated, now):
+    """Get how the card should be served.
+
+    It's ``fresh`` or ``stale`` if cached entry can be used, ``lock`` if the card
+    should be computed by this request or ``wait`` if other request is computing it.
+
+    :param key: card cache key
+    :param entry: cached entry
+    :param invalidated: time when the card was invalidated last time
+    :param now: current time
+    """
+    if entry is not None and is_fresh(entry, invalidated, now):
+        _track('fresh')
+        return 'fresh'
+
+    if app.cache.add('{}:lock'.format(key), 1, timeout=get_lock_timeout()):
+        return 'lock'
+
+    if entry is not None and is_stale(entry, invalidated, now):
+        _track('stale')
+        return 'stale'
+
+    return 'wait'
+
+
+def wait_for_card_items(card, key, entry):
+    """Wait for other request computing the card, compute it if it takes too long.
+
+    :param card: card
+    :param key: card cache key
+    :param entry: outdated cached entry
+    """
+    deadline = time.time() + get_lock_timeout()
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        computed = app.cache.get(key)
+        if computed is not None and (entry is None or computed['computed'] > entry['computed']):
+            _track('waited')
+            return computed['items']
+
+    logger.warning('Timeout waiting for home card %s, computing it', card['_id'])
+    return compute_cards_items([(card, key)])[card['label']]
+
+
+def compute_cards_items(cards):
+    """Search for items of multiple cards using single request and store these in cache.
+
+    :param cards: list of ``(card, key)``
+    :return: dict with list of items per card label
+    """
+    computed = time.time()
+    products_items = superdesk.get_resource_service('wire_search').get_products_items([
+        (ObjectId(card['config']['product']), card['config']['size']) for card, _key in cards
+    ], embed_permissions=False)
+
+    items_by_card = {}
+    entries = {}
+    for (card, key), items in zip(cards, products_items):
+        items_by_card[card['label']] = items
+        entries[key] = {'items': items, 'computed': computed}
+
+    app.cache.set_many(entries, timeout=get_timeout() + get_stale_timeout())
+    _track('computed', len(cards))
+    return items_by_card
+
+
+def get_user_card_items(items):
+    """Get copy of cached card items for current user.
+
+    Cards are shared by all users, so embeds are filtered per user after reading the cache.
+
+    :param items: cached card items
+    """
+    if not items:
+        return items
+    items = deepcopy(items)
+    superdesk.get_resource_service('wire_search').filter_embeds(items)
+    for item in items:
+        item['body_html'] = escape(item['body_html'])
+    return items
+
+
+def invalidate_cards(cards):
+    """Mark cards as invalidated, so these are recomputed with next request.
+
+    :param cards: list of cards
+    """
+    if not cards:
+        return
+    now = time.time()
+    app.cache.set_many(
+        {get_invalidated_key(card): now for card in cards},
+        timeout=get_timeout() + get_stale_timeout()
+    )
+    _track('invalidated', len(cards))
+
+
+def get_home_cards():
+    return list(query_resource('cards', lookup={'dashboard': 'newsroom'}))
+
+
+def get_cards_with_items(product_cards, ids):
+    """Get cards which cached items contain any of given item ids.
+
+    :param product_cards: list of ``(card, product)``
+    :param ids: set of item ids
+    """
+    keys = [get_card_key(card, product) for card, product in product_cards]
+    cached = app.cache.get_many(*keys) if keys else []
+    return [
+        card for (card, _product), entry in zip(product_cards, cached)
+        if entry and any(str(item.get('_id')) in ids for item in entry['items'] or [])
+    ]
+
+
+def get_cards_matching_queries(product_cards, item_id):
+    """Get cards which product query is matching given item using a single elastic request.
+
+    :param product_cards: list of ``(card, product)`` with product query set
+    :param item_id: id of the item already stored in the items index
+    """
+    if not product_cards:
+        return []
+
+    cards = {str(card['_id']): card for card, _product in product_cards}
+    body = {
+        'query': {'ids': {'values': [item_id]}},
+        'size': 0,
+        'aggs': {
+            'cards': {
+                'filters': {
+                    'filters': {str(card['_id']): query_string(product['query']) for card, product in product_cards},
+                },
+            },
+        },
+    }
+
+    try:
+        response = app.data.elastic.elastic(ITEMS_TYPE).search(
+            index=app.config['CONTENTAPI_ELASTICSEARCH_INDEX'],
+            doc_type=ITEMS_TYPE,
+            body=body
+        )
+    except elasticsearch.ElasticsearchException as exc:
+        logger.error('Failed to match item %s with home cards: %s', item_id, exc)
+        return list(cards.values())
+
+    buckets = response['aggregations']['cards']['buckets']
+    return [cards[card_id] for card_id, bucket in buckets.items() if bucket['doc_count']]
+
+
+def invalidate_home_cards(item):
+    """Invalidate home page cards which are affected by given published item.
+
+    Card is affected if its product is matching the item via superdesk product or query,
+    or if it contains the item or one of its previous versions.
+
+    :param item: published item
+    """
+    product_cards = get_product_cards(get_home_cards())
+    ids = set(str(_id) for _id in item.get('ancestors') or [])
+    ids.add(str(item['_id']))
+    codes = set(str(product.get('code')) for product in item.get('products') or [])
+
+    invalidated = {}
+    queries = []
+    for card, product in product_cards:
+        if product is None:
+            continue
+        if product.get('sd_product_id') and str(product['sd_product_id']) in codes:
+            invalidated[card['_id']] = card
+        elif product.get('query'):
+            queries.append((card, product))
+
+    for card in get_cards_matching_queries(queries, item['_id']) + get_cards_with_items(product_cards, ids):
+        invalidated[card['_id']] = card
+
+    invalidate_cards(list(invalidated.values()))
+
+
+def invalidate_home_cards_with_items(ids):
+    """Invalidate home page cards which contain any of given items.
+
+    :param ids: list of item ids
+    """
+    product_cards = get_product_cards(get_home_cards())
+    invalidate_cards(get_cards_with_items(product_cards, set(str(_id) for _id in ids)))
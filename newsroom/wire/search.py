@@ -142,15 +142,64 @@ class WireSearchService(BaseSearchService):
             )
 
     def get_product_items(self, product_id, size):
+        return self.get_products_items([(product_id, size)])[0]
+
+    def get_products_items(self, products, embed_permissions=True):
+        """Get items for multiple products using single ``_msearch`` request.
+
+        :param products: list of ``(product_id, size)``
+        :param embed_permissions: filter embeds for current user, see :meth:`filter_embeds`
+        :return: list of items per product, ``None`` for products which were not found
+        """
+        product_ids = list(set(product_id for product_id, _size in products))
+        found = {
+            product['_id']: product
+            for product in get_resource_service('products').get_from_mongo(req=None, lookup={
+                '_id': {'$in': product_ids},
+            })
+        }
+
+        searches = [
+            self.get_product_items_search(found[product_id], size)
+            for product_id, size in products if product_id in found
+        ]
+        results = iter(self.msearch(searches))
+
+        items = []
+        for product_id, _size in products:
+            if product_id not in found:
+                items.append(None)
+                continue
+            docs = list(next(results))
+            if embed_permissions:
+                self.filter_embeds(docs)
+            items.append(docs)
+        return items
+
+    def filter_embeds(self, items):
+        """Disable download of embeds which current user is not permitted to download.
+
+        It's done only with ``EMBED_PRODUCT_FILTERING`` enabled.
+
+        :param items: list of items
+        """
+        if not app.config.get('EMBED_PRODUCT_FILTERING'):
+            return
+        embed_products = self.get_permitted_products()
+        for item in items:
+            self.permission_embeds_in_item(item, embed_products)
+
+    def get_product_items_search(self, product, size):
+        """Get search for latest items of given product.
+
+        :param product: product
+        :param size: number of items
+        """
         search = SearchQuery()
         self.prefill_search_args(search)
         self.prefill_search_items(search)
         search.args['size'] = size
-
-        product = get_resource_service('products').find_one(req=None, _id=product_id)
-
-        if not product:
-            return
+        search.args['aggs'] = False
 
         search.query['bool']['must'].append({
             "bool": {
@@ -182,17 +231,36 @@ class WireSearchService(BaseSearchService):
 
         self.gen_source_from_search(search)
         search.source['post_filter'] = {'bool': {'must': []}}
-        internal_req = self.get_internal_request(search)
-        docs = list(self.internal_get(internal_req, None))
-        if app.config.get("EMBED_PRODUCT_FILTERING"):
-            for item in docs:
-                self.permission_embeds_in_item(item, self.get_permitted_products())
-
-        return docs
+        return search
 
     def get_navigation_story_count(self, navigations, section, company, user):
         """Get story count by navigation"""
+        search = self.get_navigation_story_count_search(navigations, section, company, user)
 
+        try:
+            results = self.msearch([search])[0]
+            buckets = results.hits['aggregations']['navigations']['buckets']
+            for navigation in navigations:
+                navigation_id = navigation.get('_id')
+                doc_count = buckets.get(str(navigation_id), {}).get('doc_count', 0)
+                if doc_count > 0:
+                    navigation['story_count'] = doc_count
+
+        except Exception as exc:
+            logger.error(
+                'Error in get_navigation_story_count for query: {}'.format(json.dumps(search.source)),
+                exc,
+                exc_info=True
+            )
+
+    def get_navigation_story_count_search(self, navigations, section, company, user):
+        """Get search counting stories for every navigation using filters aggregation.
+
+        :param navigations: list of navigations
+        :param section: section id
+        :param company: user company
+        :param user: user
+        """
         search = SearchQuery()
         self.prefill_search_args(search)
         self.prefill_search_items(search)
@@ -222,29 +290,12 @@ class WireSearchService(BaseSearchService):
             if navigation_filter['bool']['should']:
                 aggs['navigations']['filters']['filters'][str(navigation_id)] = navigation_filter
 
-        source = {
+        search.source = {
             'query': search.query,
             'aggs': aggs,
             'size': 0
         }
-        req = ParsedRequest()
-        req.args = {'source': json.dumps(source)}
-
-        try:
-            results = self.internal_get(req, None)
-            buckets = results.hits['aggregations']['navigations']['buckets']
-            for navigation in navigations:
-                navigation_id = navigation.get('_id')
-                doc_count = buckets.get(str(navigation_id), {}).get('doc_count', 0)
-                if doc_count > 0:
-                    navigation['story_count'] = doc_count
-
-        except Exception as exc:
-            logger.error(
-                'Error in get_navigation_story_count for query: {}'.format(json.dumps(source)),
-                exc,
-                exc_info=True
-            )
+        return search
 
     def get_matching_topics(self, item_id, topics, users, companies):
         """ Returns a list of topic ids matching to the given item_id
@@ -354,19 +405,66 @@ class WireSearchService(BaseSearchService):
 
         return topic_matches
 
+    def get_topic_percolator_query(self, topic):
+        """ Returns the query to register in the topics percolator
+
+        Permissions and created range are left out as these depend on time
+        or user settings, these are applied for matching topics by :meth:`get_matching_topics`.
+
+        :param topic: topic document
+        :return: elasticsearch query
+        """
+
+        query = {'bool': {'must': []}}
+
+        if topic.get('query'):
+            query['bool']['must'].append(query_string(topic['query']))
+
+        if topic.get('filter'):
+            query['bool']['must'].extend(self._filter_terms(topic['filter']))
+
+        if not query['bool']['must']:
+            return {'match_all': {}}
+
+        return query
+
     def has_permissions(self, item, ignore_latest=False):
         """Test if current user has permissions to view given item."""
+        return item['_id'] in self.get_permitted_ids([item['_id']], ignore_latest)
+
+    def get_permitted_ids(self, item_ids, ignore_latest=False):
+        """Get ids of items which current user has permissions to view using single request.
+
+        Item ids are combined with the permission filters of current user,
+        so it's a single search no matter how many items are tested.
+
+        :param item_ids: list of item ids
+        :param ignore_latest: test also items which are not the latest version
+        :return: set of permitted item ids
+        """
+        item_ids = list(set(item_ids))
+        if not item_ids:
+            return set()
+
         req = ParsedRequest()
         req.args = {
-            'size': 0,
+            'size': len(item_ids),
             'aggs': False,
             'ignore_latest': ignore_latest
         }
+        search = SearchQuery()
         try:
-            results = self.get(req, {'_id': item['_id']})
-            return results.count() > 0
+            self.prefill_search_query(search, req)
+            self.validate_request(search)
+            self.apply_filters(search)
         except Forbidden:
-            return False
+            return set()
+
+        search.query['bool']['must'].append({'ids': {'values': item_ids}})
+        self.gen_source_from_search(search)
+        search.source['_source'] = ['_id']
+        search.source.pop('sort', None)
+        return set(doc['_id'] for doc in self.msearch([search])[0])
 
     def apply_request_filter(self, search):
         """ Generate the filters from request args
@@ -529,6 +627,54 @@ class WireSearchService(BaseSearchService):
 
         return bookmark_users
 
+    def get_bookmarks_audience(self, item_ids, sections):
+        """Get ids of users who bookmarked any of the given items per section using single search.
+
+        Section filters are used as named queries, so every hit lists sections it's visible in.
+
+        :param item_ids: list of ids of items to be searched
+        :param sections: list of section ids
+        :return: dict with set of user ids per section
+        """
+        if not sections:
+            return {}
+
+        filters = get_resource_service('section_filters').get_section_filters_dict()
+        section_queries = []
+        for section in sections:
+            section_query = {'bool': {'must': [{'match_all': {}}], '_name': section}}
+            get_resource_service('section_filters').apply_section_filter(section_query, section, filters)
+            section_queries.append(section_query)
+
+        source = {
+            'query': {
+                'bool': {
+                    'must_not': [
+                        {'term': {'type': 'composite'}},
+                    ],
+                    'must': [
+                        {'terms': {'_id': item_ids}}
+                    ],
+                    'should': section_queries,
+                    'minimum_should_match': 1,
+                }
+            },
+            'size': len(item_ids),
+        }
+        internal_req = ParsedRequest()
+        internal_req.args = {'source': json.dumps(source)}
+        search_results = self.internal_get(internal_req, None)
+
+        audience = {}
+        if not search_results:
+            return audience
+
+        for result in search_results.hits['hits']['hits']:
+            for section in result.get('matched_queries') or []:
+                audience.setdefault(section, set()).update(result['_source'].get('bookmarks') or [])
+
+        return audience
+
     def get_permitted_products(self):
         current_user = get_user(required=True)
         company = get_user_company(current_user)
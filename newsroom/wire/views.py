@@ -1,10 +1,7 @@
 import io
 import flask
-import zipfile
 import superdesk
 import json
-from html import escape
-from bson import ObjectId
 from operator import itemgetter
 from flask import current_app as app, request, jsonify, url_for
 from eve.render import send_response
@@ -12,7 +9,8 @@ from eve.methods.get import get_internal
 from werkzeug.utils import secure_filename
 from flask_babel import gettext
 from superdesk.utc import utcnow
-from .formatters.utils import add_media
+from .formatters.utils import get_media_files
+from .zip_stream import stream_zip, write_zip
 
 from superdesk import get_resource_service
 from newsroom.navigations.navigations import get_navigations_by_company
@@ -33,8 +31,9 @@ from newsroom.template_filters import is_admin_or_internal
 from .search import get_bookmarks_count
 from ..upload import ASSETS_RESOURCE
 from newsroom.wire.block_media.download_items import filter_items_download, block_items_by_embedded_data
+from newsroom.wire.home_cache import get_items_by_card, invalidate_home_cards_with_items
+from newsroom.search import invalidate_aggregations
 
-HOME_ITEMS_CACHE_KEY = 'home_items'
 HOME_EXTERNAL_ITEMS_CACHE_KEY = 'home_external_items'
 
 
@@ -50,8 +49,22 @@ def get_services(user):
 
 
 def set_permissions(item, section='wire', ignore_latest=False):
-    permitted = superdesk.get_resource_service('{}_search'.format(section)).has_permissions(item, ignore_latest)
-    set_item_permission(item, permitted)
+    set_items_permissions([item], section, ignore_latest)
+
+
+def set_items_permissions(items, section='wire', ignore_latest=False):
+    """Set permissions for list of items using single search.
+
+    :param items: list of items
+    :param section: section id
+    :param ignore_latest: test also items which are not the latest version
+    """
+    permitted = superdesk.get_resource_service('{}_search'.format(section)).get_permitted_ids(
+        [item['_id'] for item in items if item],
+        ignore_latest
+    )
+    for item in items:
+        set_item_permission(item, item and item['_id'] in permitted)
 
 
 def set_item_permission(item, permitted=True):
@@ -88,28 +101,6 @@ def get_view_data():
     }
 
 
-def get_items_by_card(cards):
-    if app.cache.get(HOME_ITEMS_CACHE_KEY):
-        return app.cache.get(HOME_ITEMS_CACHE_KEY)
-
-    items_by_card = {}
-    for card in cards:
-        if card['config'].get('product'):
-            items = superdesk.get_resource_service('wire_search'). \
-                get_product_items(ObjectId(card['config']['product']), card['config']['size'])
-            if items:
-                for item in items:
-                    item["body_html"] = escape(item["body_html"])
-            items_by_card[card['label']] = items
-        elif card['type'] == '4-photo-gallery':
-            # Omit external media, let the client manually request these
-            # using '/media_card_external' endpoint
-            items_by_card[card['label']] = None
-
-    app.cache.set(HOME_ITEMS_CACHE_KEY, items_by_card, timeout=1)
-    return items_by_card
-
-
 def get_home_data():
     user = get_user()
     cards = list(query_resource('cards', lookup={'dashboard': 'newsroom'}))
@@ -199,6 +190,36 @@ def search():
     return send_response('wire_search', response)
 
 
+def get_picture_zip_entries(items, formatter, item_type):
+    for item in items:
+        try:
+            picture = formatter.format_item(item, item_type=item_type)
+            file = flask.current_app.media.get(picture['media'], ASSETS_RESOURCE)
+            yield 'baseimage%s' % picture['file_extension'], file
+        except ValueError:
+            pass
+
+
+def get_zip_entries(items, _format, formatter, item_type):
+    """Generate ``(filename, data)`` entries of the download archive."""
+    if formatter.get_mediatype() == 'picture':
+        yield from get_picture_zip_entries(items, formatter, item_type)
+    elif _format == 'downloadninjs':
+        for item in items:
+            formated_item = json.loads(formatter.format_item(item, item_type=item_type))
+            yield from get_media_files(item)
+            yield secure_filename(formatter.format_filename(item)), json.dumps(formated_item).encode('utf-8')
+    elif _format == 'htmlpackage':
+        for item in items:
+            formated_item = formatter.format_item(item, item_type=item_type)
+            yield from get_media_files(item)
+            yield secure_filename(formatter.format_filename(item)), formated_item
+    else:
+        for item in items:
+            parse_dates(item)  # fix for old items
+            yield secure_filename(formatter.format_filename(item)), formatter.format_item(item, item_type=item_type)
+
+
 @blueprint.route('/download/<_ids>')
 @login_required
 def download(_ids):
@@ -206,68 +227,47 @@ def download(_ids):
     _format = flask.request.args.get('format', 'text')
     item_type = get_type()
     items = get_items_for_user_action_block(_ids.split(','), item_type, filter_func=block_items_by_embedded_data)
-    _file = io.BytesIO()
     formatter = app.download_formatters[_format]['formatter']
     mimetype = None
     attachment_filename = '%s-newsroom.zip' % utcnow().strftime('%Y%m%d%H%M')
-    if formatter.get_mediatype() == 'picture':
-        if len(items) == 1:
-            try:
-                picture = formatter.format_item(items[0], item_type=item_type)
-                return flask.redirect(
-                    url_for('upload.get_upload',
-                            media_id=picture['media'],
-                            filename='baseimage%s' % picture['file_extension']))
-            except ValueError:
-                return flask.abort(404)
-        else:
-            with zipfile.ZipFile(_file, mode='w') as zf:
-                for item in items:
-                    try:
-                        picture = formatter.format_item(item, item_type=item_type)
-                        file = flask.current_app.media.get(picture['media'], ASSETS_RESOURCE)
-                        zf.writestr(
-                            'baseimage%s' % picture['file_extension'],
-                            file.read()
-                        )
-                    except ValueError:
-                        pass
-            _file.seek(0)
-    elif _format == 'downloadninjs':
-        with zipfile.ZipFile(_file, mode='w') as zf:
-            for item in items:
-                formated_item = json.loads(formatter.format_item(item, item_type=item_type))
-                add_media(zf, item)
-                zf.writestr(secure_filename(formatter.format_filename(item)),
-                            json.dumps(formated_item).encode('utf-8'))
-        _file.seek(0)
-    elif _format == 'htmlpackage':
-        with zipfile.ZipFile(_file, mode='w') as zf:
-            for item in items:
-                formated_item = formatter.format_item(item, item_type=item_type)
-                add_media(zf, item)
-                zf.writestr(secure_filename(formatter.format_filename(item)), formated_item)
-        _file.seek(0)
-    elif len(items) == 1 or _format == 'monitoring':
+    _file = None
+    if formatter.get_mediatype() == 'picture' and len(items) == 1:
+        try:
+            picture = formatter.format_item(items[0], item_type=item_type)
+            return flask.redirect(
+                url_for('upload.get_upload',
+                        media_id=picture['media'],
+                        filename='baseimage%s' % picture['file_extension']))
+        except ValueError:
+            return flask.abort(404)
+    elif formatter.get_mediatype() != 'picture' and _format not in ['downloadninjs', 'htmlpackage'] and \
+            (len(items) == 1 or _format == 'monitoring'):
         item = items[0]
         args_item = item if _format != 'monitoring' else items
         parse_dates(item)  # fix for old items
+        _file = io.BytesIO()
         _file.write(formatter.format_item(args_item, item_type=item_type))
         _file.seek(0)
         mimetype = formatter.get_mimetype(item)
         attachment_filename = secure_filename(formatter.format_filename(item))
-    else:
-        with zipfile.ZipFile(_file, mode='w') as zf:
-            for item in items:
-                parse_dates(item)  # fix for old items
-                zf.writestr(
-                    secure_filename(formatter.format_filename(item)),
-                    formatter.format_item(item, item_type=item_type)
-                )
-        _file.seek(0)
 
     update_action_list(_ids.split(','), 'downloads', force_insert=True)
     get_resource_service('history').create_history_record(items, 'download', user, request.args.get('type', 'wire'))
+
+    if _file is None and app.config.get('DOWNLOAD_STREAMING'):
+        # write the archive directly to response, it's never held whole in memory
+        return flask.Response(
+            flask.stream_with_context(stream_zip(get_zip_entries(items, _format, formatter, item_type))),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': 'attachment; filename=%s' % attachment_filename,
+                'Cache-Control': 'no-cache',
+            },
+            direct_passthrough=True,
+        )
+    elif _file is None:
+        _file = write_zip(get_zip_entries(items, _format, formatter, item_type))
+
     return flask.send_file(_file, mimetype=mimetype, attachment_filename=attachment_filename, as_attachment=True,
                            cache_timeout=0)
 
@@ -346,6 +346,8 @@ def remove_wire_items():
         items_service.on_deleted(doc)
         versions_service.on_item_deleted(doc)
 
+    invalidate_home_cards_with_items(ids)
+    invalidate_aggregations()
     push_notification('items_deleted', ids=ids)
 
     return flask.jsonify(), 200
@@ -425,7 +427,5 @@ def item(_id):
 def items(_ids):
     item_ids = _ids.split(',')
     items = superdesk.get_resource_service('wire_search').get_items(item_ids)
-    for item in items:
-        set_permissions(item, 'wire', False if flask.request.args.get('ignoreLatest') == 'false' else True)
-
+    set_items_permissions(items.docs, 'wire', False if flask.request.args.get('ignoreLatest') == 'false' else True)
     return jsonify(items.docs), 200
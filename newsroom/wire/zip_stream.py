@@ -0,0 +1,129 @@
+"""
+Zip archives for downloads
+--------------------------
+
+Archives are built from ``(filename, data)`` entries, where data is either
+``str``/``bytes`` or a file like object (e.g. media from ``app.media``).
+File like objects are copied in fixed size chunks so media is never held whole in memory.
+
+File like objects which can't be read are logged and left out of the archive,
+if reading fails after some data was written the entry is kept truncated.
+"""
+
+import io
+import logging
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ZipSink(io.RawIOBase):
+    """Unseekable file object collecting the data written by :class:`zipfile.ZipFile`.
+
+    As it's not seekable zipfile writes data descriptors after every entry,
+    so the written data can be sent to client right away.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def pop(self):
+        """Return and clear the data written since last call."""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def is_file(data):
+    return hasattr(data, 'read')
+
+
+def read_chunk(name, data, chunk_size):
+    try:
+        return data.read(chunk_size)
+    except Exception as exc:
+        logger.error('Error reading file %s for zip: %s', name, exc)
+        return None
+
+
+def write_file(zf, name, data, chunk_size=CHUNK_SIZE):
+    """Copy file like object into archive entry, yielding after every chunk.
+
+    First chunk is read before the entry is created, so files which can't be read are skipped.
+
+    :param zf: :class:`zipfile.ZipFile` instance
+    :param name: entry filename
+    :param data: file like object
+    :param chunk_size: size of chunks
+    """
+    chunk = read_chunk(name, data, chunk_size)
+    if chunk is None:
+        return
+
+    with zf.open(name, mode='w', force_zip64=True) as dest:
+        while chunk:
+            dest.write(chunk)
+            yield
+            chunk = read_chunk(name, data, chunk_size)
+
+
+def write_zip(entries, chunk_size=CHUNK_SIZE):
+    """Write zip archive with given entries into memory.
+
+    :param entries: iterable of ``(filename, data)``
+    :param chunk_size: size of chunks used to copy file like objects
+    :return: :class:`io.BytesIO` with the archive
+    """
+    _file = io.BytesIO()
+    with zipfile.ZipFile(_file, mode='w') as zf:
+        for name, data in entries:
+            if is_file(data):
+                for _written in write_file(zf, name, data, chunk_size):
+                    pass
+            else:
+                zf.writestr(name, data)
+    _file.seek(0)
+    return _file
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """Generate zip archive with given entries chunk by chunk.
+
+    Entries are consumed lazily, so only the current chunk is kept in memory
+    (and current entry if it's not a file like object).
+
+    :param entries: iterable of ``(filename, data)``
+    :param chunk_size: size of chunks used to copy file like objects
+    """
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, mode='w') as zf:
+        for name, data in entries:
+            if is_file(data):
+                for _written in write_file(zf, name, data, chunk_size):
+                    yield from _pop(sink)
+            else:
+                zf.writestr(name, data)
+            yield from _pop(sink)
+
+    yield from _pop(sink)
+
+
+def _pop(sink):
+    data = sink.pop()
+    if data:
+        yield data
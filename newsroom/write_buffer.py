@@ -0,0 +1,171 @@
+"""
+Buffered writes
+---------------
+
+Api audit and history records are created on the read path, so instead of
+writing these while handling the request they are collected in a bounded
+per process buffer and inserted in batches by a background thread,
+once ``WRITE_BUFFER_BATCH_SIZE`` records are buffered or every ``WRITE_BUFFER_FLUSH_INTERVAL`` seconds.
+
+When the buffer is full new records are dropped and counted.
+Buffered records are flushed on process exit.
+
+With ``WRITE_BUFFER_ENABLED`` off records are written right away.
+"""
+
+import os
+import atexit
+import logging
+import threading
+import collections
+
+import pymongo.errors
+import werkzeug.exceptions
+
+from flask import current_app as app
+from superdesk import get_resource_service
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer():
+    """Bounded buffer of ``(resource, doc)`` records flushed in batches by a background thread.
+
+    :param app: flask app used for app context when writing
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.max_size = app.config.get('WRITE_BUFFER_MAX_SIZE', 10000)
+        self.batch_size = app.config.get('WRITE_BUFFER_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('WRITE_BUFFER_FLUSH_INTERVAL', 5)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.records = collections.deque()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.thread = None
+        self.pid = None
+        self.stopped = False
+
+    def add(self, resource, docs):
+        """Add docs for given resource to buffer.
+
+        :param resource: resource name
+        :param docs: list of docs
+        :return: number of dropped docs
+        """
+        with self.lock:
+            self._start()
+            free = max(self.max_size - len(self.records), 0)
+            dropped = max(len(docs) - free, 0)
+            if dropped:
+                if not self.dropped:
+                    logger.warning('Write buffer is full, dropping %s records', resource)
+                self.dropped += dropped
+                docs = docs[:free]
+            self.records.extend((resource, doc) for doc in docs)
+            if len(self.records) >= self.batch_size:
+                self.wakeup.set()
+            return dropped
+
+    def flush(self):
+        """Write all buffered records in batches."""
+        while True:
+            with self.lock:
+                batch = [self.records.popleft() for _i in range(min(self.batch_size, len(self.records)))]
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout=10):
+        """Stop the background thread and flush the remaining records."""
+        self.stopped = True
+        self.wakeup.set()
+        if self.thread is not None and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        return {
+            'buffered': len(self.records),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def _start(self):
+        # thread is not inherited by forked worker processes, so check it's running in this process
+        if self.pid == os.getpid() and self.thread is not None and self.thread.is_alive():
+            return
+        self.pid = os.getpid()
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name='write-buffer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush write buffer')
+
+    def _write(self, batch):
+        docs_by_resource = collections.OrderedDict()
+        for resource, doc in batch:
+            docs_by_resource.setdefault(resource, []).append(doc)
+
+        with self.app.app_context():
+            for resource, docs in docs_by_resource.items():
+                try:
+                    write_docs(resource, docs)
+                    self.written += len(docs)
+                except Exception:
+                    self.failed += len(docs)
+                    logger.exception('Failed to write %d %s records', len(docs), resource)
+
+
+def get_write_buffer():
+    if 'write_buffer' not in app.extensions:
+        write_buffer = WriteBuffer(app._get_current_object())
+        atexit.register(write_buffer.stop)
+        app.extensions['write_buffer'] = write_buffer
+    return app.extensions['write_buffer']
+
+
+def write_docs(resource, docs):
+    """Insert docs for given resource, skipping docs which already exist.
+
+    Docs are inserted to mongo first and indexed in elastic afterwards, so when the batch
+    fails in mongo docs are written one by one and these which already exist in mongo
+    are indexed in elastic again, as those inserted before the failure are not indexed yet.
+
+    :param resource: resource name
+    :param docs: list of docs
+    """
+    service = get_resource_service(resource)
+    try:
+        service.backend.create(service.datasource, docs)
+    except (werkzeug.exceptions.Conflict, pymongo.errors.BulkWriteError):
+        if len(docs) > 1:
+            for doc in docs:
+                write_docs(resource, [doc])
+            return
+        # indexing existing doc in elastic replaces it, so it's safe to do
+        logger.info('%s record %s exists in mongo, indexing it', resource, docs[0].get('_id'))
+        service.backend.create_in_search(service.datasource, docs)
+
+
+def buffered_write(resource, docs):
+    """Write docs for given resource via write buffer if enabled, otherwise right away.
+
+    :param resource: resource name
+    :param docs: list of docs
+    """
+    if app.config.get('WRITE_BUFFER_ENABLED'):
+        get_write_buffer().add(resource, docs)
+    else:
+        write_docs(resource, docs)
@@ -0,0 +1,31 @@
+"""
+Benchmarks
+----------
+
+Benchmarks are not collected with the functional tests, run them explicitly::
+
+    pytest tests/benchmarks -o python_files='bench_*.py' -s
+
+Results are printed and appended as json into ``BENCHMARK_RESULTS_DIR`` (defaults to ``benchmark_results``),
+using the helpers from :mod:`newsroom.benchmarks`.
+"""
+
+import os
+import json
+
+from newsroom.benchmarks import save_results
+
+
+def get_results_dir():
+    return os.environ.get('BENCHMARK_RESULTS_DIR', 'benchmark_results')
+
+
+def report(name, results):
+    """Print benchmark results and store these as json.
+
+    :param name: benchmark name, used as a file name
+    :param results: json serializable results
+    """
+    print(json.dumps({name: results}, indent=2))
+    os.makedirs(get_results_dir(), exist_ok=True)
+    save_results(results, os.path.join(get_results_dir(), '%s.json' % name))
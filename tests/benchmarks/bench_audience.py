@@ -0,0 +1,46 @@
+from bson import ObjectId
+from pytest import mark
+
+from newsroom.benchmarks import count_queries, timed
+from newsroom.push import get_item_audience, get_notified_sections
+from newsroom.utils import get_user_dict, get_company_dict, get_users_by_ids
+from . import report
+
+results = {}
+
+
+@mark.parametrize('users_count', [1000, 10000])
+def test_item_audience(app, users_count):
+    company_ids = app.data.insert('companies', [{'name': 'Bench co.', 'is_enabled': True}])
+    users = [{
+        '_id': ObjectId(),
+        'email': 'user%d@example.com' % i,
+        'first_name': 'User',
+        'is_enabled': True,
+        'company': company_ids[0],
+    } for i in range(users_count)]
+    for i in range(0, users_count, 1000):
+        app.data.insert('users', users[i:i + 1000])
+
+    item = {'_id': 'bench-item-2', 'type': 'text', 'ancestors': ['bench-item-1']}
+    app.data.insert('items', [{'_id': 'bench-item-1', 'type': 'text', 'headline': 'Bench', 'bookmarks': [
+        str(user['_id']) for user in users[:5]
+    ]}])
+    for user in users[5:25]:
+        app.data.insert('history', docs=[{'_id': 'bench-item-1', 'version': '1'}], action='download', user=user)
+
+    stats = {}
+    with app.test_request_context():
+        with count_queries() as queries, timed(stats, 'all_users_ms'):
+            get_user_dict()
+            get_company_dict()
+        stats['all_users_queries'] = queries
+
+        with count_queries() as queries, timed(stats, 'audience_ms'):
+            audience = get_item_audience(item, get_notified_sections())
+            users_dict = get_users_by_ids(list(set().union(*audience.values())))
+        stats['audience_queries'] = queries
+
+    assert 25 == len(users_dict)
+    results[users_count] = stats
+    report('item_audience', results)
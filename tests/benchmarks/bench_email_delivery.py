@@ -0,0 +1,34 @@
+from pytest import mark
+
+from newsroom.email_delivery import deliver_emails, smtp_pool
+from newsroom.benchmarks import timed
+from tests.smtp_server import local_smtp_server
+from . import report
+
+results = {}
+
+
+@mark.parametrize('count', [100, 1000])
+def test_email_delivery(app, count):
+    messages = [{
+        'to': ['user{}@example.com'.format(i)],
+        'subject': 'Benchmark',
+        'text_body': 'Body',
+    } for i in range(count)]
+    stats = {}
+
+    with local_smtp_server(app) as handler:
+        with timed(stats, 'connection_per_email_ms'):
+            for message in messages:
+                deliver_emails([message])
+                smtp_pool.close()
+
+        with timed(stats, 'pooled_connection_ms'):
+            deliver_emails(messages)
+        smtp_pool.close()
+
+    stats['received'] = len(handler.messages)
+    stats['connections'] = len(handler.peers)
+    results[count] = stats
+    report('email_delivery', results)
+    assert count * 2 == len(handler.messages)
@@ -0,0 +1,42 @@
+from unittest.mock import patch
+
+from bson import ObjectId
+from superdesk import get_resource_service
+
+from newsroom.benchmarks import count_queries, timed
+from . import report
+
+CARDS_COUNT = 12
+
+
+def test_home_cards(app):
+    products = [{
+        '_id': ObjectId(),
+        'name': 'Product %d' % i,
+        'sd_product_id': 'product-%d' % i,
+        'is_enabled': True,
+        'product_type': 'wire',
+    } for i in range(CARDS_COUNT)]
+    app.data.insert('products', products)
+    app.data.insert('items', [{
+        '_id': 'bench-card-item-%d-%d' % (i, j),
+        'type': 'text',
+        'headline': 'Bench',
+        'products': [{'code': product['sd_product_id']}],
+    } for i, product in enumerate(products) for j in range(6)])
+
+    cards = [(product['_id'], 6) for product in products]
+    service = get_resource_service('wire_search')
+    stats = {}
+    with app.test_request_context(), patch('newsroom.wire.search.get_user', return_value=None):
+        with count_queries() as queries, timed(stats, 'sequential_ms'):
+            sequential = [service.get_product_items(product_id, size) for product_id, size in cards]
+        stats['sequential_queries'] = queries
+
+        with count_queries() as queries, timed(stats, 'msearch_ms'):
+            batched = service.get_products_items(cards)
+        stats['msearch_queries'] = queries
+
+    assert sequential == batched
+    assert 1 == stats['msearch_queries']['elastic']
+    report('home_cards', stats)
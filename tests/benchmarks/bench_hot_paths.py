@@ -0,0 +1,9 @@
+from pytest import mark
+
+from newsroom.benchmarks import SCENARIOS, run_scenario
+from . import report
+
+
+@mark.parametrize('scenario', list(SCENARIOS))
+def test_hot_path(app, scenario):
+    report('hot_paths', run_scenario(scenario, iterations=50, items=5000, users=100, topics=1000))
@@ -0,0 +1,44 @@
+import newsroom
+
+from bson import ObjectId
+from pytest import mark
+from superdesk import get_resource_service
+from superdesk.utc import utcnow
+
+from newsroom.benchmarks import count_queries, timed
+from newsroom.notifications import save_user_notifications
+from . import report
+
+results = {}
+
+
+def create_one_by_one(users, item):
+    """Previous implementation inserting notifications one at a time."""
+    service = get_resource_service('notifications')
+    now = utcnow()
+    for user in users:
+        newsroom.Service.create(service, [{
+            '_id': '{}_{}'.format(user, item), 'created': now, 'user': user, 'item': item,
+        }])
+
+
+@mark.parametrize('recipients', [1000, 10000])
+def test_notifications_bulk_write(app, recipients):
+    users = [ObjectId() for _i in range(recipients)]
+    stats = {}
+
+    with count_queries() as queries, timed(stats, 'one_by_one_ms'):
+        create_one_by_one(users, 'before')
+    stats['one_by_one_mongo_requests'] = queries['mongo']
+
+    with count_queries() as queries, timed(stats, 'bulk_insert_ms'):
+        save_user_notifications([(user, 'after', 'history_matches') for user in users])
+    stats['bulk_insert_mongo_requests'] = queries['mongo']
+
+    with count_queries() as queries, timed(stats, 'bulk_update_ms'):
+        save_user_notifications([(user, 'after', 'history_matches') for user in users])
+    stats['bulk_update_mongo_requests'] = queries['mongo']
+
+    results[recipients] = stats
+    report('notifications', results)
+    assert 2 * recipients == app.data.get_mongo_collection('notifications').count_documents({})
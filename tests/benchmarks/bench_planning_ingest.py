@@ -0,0 +1,100 @@
+from copy import deepcopy
+
+from flask import json
+from pytest import mark
+
+from newsroom.benchmarks import count_queries, timed
+from newsroom.push import get_coverages
+from newsroom.utils import get_entity_or_404
+from . import report
+
+results = {}
+
+EVENT = {
+    'guid': 'bench-event',
+    'type': 'event',
+    'state': 'scheduled',
+    'pubstatus': 'usable',
+    'name': 'Multi day event',
+    'slugline': 'Multi day event',
+    'dates': {
+        'start': '2018-05-28T05:00:00+0000',
+        'end': '2018-06-28T06:00:00+0000',
+        'tz': 'Australia/Sydney',
+    },
+    'calendars': [],
+    'anpa_category': [],
+    'subject': [],
+}
+
+
+def get_planning(guid, coverages_count, completed=False):
+    coverages = []
+    for i in range(coverages_count):
+        coverage = {
+            'coverage_id': '{}-coverage-{}'.format(guid, i),
+            'workflow_status': 'completed' if completed else 'draft',
+            'planning': {
+                'g2_content_type': 'text',
+                'slugline': 'Coverage {}'.format(i),
+                'scheduled': '2018-06-{:02d}T10:00:00+0000'.format(i % 28 + 1),
+            },
+            'news_coverage_status': {'name': 'coverage intended'},
+        }
+        if completed:
+            coverage['deliveries'] = [{'item_id': '{}-item-{}'.format(guid, i), 'item_state': 'published'}]
+        coverages.append(coverage)
+
+    return {
+        'guid': guid,
+        'type': 'planning',
+        'event_item': EVENT['guid'],
+        'state': 'scheduled',
+        'pubstatus': 'usable',
+        'slugline': 'Planning',
+        'planning_date': '2018-05-28T10:51:52+0000',
+        'coverages': coverages,
+    }
+
+
+def get_coverages_linear(planning_items, original_coverages):
+    """Previous coverage lookup scanning the original coverages for every coverage."""
+    for planning_item in planning_items:
+        for coverage in planning_item.get('coverages') or []:
+            next((o for o in original_coverages if o['coverage_id'] == coverage['coverage_id']), {})
+
+
+@mark.parametrize('coverages_count', [500])
+def test_planning_ingest(client, app, coverages_count):
+    planning_count = 10
+    per_planning = coverages_count // planning_count
+    client.post('/push', data=json.dumps(EVENT), content_type='application/json')
+    app.data.insert('items', [
+        {'_id': 'bench-planning-{}-item-{}'.format(p, i), 'type': 'text', 'headline': 'Item'}
+        for p in range(planning_count) for i in range(per_planning)
+    ])
+
+    stats = {}
+    plannings = [get_planning('bench-planning-{}'.format(p), per_planning) for p in range(planning_count)]
+    with count_queries() as queries, timed(stats, 'create_ms'):
+        for planning in plannings:
+            client.post('/push', data=json.dumps(planning), content_type='application/json')
+    stats['create_queries'] = queries
+
+    agenda = get_entity_or_404(EVENT['guid'], 'agenda')
+    assert coverages_count == len(agenda['coverages'])
+
+    plannings = [get_planning('bench-planning-{}'.format(p), per_planning, True) for p in range(planning_count)]
+    with count_queries() as queries, timed(stats, 'complete_ms'):
+        for planning in plannings:
+            client.post('/push', data=json.dumps(planning), content_type='application/json')
+    stats['complete_queries'] = queries
+
+    agenda = get_entity_or_404(EVENT['guid'], 'agenda')
+    with timed(stats, 'reconcile_linear_ms'):
+        get_coverages_linear(agenda['planning_items'], agenda['coverages'])
+    with app.test_request_context(), timed(stats, 'reconcile_ms'):
+        get_coverages(deepcopy(agenda['planning_items']), agenda['coverages'], None)
+
+    results[coverages_count] = stats
+    report('planning_ingest', results)
@@ -0,0 +1,73 @@
+import random
+
+from bson import ObjectId
+from pytest import mark
+from superdesk import get_resource_service
+
+from newsroom.topics.topics import get_wire_notification_topics
+from newsroom.topics.percolator import index_topics
+from newsroom.utils import get_user_dict, get_company_dict
+from newsroom.benchmarks import timed
+from . import report
+
+WORDS = [
+    'police', 'election', 'budget', 'weather', 'cricket', 'football', 'market', 'shares', 'health', 'court',
+    'fire', 'flood', 'minister', 'council', 'school', 'hospital', 'drought', 'energy', 'mining', 'tourism',
+]
+
+results = {}
+
+
+def seed_topics(app, count, users):
+    topics = [{
+        'label': 'topic %d' % i,
+        'query': ' '.join(random.sample(WORDS, 2)),
+        'notifications': True,
+        'topic_type': 'wire',
+        'user': random.choice(users),
+    } for i in range(count)]
+    for i in range(0, count, 1000):
+        app.data.insert('topics', topics[i:i + 1000])
+
+
+@mark.parametrize('topics_count', [1000, 10000, 50000])
+def test_topic_matching(app, topics_count):
+    random.seed(topics_count)
+    app.config['WIRE_TOPICS_PERCOLATOR'] = True
+    company_ids = app.data.insert('companies', [{'name': 'Bench co.', 'is_enabled': True}])
+    users = app.data.insert('users', [{
+        '_id': ObjectId(),
+        'email': 'user%d@example.com' % i,
+        'first_name': 'User',
+        'last_name': str(i),
+        'is_enabled': True,
+        'user_type': 'administrator',
+        'company': company_ids[0],
+    } for i in range(100)])
+    seed_topics(app, topics_count, users)
+    app.data.insert('items', [{'_id': 'bench', 'type': 'text', 'headline': 'Budget and police', 'body_html': ''}])
+
+    service = get_resource_service('wire_search')
+    user_dict = get_user_dict()
+    company_dict = get_company_dict()
+    stats = {}
+
+    with timed(stats, 'aggregation_ms'):
+        all_topics = get_wire_notification_topics()
+        agg_matches = service.get_matching_topics('bench', all_topics, user_dict, company_dict)
+
+    with timed(stats, 'percolator_index_ms'):
+        index_topics()
+
+    with timed(stats, 'percolator_ms'):
+        candidates = get_wire_notification_topics('bench')
+        matches = service.get_matching_topics('bench', candidates, user_dict, company_dict)
+
+    stats['matches'] = len(matches)
+    stats['candidates'] = len(candidates)
+    results[topics_count] = stats
+    report('topic_matching', results)
+
+    # aggregation request might fail for large number of topics
+    if agg_matches:
+        assert sorted(map(str, matches)) == sorted(map(str, agg_matches))
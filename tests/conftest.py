@@ -20,6 +20,9 @@ def update_config(conf):
     conf['BABEL_DEFAULT_TIMEZONE'] = 'Europe/Prague'
     conf['DEFAULT_TIMEZONE'] = 'Europe/Prague'
     conf['NEWS_API_ENABLED'] = True
+    conf['RESOURCE_CACHE'] = False  # fixtures are inserted directly to mongo
+    conf['WRITE_BUFFER_ENABLED'] = False
+    conf['AGGREGATIONS_CACHE'] = False  # fixtures are inserted directly to elastic
     return conf
 
 
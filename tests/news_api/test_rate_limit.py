@@ -0,0 +1,117 @@
+import time
+import uuid
+
+import redis
+import pytest
+
+from bson import ObjectId
+from pytest import fixture
+from unittest.mock import patch
+
+from newsroom.news_api.api_tokens.rate_limit import RedisBackend
+
+company_id = ObjectId('5c3eb6975f627db90c84093c')
+
+
+@fixture(autouse=True)
+def init(app):
+    app.config['RATE_LIMIT_REQUESTS'] = 2
+    app.config['RATE_LIMIT_PERIOD'] = 60
+    app.data.insert('companies', [{'_id': company_id, 'name': 'Test Company', 'is_enabled': True}])
+    app.data.insert('items', [{'_id': '111', 'pubstatus': 'usable', 'headline': 'Headline', 'body_html': '<p></p>'}])
+    app.data.insert('news_api_tokens', [{'company': company_id, 'enabled': True}])
+
+
+def get_token(app):
+    return app.data.mongo.find_one('news_api_tokens', req=None, company=company_id)
+
+
+def get_item(client, token):
+    return client.get('api/v1/news/item/111?format=NINJSFormatter', headers={'Authorization': token['_id']})
+
+
+def test_memory_rate_limit(client, app):
+    app.config['RATE_LIMIT_BACKEND'] = 'memory'
+    token = get_token(app)
+
+    response = get_item(client, token)
+    assert 200 == response.status_code
+    assert '2' == response.headers['X-RateLimit-Limit']
+    assert '1' == response.headers['X-RateLimit-Remaining']
+    assert 0 < int(response.headers['X-RateLimit-Reset']) <= 60
+
+    response = get_item(client, token)
+    assert 200 == response.status_code
+    assert '0' == response.headers['X-RateLimit-Remaining']
+
+    response = get_item(client, token)
+    assert 429 == response.status_code
+    assert 0 < int(response.headers['Retry-After']) <= 60
+
+    # usage is stored on the token only once per snapshot interval
+    assert 1 == get_token(app)['rate_limit_requests']
+
+
+def test_mongo_rate_limit(client, app):
+    app.config['RATE_LIMIT_BACKEND'] = 'mongo'
+    token = get_token(app)
+
+    response = get_item(client, token)
+    assert 200 == response.status_code
+    assert '1' == response.headers['X-RateLimit-Remaining']
+
+    response = get_item(client, token)
+    assert 200 == response.status_code
+    assert 2 == get_token(app)['rate_limit_requests']
+
+    response = get_item(client, token)
+    assert 429 == response.status_code
+    assert 'Retry-After' in response.headers
+
+
+@fixture
+def redis_client(app):
+    client = redis.from_url(app.config['REDIS_URL'])
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        pytest.skip('redis is not available')
+    return client
+
+
+def test_redis_backend_sliding_window(redis_client):
+    backend = RedisBackend(redis_client)
+    key = uuid.uuid4().hex
+
+    limit = backend.hit(key, 2, 0.5)
+    assert limit.allowed
+    assert 1 == limit.remaining
+    assert 1 == limit.reset
+
+    assert backend.hit(key, 2, 0.5).allowed
+    limit = backend.hit(key, 2, 0.5)
+    assert not limit.allowed
+    assert 0 == limit.remaining
+
+    # oldest hit leaves the window
+    time.sleep(0.6)
+    limit = backend.hit(key, 2, 0.5)
+    assert limit.allowed
+    assert 1 == limit.remaining
+
+    assert backend.should_snapshot(key, 60)
+    assert not backend.should_snapshot(key, 60)
+    redis_client.delete('news_api:rate_limit:{}'.format(key), 'news_api:rate_limit_snapshot:{}'.format(key))
+
+
+def test_redis_failure_falls_back_to_mongo(client, app):
+    app.config['RATE_LIMIT_BACKEND'] = 'redis'
+    token = get_token(app)
+
+    with patch.object(RedisBackend, 'hit', side_effect=redis.ConnectionError('down')):
+        assert 200 == get_item(client, token).status_code
+        assert 200 == get_item(client, token).status_code
+        response = get_item(client, token)
+
+    assert 429 == response.status_code
+    assert 2 == get_token(app)['rate_limit_requests']
@@ -0,0 +1,72 @@
+from bson import ObjectId
+from datetime import datetime
+from flask import g
+from lxml import etree
+from pymongo.collection import Collection
+from pytest import fixture
+
+from newsroom.news_api.news.syndicate.service import NewsAPISyndicateService
+
+company_id = ObjectId('5c3eb6975f627db90c84093c')
+
+
+@fixture(autouse=True)
+def init(app):
+    app.config['NEWS_API_IMAGE_PERMISSIONS_ENABLED'] = True
+    app.config['EMBED_PRODUCT_FILTERING'] = True
+    app.data.insert('companies', [{'_id': company_id, 'name': 'Test Company', 'is_enabled': True}])
+    app.data.insert('products', [{
+        '_id': ObjectId('5ab03a87bdd78169bb6d0783'),
+        'name': 'Sample Product',
+        'companies': [str(company_id)],
+        'sd_product_id': 'sd-1',
+        'product_type': 'news_api',
+        'is_enabled': True,
+    }])
+
+
+def insert_items(app, start, count):
+    items = [{
+        '_id': 'item-{}'.format(i),
+        'headline': 'Headline {}'.format(i),
+        'body_html': '<p>body</p>',
+        'pubstatus': 'usable',
+        'firstpublished': datetime(2020, 4, 1, 10),
+        'versioncreated': datetime(2020, 4, 1, 10),
+        'subscribers': [company_id],
+        'associations': {
+            'featuremedia': {
+                'type': 'picture',
+                'products': [{'code': 'sd-1' if i % 2 else 'sd-2'}],
+                'renditions': {'16-9': {'media': 'media-{}'.format(i), 'mimetype': 'image/jpeg'}},
+            },
+        },
+    } for i in range(start, start + count)]
+    app.data.insert('items', items)
+    return {'_items': [{'_id': item['_id']} for item in items]}
+
+
+def count_queries(spy, app, generate, response):
+    with app.test_request_context(path='/atom'):
+        g.user = company_id
+        calls = spy.call_count
+        feed = generate(response)
+        return spy.call_count - calls, etree.fromstring(feed.get_data())
+
+
+def test_feeds_use_constant_number_of_queries(app, mocker):
+    small = insert_items(app, 0, 2)
+    large = insert_items(app, 2, 20)
+    spy = mocker.spy(Collection, 'find')
+    for generate in (NewsAPISyndicateService.generate_atom_feed, NewsAPISyndicateService.generate_rss_feed):
+        small_count, _feed = count_queries(spy, app, generate, small)
+        large_count, _feed = count_queries(spy, app, generate, large)
+        assert small_count == large_count
+
+
+def test_atom_feed_skips_items_with_unpermissioned_featuremedia(app, mocker):
+    response = insert_items(app, 0, 4)
+    spy = mocker.spy(Collection, 'find')
+    _count, feed = count_queries(spy, app, NewsAPISyndicateService.generate_atom_feed, response)
+    ids = [elem.text for elem in feed.findall('{http://www.w3.org/2005/Atom}entry/{http://www.w3.org/2005/Atom}id')]
+    assert ['item-1', 'item-3'] == ids
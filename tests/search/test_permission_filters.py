@@ -0,0 +1,178 @@
+from flask import g
+from hypothesis import assume, given, settings, HealthCheck, strategies as st
+from pytest import fixture
+from superdesk import get_resource_service
+
+from newsroom import auth  # noqa
+from newsroom.resource_cache import invalidate
+from newsroom.search import SearchQuery, BaseSearchService, get_permission_filter_cache, get_permission_filter_stats
+
+from .fixtures import COMPANY_1, COMPANY_2, NAV_1, NAV_3, PROD_1, PROD_2, PROD_3, SECTION_FILTERS
+
+PRODUCT_IDS = [str(PROD_1), str(PROD_2), str(PROD_3)]
+
+products = st.lists(
+    st.fixed_dictionaries({
+        '_id': st.sampled_from(PRODUCT_IDS),
+        'sd_product_id': st.one_of(st.none(), st.text(min_size=1, max_size=10)),
+        'query': st.one_of(st.none(), st.text(min_size=1, max_size=20)),
+    }),
+    max_size=3,
+    unique_by=lambda product: product['_id'],
+)
+
+companies = st.one_of(st.none(), st.fixed_dictionaries({
+    '_id': st.sampled_from([COMPANY_1, COMPANY_2]),
+    'company_type': st.sampled_from([None, 'internal', 'public', 'test']),
+    'archive_access': st.booleans(),
+}))
+
+search_args = st.fixed_dictionaries({}, optional={
+    'product': st.sampled_from(PRODUCT_IDS),
+    'requested_products': st.lists(st.sampled_from(PRODUCT_IDS), min_size=1, max_size=2, unique=True),
+})
+
+searches = st.fixed_dictionaries({
+    'is_admin': st.booleans(),
+    'user': st.fixed_dictionaries({'user_type': st.sampled_from(['administrator', 'internal', 'public'])}),
+    'company': companies,
+    'section': st.sampled_from(['wire', 'agenda', 'am_news']),
+    'navigation_ids': st.lists(st.sampled_from([str(NAV_1), str(NAV_3)]), max_size=2, unique=True),
+    'products': products,
+    'args': search_args,
+})
+
+
+@st.composite
+def searches_with_same_products(draw):
+    """Pair of searches sharing all but one field, which is drawn again.
+
+    Products with the same ``_id`` are the same in both searches, like products loaded from db.
+    Fields not used by permission filters differ.
+    """
+    catalog = {
+        _id: draw(st.fixed_dictionaries({
+            '_id': st.just(_id),
+            'sd_product_id': st.one_of(st.none(), st.text(min_size=1, max_size=10)),
+            'query': st.one_of(st.none(), st.text(min_size=1, max_size=20)),
+        })) for _id in PRODUCT_IDS
+    }
+    fields = {
+        'is_admin': st.booleans(),
+        'user_type': st.sampled_from(['administrator', 'internal', 'public']),
+        'company': companies,
+        'section': st.sampled_from(['wire', 'agenda', 'am_news']),
+        'navigation_ids': st.lists(st.sampled_from([str(NAV_1), str(NAV_3)]), max_size=2, unique=True),
+        'product_ids': st.lists(st.sampled_from(PRODUCT_IDS), max_size=3, unique=True),
+        'args': search_args,
+    }
+    first = {name: draw(strategy) for name, strategy in fields.items()}
+    second = dict(first)
+    redrawn = draw(st.sampled_from(list(fields)))
+    second[redrawn] = draw(fields[redrawn])
+
+    def get_params(values):
+        company = dict(values['company'], name=draw(st.text(max_size=5))) if values['company'] else None
+        if company and not company['archive_access'] and draw(st.booleans()):
+            del company['archive_access']
+        return {
+            'is_admin': values['is_admin'],
+            'user': {'user_type': values['user_type'], 'first_name': draw(st.text(max_size=5))},
+            'company': company,
+            'section': values['section'],
+            'navigation_ids': values['navigation_ids'],
+            'products': [dict(catalog[_id]) for _id in values['product_ids']],
+            'args': dict(values['args'], q=draw(st.text(max_size=5))),
+        }
+
+    return get_params(first), get_params(second)
+
+
+@fixture(autouse=True)
+def init(app):
+    app.config['RESOURCE_CACHE'] = True
+    app.config['COMPANY_TYPES'] = [
+        {'id': 'internal', 'wire_must': {'term': {'service.code': 'a'}}},
+        {'id': 'public', 'wire_must': {'term': {'service.code': 'b'}}},
+        {'id': 'test', 'wire_must_not': {'term': {'service.code': 'b'}}},
+    ]
+    with app.test_request_context():
+        get_resource_service('section_filters').post([dict(f) for f in SECTION_FILTERS])
+
+
+def get_search(params):
+    search = SearchQuery()
+    for key, value in params.items():
+        setattr(search, key, value)
+    search.query['bool']['must'].append({'term': {'_type': 'items'}})
+    return search
+
+
+@settings(max_examples=100, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(params=searches, limit_days=st.sampled_from([None, 0, 5]))
+def test_compiled_permission_filters_are_same_as_built(app, params, limit_days):
+    service = BaseSearchService()
+    app.extensions.pop('permission_filter_cache', None)
+    with app.test_request_context():
+        g.settings = {'wire_time_limit_days': {'value': limit_days}}
+        expected = get_search(params)
+        service.build_permission_filters(expected)
+
+        for _i in range(2):
+            search = get_search(params)
+            service.apply_permission_filters(search)
+            assert expected.query == search.query
+
+        stats = get_permission_filter_stats()
+        assert 1 == stats['hits']
+        assert 1 == stats['misses']
+        assert 0.5 == stats['hit_ratio']
+
+
+@settings(max_examples=200, deadline=None,
+          suppress_health_check=[HealthCheck.function_scoped_fixture, HealthCheck.filter_too_much])
+@given(pair=searches_with_same_products(), limit_days=st.sampled_from([None, 0, 5]))
+def test_searches_with_same_key_have_same_permission_filters(app, pair, limit_days):
+    service = BaseSearchService()
+    with app.test_request_context():
+        g.settings = {'wire_time_limit_days': {'value': limit_days}}
+        first, second = [get_search(params) for params in pair]
+        assume(service.get_permission_filters_key(first) == service.get_permission_filters_key(second))
+
+        service.build_permission_filters(first)
+        service.build_permission_filters(second)
+        assert first.query == second.query
+
+
+def test_permission_filters_are_compiled_again_after_products_change(app):
+    service = BaseSearchService()
+    params = {
+        'is_admin': False,
+        'user': {'user_type': 'public'},
+        'company': {'_id': COMPANY_2, 'company_type': 'public'},
+        'section': 'wire',
+        'navigation_ids': [],
+        'products': [{'_id': str(PROD_1), 'query': 'service.code:a'}],
+        'args': {},
+    }
+    with app.test_request_context():
+        service.apply_permission_filters(get_search(params))
+        service.apply_permission_filters(get_search(params))
+        invalidate('products')
+        service.apply_permission_filters(get_search(params))
+        assert 1 == get_permission_filter_cache().hits
+        assert 2 == get_permission_filter_cache().misses
+        assert 2 == get_permission_filter_stats()['compiled']
+
+
+def test_permission_filters_are_not_cached_for_overridden_filters(app):
+    class CustomSearchService(BaseSearchService):
+        def apply_products_filter(self, search):
+            search.query['bool']['should'].append({'term': {'custom': True}})
+
+    service = CustomSearchService()
+    with app.test_request_context():
+        search = get_search({'is_admin': True, 'section': 'wire', 'products': [], 'args': {}})
+        service.apply_permission_filters(search)
+        assert [{'term': {'custom': True}}] == search.query['bool']['should']
+        assert 0 == get_permission_filter_stats()['misses']
@@ -0,0 +1,44 @@
+import socket
+
+from contextlib import contextmanager
+from aiosmtpd.controller import Controller
+
+
+class RecordingHandler():
+    """Store received messages and addresses of connected clients."""
+
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.peers.add(session.peer)
+        self.messages.append(envelope)
+        return '250 Message accepted for delivery'
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_smtp_server(app):
+    """Run local SMTP server and configure app mail to use it.
+
+    :param app: app
+    :return: handler with received messages
+    """
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=get_free_port())
+    controller.start()
+    mail = app.extensions['mail']
+    config = (mail.server, mail.port, mail.use_tls, mail.use_ssl, mail.username, mail.suppress)
+    mail.server, mail.port, mail.use_tls, mail.use_ssl, mail.username, mail.suppress = \
+        controller.hostname, controller.port, False, False, None, False
+    try:
+        yield handler
+    finally:
+        mail.server, mail.port, mail.use_tls, mail.use_ssl, mail.username, mail.suppress = config
+        controller.stop()
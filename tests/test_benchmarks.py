@@ -0,0 +1,56 @@
+from newsroom.benchmarks import BenchmarkData, measure, percentile, run_scenario
+
+
+def count_benchmark_docs(app, resource):
+    return app.data.get_mongo_collection(resource).count_documents({'_id': {'$regex': '^benchmark-'}})
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert 50 == percentile(values, 50)
+    assert 95 == percentile(values, 95)
+    assert 100 == percentile(values, 100)
+    assert 0 == percentile([], 50)
+
+
+def test_measure(app):
+    calls = []
+
+    def func():
+        calls.append(app.data.mongo.find_one('users', req=None, _id='foo'))
+
+    results = measure(func, iterations=10, warmup=2, memory_iterations=1)
+    assert 13 == len(calls)
+    assert 10 == results['iterations']
+    assert results['queries']['mongo'] >= 1
+    assert 0 == results['queries']['elastic']
+    assert results['latency_ms']['min'] <= results['latency_ms']['p50'] <= results['latency_ms']['max']
+    assert results['throughput'] > 0
+    assert results['peak_memory_kb'] >= 0
+
+
+def test_benchmark_data_seed_and_cleanup(app):
+    data = BenchmarkData(items=20, companies=2, users=4, products=2, topics=4)
+    data.seed(app)
+    assert 20 == count_benchmark_docs(app, 'items')
+    assert 2 == count_benchmark_docs(app, 'agenda')
+    assert 4 == app.data.get_mongo_collection('users').count_documents({'email': {'$regex': '^benchmark'}})
+
+    data.cleanup(app)
+    assert 0 == count_benchmark_docs(app, 'items')
+    assert 0 == count_benchmark_docs(app, 'agenda')
+    assert 0 == app.data.get_mongo_collection('users').count_documents({'email': {'$regex': '^benchmark'}})
+
+
+def test_run_wire_search_scenario(app):
+    results = run_scenario('wire_search', iterations=2, warmup=1, items=20, companies=2, users=2, topics=2)
+    assert 'wire_search' == results['scenario']
+    assert 2 == results['iterations']
+    assert results['queries']['elastic'] >= 1
+    assert 0 == count_benchmark_docs(app, 'items')
+
+
+def test_run_push_scenario(app):
+    results = run_scenario('push', iterations=2, warmup=1, items=20, companies=2, users=2, topics=2)
+    assert 2 == results['iterations']
+    assert 0 == count_benchmark_docs(app, 'items')
@@ -3,7 +3,8 @@ from time import sleep
 from datetime import datetime, timedelta
 from eve.utils import ParsedRequest
 
-from newsroom.mongo_utils import index_elastic_from_mongo, index_elastic_from_mongo_from_timestamp
+from newsroom.mongo_utils import index_elastic_from_mongo, index_elastic_from_mongo_from_timestamp, \
+    index_elastic_from_mongo_parallel, create_checkpoints, get_checkpoints_collection, AdaptiveBatchSize
 
 from .fixtures import items, init_items, init_auth, init_company  # noqa
 
@@ -111,3 +112,59 @@ def test_index_from_mongo_from_timestamp(app, client):
     index_elastic_from_mongo_from_timestamp('items', timestamp, 'newer')
     sleep(1)
     assert 6 == app.data.elastic.find('items', ParsedRequest(), {}).count()
+
+
+def test_index_from_mongo_parallel(app, client):
+    app.data.insert('items', [{'_id': 'item-{}'.format(i), 'headline': 'Item {}'.format(i)} for i in range(1200)])
+    remove_elastic_index(app)
+    app.data.init_elastic(app)
+    sleep(1)
+
+    index_elastic_from_mongo_parallel(collection='items', workers=1)
+    sleep(1)
+    assert 1200 + len(items) == app.data.elastic.find('items', ParsedRequest(), {}).count()
+    assert 0 == get_checkpoints_collection('items').count_documents({})
+
+
+def test_index_from_mongo_parallel_workers(app, client):
+    app.data.insert('items', [{'_id': 'item-{}'.format(i), 'headline': 'Item {}'.format(i)} for i in range(1200)])
+    remove_elastic_index(app)
+    app.data.init_elastic(app)
+    sleep(1)
+
+    index_elastic_from_mongo_parallel(collection='items', workers=2)
+    sleep(1)
+    assert 1200 + len(items) == app.data.elastic.find('items', ParsedRequest(), {}).count()
+    assert 0 == get_checkpoints_collection('items').count_documents({})
+
+
+def test_index_from_mongo_parallel_resume(app, client):
+    app.data.insert('items', [{'_id': 'item-{}'.format(i), 'headline': 'Item {}'.format(i)} for i in range(1200)])
+    remove_elastic_index(app)
+    app.data.init_elastic(app)
+    sleep(1)
+
+    checkpoints = create_checkpoints('items', None, None, 4)
+    assert 3 == len(checkpoints)
+    assert checkpoints[0]['start'] is None
+    assert checkpoints[-1]['end'] is None
+
+    # first slice is done, second one was interrupted after first item
+    collection = get_checkpoints_collection('items')
+    collection.update_one({'_id': checkpoints[0]['_id']}, {'$set': {'done': True}})
+    collection.update_one({'_id': checkpoints[1]['_id']}, {'$set': {'last_id': checkpoints[1]['start']}})
+
+    index_elastic_from_mongo_parallel(collection='items', workers=1, resume=True)
+    sleep(1)
+    skipped = app.data.get_mongo_collection('items').count_documents({'_id': {'$lt': checkpoints[1]['start']}})
+    assert checkpoints[0]['total'] - skipped - 1 == app.data.elastic.find('items', ParsedRequest(), {}).count()
+
+
+def test_adaptive_batch_size():
+    batch_size = AdaptiveBatchSize(size=100, min_size=10, max_size=200, target=1)
+    assert 125 == batch_size.update(0.1)
+    assert 125 == batch_size.update(1)
+    assert 62 == batch_size.update(3)
+    assert 31 == batch_size.update(0.1, rejected=True)
+    assert 10 == AdaptiveBatchSize(size=10, min_size=10).update(5)
+    assert 200 == AdaptiveBatchSize(size=190, max_size=200).update(0)
@@ -5,10 +5,13 @@ import bson
 import lxml
 import zipfile
 import icalendar
+import tracemalloc
 
 from datetime import timedelta
 from superdesk.utc import utcnow
 
+from newsroom.wire.zip_stream import stream_zip, write_zip, CHUNK_SIZE
+
 from .fixtures import items, init_items, init_auth, agenda_items, init_agenda_items  # noqa
 from .test_push import upload_binary
 
@@ -449,6 +452,76 @@ def test_wire_download(client, app):
     assert history[0].get('section') == 'wire'
 
 
+def test_wire_download_streaming(client, app):
+    app.config['DOWNLOAD_STREAMING'] = True
+    for _format in wire_formats:
+        resp = client.get('/download/%s?format=%s&type=wire' % (','.join(items_ids), _format['format']))
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        assert resp.mimetype == 'application/zip'
+        with zipfile.ZipFile(io.BytesIO(resp.get_data())) as zf:
+            assert _format['filename'] in zf.namelist()
+            if _format.get('test_content'):
+                _format['test_content'](zf.open(_format['filename']).read())
+
+
+class SyntheticMedia():
+    """Media stand-in returning zeros without holding the data in memory."""
+
+    def __init__(self, size):
+        self.remaining = size
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= size
+        return b'\0' * size
+
+
+def test_stream_zip_memory_is_bounded():
+    gigabyte = 1024 * 1024 * 1024
+    entries = [('media%d.bin' % i, SyntheticMedia(gigabyte // 4)) for i in range(4)]
+    entries.append(('item.txt', 'foo'))
+    archive_size = 0
+    tracemalloc.start()
+    try:
+        for chunk in stream_zip(entries):
+            archive_size += len(chunk)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert archive_size > gigabyte
+    assert peak < 2 * CHUNK_SIZE + 1024 * 1024
+
+
+def test_stream_zip_is_valid_archive():
+    data = io.BytesIO()
+    for chunk in stream_zip([('foo.txt', 'foo'), ('bar.bin', io.BytesIO(b'bar' * CHUNK_SIZE)), ('baz', b'baz')]):
+        data.write(chunk)
+
+    with zipfile.ZipFile(data) as zf:
+        assert zf.testzip() is None
+        assert ['foo.txt', 'bar.bin', 'baz'] == zf.namelist()
+        assert b'bar' * CHUNK_SIZE == zf.read('bar.bin')
+
+
+class BrokenMedia():
+    def read(self, size=-1):
+        raise IOError('missing chunk')
+
+
+def test_zip_skips_unreadable_files():
+    entries = [('foo.txt', 'foo'), ('broken.jpg', BrokenMedia()), ('bar.bin', io.BytesIO(b'bar'))]
+    data = io.BytesIO()
+    for chunk in stream_zip(entries):
+        data.write(chunk)
+
+    for archive in (data, write_zip(entries)):
+        with zipfile.ZipFile(archive) as zf:
+            assert zf.testzip() is None
+            assert ['foo.txt', 'bar.bin'] == zf.namelist()
+
+
 def test_ninjs_download(client, app):
     setup_embeds(client, app)
     app.config['EMBED_PRODUCT_FILTERING'] = True
@@ -0,0 +1,61 @@
+import time
+import smtplib
+
+from pytest import fixture
+
+from newsroom.email import send_email, email_batch
+from newsroom.email_delivery import smtp_pool, RateLimiter
+
+from .smtp_server import local_smtp_server
+
+
+@fixture
+def smtp_server(app):
+    with local_smtp_server(app) as handler:
+        yield handler
+    smtp_pool.close()
+
+
+def test_batch_is_sent_using_single_connection(app, smtp_server):
+    app.config['MAIL_BATCH_SIZE'] = 2
+    with email_batch():
+        for i in range(5):
+            send_email(['user{}@example.com'.format(i)], 'Subject', 'Body')
+        assert [] == smtp_server.messages
+
+    assert 5 == len(smtp_server.messages)
+    assert ['user0@example.com'] == smtp_server.messages[0].rcpt_tos
+    assert 1 == len(smtp_server.peers)
+
+
+def test_reconnect_when_connection_is_closed(app, smtp_server):
+    send_email(['foo@example.com'], 'Subject', 'Body')
+    smtp_pool.connection.host.close()
+    send_email(['bar@example.com'], 'Subject', 'Body')
+
+    assert 2 == len(smtp_server.messages)
+    assert 2 == len(smtp_server.peers)
+
+
+def test_failed_emails_are_retried(app, mocker):
+    app.config['MAIL_MAX_RETRIES'] = 2
+    send = mocker.patch.object(smtp_pool, 'send', side_effect=smtplib.SMTPDataError(451, 'Try again later'))
+
+    with email_batch():
+        send_email(['foo@example.com'], 'Subject', 'Body')
+        send_email(['bar@example.com'], 'Subject', 'Body')
+
+    assert 6 == send.call_count
+
+
+def test_rate_limiter():
+    limiter = RateLimiter()
+    start = time.monotonic()
+    for _i in range(11):
+        limiter.wait(100)
+    assert time.monotonic() - start >= 0.1
+
+    start = time.monotonic()
+    for _i in range(100):
+        limiter.wait(0)
+    assert time.monotonic() - start < 0.1
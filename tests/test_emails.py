@@ -1,5 +1,6 @@
-from newsroom.email import send_new_item_notification_email
-from flask import render_template_string, json, url_for
+from newsroom.email import send_new_item_notification_email, send_history_match_notification_email, \
+    email_render_cache
+from flask import render_template_string, json, url_for, session
 
 
 def test_item_notification_template(client, app, mocker):
@@ -58,3 +59,49 @@ Link: {{ item_url }}
 
 {% endblock %}
 """, app_name=app.config['SITE_NAME'], item_url=item_url))
+
+
+def test_cached_notification_emails_are_same_as_rendered(app, mocker):
+    users = [
+        {'email': 'foo@example.com', 'first_name': 'Foo', 'user_type': 'public'},
+        {'email': 'bar@example.com', 'first_name': '<b>O\'Neil & "Bar"</b>', 'user_type': 'administrator'},
+        {'email': 'baz@example.com', 'first_name': 'Žofie', 'user_type': 'internal'},
+        {'email': 'qux@example.com', 'first_name': '', 'user_type': 'public'},
+        {'email': 'quux@example.com', 'user_type': 'public'},
+    ]
+    items = [
+        {
+            '_id': 'wire', 'guid': 'wire', 'type': 'text', 'version': 2, 'headline': 'Headline',
+            'slugline': 'Slugline', 'body_html': '<p>Body & more</p>', 'service': [{'name': 'Racing'}],
+            'versioncreated': json.loads('{"date": "2018-07-02T09:15:48+0000"}')['date'],
+        },
+        {
+            '_id': 'agenda', 'guid': 'agenda', 'type': 'agenda', 'name': 'Agenda', 'event': {'_id': 'event'},
+            'dates': {'start': '2018-07-02T09:00:00+0000', 'end': '2018-07-02T10:00:00+0000', 'tz': 'UTC'},
+            'planning_items': [{'name': 'Plan', 'coverages': [
+                {'planning': {'ednote': 'Note', 'internal_note': 'Internal'}, 'coverage_type': 'text'},
+            ]}],
+        },
+    ]
+
+    def send_emails():
+        for item in items:
+            for user in users:
+                send_new_item_notification_email(user, 'Topic', item)
+                send_history_match_notification_email(user, item, 'wire')
+
+    send = mocker.patch('newsroom.email.send_email')
+    for locale in ('en', 'fr_CA', 'fi', 'cs'):
+        with app.test_request_context():
+            session['locale'] = locale
+            send_emails()
+            rendered = [call[1] for call in send.call_args_list]
+            send.reset_mock()
+
+            with email_render_cache():
+                send_emails()
+                send_emails()
+            cached = [call[1] for call in send.call_args_list]
+            send.reset_mock()
+
+        assert rendered + rendered == cached
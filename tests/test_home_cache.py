@@ -0,0 +1,165 @@
+from bson import ObjectId
+from flask import json
+from pytest import fixture
+from superdesk import get_resource_service
+
+import newsroom.auth  # noqa - Fix cyclic import when running single test file
+from newsroom.wire.home_cache import get_items_by_card, get_card_key, get_product_cards, LOCK_POLL_INTERVAL
+from newsroom.wire.search import WireSearchService
+
+SPORT_PRODUCT = ObjectId('5e65964bf5db68883df561d1')
+FINANCE_PRODUCT = ObjectId('5e65964bf5db68883df561d2')
+
+
+@fixture(autouse=True)
+def init(app):
+    get_resource_service('products').post([{
+        '_id': SPORT_PRODUCT,
+        'name': 'Sport',
+        'sd_product_id': 'sport',
+        'is_enabled': True,
+        'product_type': 'wire',
+    }, {
+        '_id': FINANCE_PRODUCT,
+        'name': 'Finance',
+        'query': 'headline:finance',
+        'is_enabled': True,
+        'product_type': 'wire',
+    }])
+    app.data.insert('cards', [{
+        '_id': ObjectId('5e65964bf5db68883df561e1'),
+        'label': 'Sport',
+        'type': '6-text-only',
+        'dashboard': 'newsroom',
+        'config': {'product': str(SPORT_PRODUCT), 'size': 6},
+    }, {
+        '_id': ObjectId('5e65964bf5db68883df561e2'),
+        'label': 'Finance',
+        'type': '4-text-only',
+        'dashboard': 'newsroom',
+        'config': {'product': str(FINANCE_PRODUCT), 'size': 4},
+    }, {
+        '_id': ObjectId('5e65964bf5db68883df561e3'),
+        'label': 'Photos',
+        'type': '4-photo-gallery',
+        'dashboard': 'newsroom',
+        'config': {},
+    }])
+
+
+def get_cards(app):
+    return list(app.data.find_all('cards'))
+
+
+def get_products_items(self, products, embed_permissions=True):
+    return [
+        [{'_id': 'item-{}'.format(product_id), 'body_html': '<p>{}</p>'.format(product_id)}]
+        for product_id, _size in products
+    ]
+
+
+def get_searched_products(search):
+    return [product_id for call in search.call_args_list for product_id, _size in call[0][1]]
+
+
+def test_card_items_are_computed_once(client, app, mocker):
+    search = mocker.patch.object(WireSearchService, 'get_products_items', autospec=True, side_effect=get_products_items)
+    with app.test_request_context():
+        items_by_card = get_items_by_card(get_cards(app))
+        assert items_by_card == get_items_by_card(get_cards(app))
+
+    assert 1 == search.call_count
+    assert [SPORT_PRODUCT, FINANCE_PRODUCT] == get_searched_products(search)
+    assert items_by_card['Photos'] is None
+    assert '&lt;p&gt;{}&lt;/p&gt;'.format(SPORT_PRODUCT) == items_by_card['Sport'][0]['body_html']
+
+
+def test_push_invalidates_only_matching_cards(client, app, mocker):
+    search = mocker.patch.object(WireSearchService, 'get_products_items', autospec=True, side_effect=get_products_items)
+    with app.test_request_context():
+        get_items_by_card(get_cards(app))
+    assert 2 == len(get_searched_products(search))
+
+    client.post('/push', data=json.dumps({
+        'guid': 'sport-item',
+        'type': 'text',
+        'headline': 'Sport news',
+        'products': [{'code': 'sport'}],
+    }), content_type='application/json')
+
+    with app.test_request_context():
+        get_items_by_card(get_cards(app))
+    assert [SPORT_PRODUCT] == get_searched_products(search)[2:]
+
+    client.post('/push', data=json.dumps({
+        'guid': 'finance-item',
+        'type': 'text',
+        'headline': 'Finance news',
+    }), content_type='application/json')
+
+    with app.test_request_context():
+        get_items_by_card(get_cards(app))
+    assert [FINANCE_PRODUCT] == get_searched_products(search)[3:]
+
+
+def test_card_containing_updated_item_is_invalidated(client, app, mocker):
+    search = mocker.patch.object(WireSearchService, 'get_products_items', autospec=True, return_value=[
+        [{'_id': 'weather-item', 'body_html': ''}],
+        [{'_id': 'weather-item', 'body_html': ''}],
+    ])
+    app.data.insert('items', [{'_id': 'weather-item', 'type': 'text', 'headline': 'Weather'}])
+    with app.test_request_context():
+        get_items_by_card(get_cards(app))
+    assert 1 == search.call_count
+
+    client.post('/push', data=json.dumps({
+        'guid': 'weather-item-2',
+        'evolvedfrom': 'weather-item',
+        'type': 'text',
+        'headline': 'Weather',
+    }), content_type='application/json')
+
+    with app.test_request_context():
+        get_items_by_card(get_cards(app))
+    assert 2 == search.call_count
+    assert 4 == len(get_searched_products(search))
+
+
+def test_stale_card_is_served_while_other_request_computes_it(client, app, mocker):
+    app.config['HOME_CARD_CACHE_TIMEOUT'] = 0
+    app.config['HOME_CARD_CACHE_LOCK_TIMEOUT'] = LOCK_POLL_INTERVAL * 2
+    search = mocker.patch.object(WireSearchService, 'get_products_items', autospec=True, side_effect=get_products_items)
+    with app.test_request_context():
+        cards = get_cards(app)
+        items_by_card = get_items_by_card(cards)
+        assert 1 == search.call_count
+
+        for card, product in get_product_cards(cards):
+            app.cache.add('{}:lock'.format(get_card_key(card, product)), 1)
+
+        assert items_by_card == get_items_by_card(cards)
+        assert 1 == search.call_count
+
+        app.config['HOME_CARD_CACHE_STALE'] = 0
+        assert items_by_card == get_items_by_card(cards)
+        assert 3 == search.call_count
+
+
+def test_embeds_are_filtered_per_request(client, app, mocker):
+    def filter_embeds(self, items):
+        for item in items:
+            item['body_html'] += '<p>filtered</p>'
+
+    mocker.patch.object(WireSearchService, 'get_products_items', autospec=True, side_effect=get_products_items)
+    filter_embeds = mocker.patch.object(WireSearchService, 'filter_embeds', autospec=True, side_effect=filter_embeds)
+    with app.test_request_context():
+        cards = get_cards(app)
+        items_by_card = get_items_by_card(cards)
+        assert items_by_card == get_items_by_card(cards)
+
+        expected = '&lt;p&gt;{}&lt;/p&gt;&lt;p&gt;filtered&lt;/p&gt;'.format(SPORT_PRODUCT)
+        assert expected == items_by_card['Sport'][0]['body_html']
+        for card, product in get_product_cards(cards):
+            for item in app.cache.get(get_card_key(card, product))['items']:
+                assert 'filtered' not in item['body_html']
+    assert 4 == filter_embeds.call_count
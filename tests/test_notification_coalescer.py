@@ -0,0 +1,71 @@
+import time
+
+from unittest import mock
+
+from newsroom.notifications.coalescer import NotificationCoalescer, merge_values
+
+
+def test_events_are_merged_per_channel(app):
+    app.config['NOTIFICATION_COALESCE_WINDOW'] = 60000
+    coalescer = NotificationCoalescer(app)
+    with mock.patch('newsroom.notifications.coalescer.send_notification') as send:
+        coalescer.add('new_item', _items=[{'_id': 'foo', 'type': 'text', 'version': 1}])
+        coalescer.add('new_item', _items=[{'_id': 'bar', 'type': 'text'}])
+        coalescer.add('new_item', _items=[{'_id': 'foo', 'type': 'text', 'version': 2}])
+        coalescer.add('new_item', _items=[{'_id': 'baz', 'type': 'agenda'}])
+        coalescer.add('history_matches', item={'_id': 'foo'}, users=['a', 'b'], section='wire')
+        coalescer.add('history_matches', item={'_id': 'foo', 'version': 2}, users=['b', 'c'], section='wire')
+        coalescer.add('items_deleted', ids=['x'])
+        coalescer.add('items_deleted', ids=['y', 'x'])
+        coalescer.add('saved_items:user', count=1)
+        assert 1 == send.call_count
+        assert {'buffered': 4, 'events_in': 9, 'events_out': 1, 'failed': 0} == coalescer.stats()
+
+        coalescer.stop()
+
+    assert {'buffered': 0, 'events_in': 9, 'events_out': 5, 'failed': 0} == coalescer.stats()
+    events = {call[0][0] + str(i): call[1] for i, call in enumerate(send.call_args_list)}
+    assert {'count': 1} == events['saved_items:user0']
+    assert [{'_id': 'foo', 'type': 'text', 'version': 2}, {'_id': 'bar', 'type': 'text'}] == \
+        events['new_item1']['_items']
+    assert ['bar', 'foo'] == events['new_item1']['item_ids']
+    assert 0.017 == events['new_item1']['max_rate']
+    assert ['baz'] == events['new_item2']['item_ids']
+    assert ['a', 'b', 'c'] == events['history_matches3']['users']
+    assert 2 == events['history_matches3']['item']['version']
+    assert ['foo'] == events['history_matches3']['item_ids']
+    assert ['x', 'y'] == events['items_deleted4']['item_ids']
+
+
+def test_events_are_sent_after_window(app):
+    app.config['NOTIFICATION_COALESCE_WINDOW'] = 50
+    coalescer = NotificationCoalescer(app)
+    with mock.patch('newsroom.notifications.coalescer.send_notification') as send:
+        for i in range(10):
+            coalescer.add('topic_matches', item={'_id': 'foo'}, topics=['topic{}'.format(i)])
+        for _i in range(50):
+            if send.called:
+                break
+            time.sleep(0.1)
+        coalescer.stop()
+
+    assert 1 == send.call_count
+    assert 10 == len(send.call_args[1]['topics'])
+    assert {'buffered': 0, 'events_in': 10, 'events_out': 1, 'failed': 0} == coalescer.stats()
+
+
+def test_events_are_sent_right_away_without_window(app):
+    app.config['NOTIFICATION_COALESCE_WINDOW'] = 0
+    coalescer = NotificationCoalescer(app)
+    with mock.patch('newsroom.notifications.coalescer.send_notification') as send:
+        coalescer.add('new_item', _items=[{'_id': 'foo'}])
+        coalescer.add('new_item', _items=[{'_id': 'bar'}])
+    assert 2 == send.call_count
+    assert coalescer.thread is None
+    assert [{'_id': 'bar'}] == send.call_args[1]['_items']
+
+
+def test_merge_values():
+    assert ['a', 'b', 'c'] == merge_values(['a', 'b'], ['b', 'c'])
+    assert [{'_id': 1, 'v': 2}] == merge_values([{'_id': 1, 'v': 1}], [{'_id': 1, 'v': 2}])
+    assert ['a'] == merge_values(None, ['a'])
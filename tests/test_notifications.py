@@ -3,7 +3,8 @@ from bson import ObjectId
 import datetime
 from superdesk.utc import utcnow
 from superdesk import get_resource_service
-from newsroom.notifications import get_user_notifications
+from newsroom.notifications import get_user_notifications, save_user_notifications
+from newsroom.notifications.notifications import get_notification_summary
 from .fixtures import init_company, PUBLIC_USER_ID, TEST_USER_ID  # noqa
 
 user = str(PUBLIC_USER_ID)
@@ -100,3 +101,73 @@ def test_delete_all_notifications(client):
     resp = client.get(notifications_url)
     data = json.loads(resp.get_data())
     assert 0 == len(data['_items'])
+
+
+def test_save_user_notifications(app):
+    ids = save_user_notifications([
+        (user, 'foo', 'history_matches'),
+        (user, 'bar', 'history_matches'),
+        (str(TEST_USER_ID), 'foo', 'history_matches'),
+        (user, 'foo', 'agenda_update'),
+    ])
+    assert ['{}_foo'.format(user), '{}_bar'.format(user), '{}_foo'.format(TEST_USER_ID)] == ids
+
+    notifications = {n['_id']: n for n in get_user_notifications(ObjectId(user))}
+    assert 2 == len(notifications)
+    assert 'agenda_update' == notifications['{}_foo'.format(user)]['action']
+    assert ObjectId(user) == notifications['{}_foo'.format(user)]['user']
+
+    old_created = utcnow() - datetime.timedelta(hours=1)
+    app.data.get_mongo_collection('notifications').update_one({'_id': '{}_bar'.format(user)},
+                                                              {'$set': {'created': old_created}})
+    save_user_notifications([(user, 'bar', 'history_matches')])
+    notifications = {n['_id']: n for n in get_user_notifications(ObjectId(user))}
+    assert 2 == len(notifications)
+    assert old_created < notifications['{}_bar'.format(user)]['created']
+
+
+def test_notification_summary(client, app):
+    app.config['NOTIFICATIONS_SUMMARY_SIZE'] = 1
+    app.data.insert('items', [
+        {'_id': 'foo', 'type': 'text', 'headline': 'Foo', 'body_html': '<p>foo</p>'},
+        {'_id': 'bar', 'type': 'text', 'headline': 'Bar', 'body_html': '<p>bar</p>'},
+    ])
+    save_user_notifications([(user, 'foo', 'history_matches')])
+    save_user_notifications([(user, 'bar', 'history_matches')])
+
+    summary = get_notification_summary(user)
+    assert 2 == summary['count']
+    assert [{'_id': 'bar', 'type': 'text', 'headline': 'Bar'}] == summary['items']
+
+    with client.session_transaction() as session:
+        session['user'] = user
+        session['name'] = 'tester'
+
+    resp = client.get('/notifications')
+    data = json.loads(resp.get_data())
+    assert 2 == data['count']
+    assert {'foo', 'bar'} == {item['_id'] for item in data['notifications']}
+
+    resp = client.delete('/users/{}/notifications/{}_bar'.format(user, user))
+    assert 200 == resp.status_code
+    summary = get_notification_summary(user)
+    assert 1 == summary['count']
+    assert ['foo'] == [item['_id'] for item in summary['items']]
+
+    resp = client.delete('/users/{}/notifications'.format(user))
+    assert 200 == resp.status_code
+    assert 0 == get_notification_summary(user)['count']
+
+
+def test_notification_summary_is_updated_when_notification_expires(app):
+    app.config['NOTIFICATIONS_TTL'] = 1
+    save_user_notifications([(user, 'foo', 'history_matches')])
+    assert 1 == get_notification_summary(user)['count']
+
+    app.data.get_mongo_collection('notifications').update_many({}, {'$set': {
+        'created': utcnow() - datetime.timedelta(days=2),
+    }})
+    app.data.pymongo('items').db.notification_summaries.update_many({}, {'$set': {
+        'expires': utcnow() - datetime.timedelta(days=1),
+    }})
+    assert 0 == get_notification_summary(user)['count']
@@ -7,12 +7,15 @@ from bson import ObjectId
 from flask import json
 from datetime import datetime
 import newsroom.auth  # noqa - Fix cyclic import when running single test file
+import newsroom.push
+import newsroom.media_utils
 from superdesk import get_resource_service
 import newsroom.auth  # noqa - Fix cyclic import when running single test file
 from newsroom.utils import get_entity_or_404
-from .fixtures import init_auth  # noqa
+from .fixtures import init_auth, ADMIN_USER_ID  # noqa
 from .utils import mock_send_email
 from unittest import mock
+from pytest import mark
 
 
 def get_signature_headers(data, key):
@@ -78,6 +81,73 @@ def test_notify_invalid_signature(client, app):
     assert 403 == resp.status_code
 
 
+def test_push_async_only_queues_item(client, app, mocker):
+    app.config['PUSH_ASYNC'] = True
+    task_mock = mocker.patch('newsroom.push.ingest_pushed_item.apply_async')
+    resp = client.post('/push', data=json.dumps(item), content_type='application/json')
+    assert 202 == resp.status_code
+    assert 1 == task_mock.call_count
+    assert 'foo' == json.loads(task_mock.call_args[1]['kwargs']['payload'])['guid']
+    assert get_resource_service('items').find_one(req=None, _id='foo') is None
+
+
+def test_push_async_unknown_type(client, app, mocker):
+    app.config['PUSH_ASYNC'] = True
+    task_mock = mocker.patch('newsroom.push.ingest_pushed_item.apply_async')
+    resp = client.post('/push', data=json.dumps({'guid': 'foo', 'type': 'foo'}), content_type='application/json')
+    assert 400 == resp.status_code
+    assert 0 == task_mock.call_count
+
+
+def test_push_async_ingest_is_idempotent(client, app, mocker):
+    from newsroom.push import ingest_pushed_item
+
+    notify_mock = mocker.patch('newsroom.push.notify_pushed_item.apply_async')
+    publish_mock = mocker.patch('newsroom.push.publish_pushed_item', wraps=newsroom.push.publish_pushed_item)
+    payload = json.dumps(dict(item, version=2))
+    with app.test_request_context():
+        ingest_pushed_item.run(payload)
+        ingest_pushed_item.run(payload)
+
+    assert 1 == publish_mock.call_count
+    assert 1 == notify_mock.call_count
+    kwargs = notify_mock.call_args[1]['kwargs']
+    assert {'resource': 'items', '_id': 'foo', 'check_topics': True} == \
+        {key: value for key, value in kwargs.items() if key != 'key'}
+    assert kwargs['key'].startswith('push:text:foo:2:')
+    assert get_resource_service('items').find_one(req=None, _id='foo')
+
+
+def test_push_async_ingest_processes_changed_content(client, app, mocker):
+    from newsroom.push import ingest_pushed_item
+
+    mocker.patch('newsroom.push.notify_pushed_item.apply_async')
+    featured = {'_id': '20180101', 'type': 'planning_featured', 'tz': 'Australia/Sydney', 'items': ['foo']}
+    text = {'guid': 'versionless', 'type': 'text', 'headline': 'Foo'}
+    with app.test_request_context():
+        ingest_pushed_item.run(json.dumps(featured))
+        ingest_pushed_item.run(json.dumps(dict(featured, items=['foo', 'bar'])))
+        ingest_pushed_item.run(json.dumps(text))
+        ingest_pushed_item.run(json.dumps(dict(text, headline='Bar')))
+
+    assert ['foo', 'bar'] == get_resource_service('agenda_featured').find_one(req=None, _id='20180101')['items']
+    assert 'Bar' == get_resource_service('items').find_one(req=None, _id='versionless')['headline']
+
+
+def test_push_async_ingest_skips_stale_version(client, app, mocker):
+    from newsroom.push import ingest_pushed_item
+
+    notify_mock = mocker.patch('newsroom.push.notify_pushed_item.apply_async')
+    with app.test_request_context():
+        ingest_pushed_item.run(json.dumps(dict(item, version=2, headline='Version 2')))
+        ingest_pushed_item.run(json.dumps(dict(item, version=1, headline='Version 1')))
+
+    stored = get_resource_service('items').find_one(req=None, _id='foo')
+    assert 'Version 2' == stored['headline']
+    assert 2 == int(stored['version'])
+    assert 1 == notify_mock.call_count
+
+
 def test_push_binary(client):
     media_id = str(bson.ObjectId())
 
@@ -160,6 +230,90 @@ def test_push_featuremedia_generates_renditions(client):
         assert 200 == resp.status_code
 
 
+def test_push_featuremedia_generates_renditions_in_draft_mode(client, app, mocker):
+    from newsroom.media_utils import generate_item_renditions, get_rendition_stats, get_watermark_image
+
+    app.config['RENDITIONS_DRAFT_MODE'] = True
+    media_id = str(bson.ObjectId())
+    upload_binary('picture.jpg', client, media_id=media_id)
+    item = {
+        'guid': 'test',
+        'type': 'text',
+        'associations': {
+            'featuremedia': {
+                'type': 'picture',
+                'mimetype': 'image/jpeg',
+                'renditions': {
+                    '4-3': {'media': media_id},
+                    'baseImage': {'media': media_id},
+                    'viewImage': {'media': media_id},
+                }
+            }
+        }
+    }
+
+    schedule = mocker.patch('newsroom.push.schedule_renditions')
+    resp = client.post('/push', data=json.dumps(item), content_type='application/json')
+    assert 200 == resp.status_code
+    schedule.assert_called_once_with('test', ['_newsroom_thumbnail_large'])
+
+    # watermarked preview and details are available right away
+    renditions = get_entity_or_404('test', 'items')['associations']['featuremedia']['renditions']
+    for name in ['thumbnail', 'view', 'base']:
+        assert '_newsroom_%s' % name in renditions
+    assert '_newsroom_thumbnail_large' not in renditions
+
+    generate_item_renditions('test', schedule.call_args[0][1])
+    renditions = get_entity_or_404('test', 'items')['associations']['featuremedia']['renditions']
+    for name in ['thumbnail', 'thumbnail_large', 'view', 'base']:
+        resp = client.get(renditions['_newsroom_%s' % name]['href'])
+        assert 200 == resp.status_code
+
+    stats = get_rendition_stats()
+    assert stats['_newsroom_view']['count'] >= 1
+    assert stats['_newsroom_view']['avg_ms'] > 0
+    assert get_watermark_image() is get_watermark_image()
+
+
+@mark.parametrize('featuremedia_changed', [True, False])
+def test_draft_mode_renditions_keep_changes_pushed_meanwhile(client, app, mocker, featuremedia_changed):
+    from newsroom.media_utils import generate_item_renditions
+
+    app.config['RENDITIONS_DRAFT_MODE'] = True
+    media_ids = [str(bson.ObjectId()), str(bson.ObjectId())]
+    for media_id in media_ids:
+        upload_binary('picture.jpg', client, media_id=media_id)
+
+    def get_item(media_id, headline):
+        return {'guid': 'test', 'type': 'text', 'headline': headline, 'associations': {'featuremedia': {
+            'type': 'picture',
+            'mimetype': 'image/jpeg',
+            'renditions': {'4-3': {'media': media_id}, 'viewImage': {'media': media_id}},
+        }}}
+
+    schedule = mocker.patch('newsroom.push.schedule_renditions')
+    client.post('/push', data=json.dumps(get_item(media_ids[0], 'Foo')), content_type='application/json')
+
+    run_rendition_jobs = newsroom.media_utils.run_rendition_jobs
+
+    def push_while_generating(picture, jobs):
+        run_rendition_jobs(picture, jobs)
+        if not pushed:
+            pushed.append(True)
+            media_id = media_ids[1] if featuremedia_changed else media_ids[0]
+            client.post('/push', data=json.dumps(get_item(media_id, 'Bar')), content_type='application/json')
+
+    pushed = []
+
+    mocker.patch('newsroom.media_utils.run_rendition_jobs', side_effect=push_while_generating)
+    generate_item_renditions('test', schedule.call_args[0][1])
+
+    stored = get_entity_or_404('test', 'items')
+    assert 'Bar' == stored['headline']
+    renditions = stored['associations']['featuremedia']['renditions']
+    assert featuremedia_changed != ('_newsroom_thumbnail_large' in renditions)
+
+
 def test_push_update_removes_featuremedia(client):
     media_id = str(bson.ObjectId())
     upload_binary('picture.jpg', client, media_id=media_id)
@@ -292,6 +446,58 @@ def test_notify_topic_matches_for_new_item(client, app, mocker):
     assert len(push_mock.call_args[1]['topics']) == 1
 
 
+def test_notify_topic_matches_using_percolator(client, app, mocker):
+    from newsroom.topics.percolator import init_percolator_index, percolate_item
+
+    app.config['WIRE_TOPICS_PERCOLATOR'] = True
+    init_percolator_index()
+
+    user_ids = app.data.insert('users', [{
+        'email': 'foo@bar.com',
+        'first_name': 'Foo',
+        'is_enabled': True,
+        'receive_email': True,
+        'user_type': 'administrator'
+    }])
+
+    with client as cli:
+        with client.session_transaction() as session:
+            user = str(user_ids[0])
+            session['user'] = user
+
+        for query in ['test', 'other']:
+            resp = cli.post('api/users/%s/topics' % user,
+                            data={'label': query, 'query': query, 'notifications': True, 'topic_type': 'wire'})
+            assert 201 == resp.status_code
+
+    topic = get_resource_service('topics').find_one(req=None, label='test')
+    data = json.dumps({'guid': 'foo', 'type': 'text', 'headline': 'this is a test'})
+    push_mock = mocker.patch('newsroom.push.push_notification')
+    resp = client.post('/push', data=data, content_type='application/json')
+    assert 200 == resp.status_code
+    assert [str(topic['_id'])] == percolate_item('foo')
+    assert push_mock.call_args[1]['item']['_id'] == 'foo'
+    assert push_mock.call_args[1]['topics'] == [topic['_id']]
+
+    get_resource_service('topics').delete_action({'_id': topic['_id']})
+    assert [] == percolate_item('foo')
+
+
+def test_notify_topic_matches_percolator_fallback(client, app, mocker):
+    app.config['WIRE_TOPICS_PERCOLATOR'] = True
+    percolate_mock = mocker.patch('newsroom.topics.topics.percolate_item', return_value=None)
+    app.data.insert('topics', [{
+        'label': 'bar', 'query': 'test', 'notifications': True, 'topic_type': 'wire', 'user': ObjectId(ADMIN_USER_ID),
+    }])
+
+    data = json.dumps({'guid': 'foo', 'type': 'text', 'headline': 'this is a test'})
+    push_mock = mocker.patch('newsroom.push.push_notification')
+    resp = client.post('/push', data=data, content_type='application/json')
+    assert 200 == resp.status_code
+    assert 1 == percolate_mock.call_count
+    assert len(push_mock.call_args[1]['topics']) == 1
+
+
 @mock.patch('newsroom.email.send_email', mock_send_email)
 def test_notify_user_matches_for_new_item_in_history(client, app, mocker):
     company_ids = app.data.insert('companies', [{
@@ -645,3 +851,101 @@ def test_push_event_coverage_info(client, app):
     parsed = get_entity_or_404(item['guid'], 'items')
     assert parsed['event_id'] == 'urn:event/1'
     assert parsed['coverage_id'] == 'urn:coverage/1'
+
+
+def test_push_unchanged_item_is_not_published_again(client, app, mocker):
+    item = {'guid': 'fingerprint', 'type': 'text', 'version': 1, 'headline': 'Foo', 'body_html': '<p>foo</p>'}
+    resp = client.post('/push', data=json.dumps(item), content_type='application/json')
+    assert 200 == resp.status_code
+    fingerprint = get_entity_or_404('fingerprint', 'items')['fingerprint']
+    skipped = newsroom.push.get_push_stats()['text']['skipped']
+
+    publish = mocker.spy(newsroom.push, 'publish_item')
+    notify = mocker.patch('newsroom.push.notify_new_item')
+
+    item['version'] = 2
+    client.post('/push', data=json.dumps(item), content_type='application/json')
+    assert not publish.called
+    assert not notify.called
+    stored = get_entity_or_404('fingerprint', 'items')
+    assert 2 == stored['version']
+    assert fingerprint == stored['fingerprint']
+    assert skipped + 1 == newsroom.push.get_push_stats()['text']['skipped']
+
+    item['version'] = 3
+    item['headline'] = 'Bar'
+    client.post('/push', data=json.dumps(item), content_type='application/json')
+    assert 1 == publish.call_count
+    assert 1 == notify.call_count
+    stored = get_entity_or_404('fingerprint', 'items')
+    assert 'Bar' == stored['headline']
+    assert fingerprint != stored['fingerprint']
+
+    app.config['PUSH_FINGERPRINT_ENABLED'] = False
+    client.post('/push', data=json.dumps(item), content_type='application/json')
+    assert 2 == publish.call_count
+
+
+def test_push_unchanged_item_updates_versioncreated(client, app):
+    item = {'guid': 'fingerprint', 'type': 'text', 'version': 1, 'headline': 'Foo',
+            'versioncreated': '2018-01-01T00:00:00+0000', 'version_creator': 'foo'}
+    client.post('/push', data=json.dumps(item), content_type='application/json')
+
+    item.update({'version': 2, 'versioncreated': '2018-01-02T00:00:00+0000', 'version_creator': 'bar'})
+    client.post('/push', data=json.dumps(item), content_type='application/json')
+    stored = get_entity_or_404('fingerprint', 'items')
+    assert 2 == stored['version']
+    assert '2018-01-02' == stored['versioncreated'].strftime('%Y-%m-%d')
+    assert 'bar' == stored['version_creator']
+
+
+def test_push_fingerprint_ignores_bookkeeping_fields(app):
+    item = {'guid': 'foo', 'type': 'text', 'headline': 'Foo', 'version': 1, 'versioncreated': '2018-01-01T00:00:00'}
+    updated = dict(item, version=2, versioncreated='2018-01-02T00:00:00')
+    assert newsroom.push.get_fingerprint(item) == newsroom.push.get_fingerprint(updated)
+    assert newsroom.push.get_fingerprint(item) != newsroom.push.get_fingerprint(dict(item, headline='Bar'))
+    assert newsroom.push.get_fingerprint(item) == newsroom.push.get_fingerprint(dict(reversed(list(item.items()))))
+
+
+@mock.patch('newsroom.email.send_email', mock_send_email)
+def test_notify_user_matches_once_for_history_and_bookmarks(client, app, mocker):
+    company_ids = app.data.insert('companies', [
+        {'name': 'Press co.', 'is_enabled': True},
+        {'name': 'Disabled co.', 'is_enabled': False},
+    ])
+    users = [
+        {'email': 'foo@bar.com', 'first_name': 'Foo', 'is_enabled': True, 'company': company_ids[0]},
+        {'email': 'bar@bar.com', 'first_name': 'Bar', 'is_enabled': True, 'company': company_ids[0]},
+        {'email': 'baz@bar.com', 'first_name': 'Baz', 'is_enabled': True, 'company': company_ids[1]},
+        {'email': 'qux@bar.com', 'first_name': 'Qux', 'is_enabled': False, 'company': company_ids[0]},
+    ]
+    user_ids = app.data.insert('users', users)
+    for user, _id in zip(users, user_ids):
+        user['_id'] = _id
+
+    app.data.insert('items', [{
+        '_id': 'foo',
+        'type': 'text',
+        'headline': 'Foo',
+        'bookmarks': [str(_id) for _id in user_ids],
+    }])
+    for user in users:
+        app.data.insert('history', docs=[{'version': '1', '_id': 'foo'}], action='download', user=user,
+                        section='wire')
+    app.data.insert('history', docs=[{'version': '1', '_id': 'foo'}], action='download', user=users[1],
+                    section='am_news')
+
+    push_mock = mocker.patch('newsroom.push.push_notification')
+    resp = client.post('/push', data=json.dumps({
+        'guid': 'bar',
+        'type': 'text',
+        'headline': 'Bar',
+        'evolvedfrom': 'foo',
+    }), content_type='application/json')
+    assert 200 == resp.status_code
+
+    history_matches = [call[1] for call in push_mock.call_args_list if call[0][0] == 'history_matches']
+    assert 1 == len(history_matches)
+    assert 'wire' == history_matches[0]['section']
+    assert sorted([str(user_ids[0]), str(user_ids[1])]) == history_matches[0]['users']
+    assert ['foo'] == history_matches[0]['item']['ancestors']
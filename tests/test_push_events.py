@@ -8,6 +8,7 @@ from copy import deepcopy
 
 from superdesk import get_resource_service
 import newsroom.auth  # noqa - Fix cyclic import when running single test file
+import newsroom.push
 from newsroom.utils import get_entity_or_404
 from newsroom.notifications import get_user_notifications
 from .fixtures import init_auth  # noqa
@@ -1216,3 +1217,82 @@ def test_item_planning_reference_set_on_fulfill(client, app):
     assert parsed['planning_id'] == 'bar1'
     assert parsed['coverage_id'] == 'urn:newsml:localhost:5000:2018-05-28T20:55:' \
                                     '00.496765:197d3430-9cd1-4b93-822f-c3c050b5b6ab'
+
+
+def test_push_completed_coverages_sets_item_references(client, app, mocker):
+    app.data.insert('items', [
+        {'_id': 'item9', 'guid': 'item9', 'type': 'text', 'headline': 'Text'},
+        {'_id': 'item10', 'guid': 'item10', 'type': 'text', 'headline': 'Photos'},
+    ])
+
+    event = deepcopy(test_event)
+    event['guid'] = 'foo9'
+    client.post('/push', data=json.dumps(event), content_type='application/json')
+
+    planning = deepcopy(test_planning)
+    planning['guid'] = 'bar9'
+    planning['event_item'] = 'foo9'
+    client.post('/push', data=json.dumps(planning), content_type='application/json')
+
+    for coverage, item_id in zip(planning['coverages'], ['item9', 'item10']):
+        coverage['planning']['g2_content_type'] = 'text'
+        coverage['deliveries'] = [{'item_id': item_id, 'item_state': 'published'}]
+        coverage['workflow_status'] = 'completed'
+
+    find_one = mocker.spy(get_resource_service('items'), 'find_one')
+    client.post('/push', data=json.dumps(planning), content_type='application/json')
+    assert not [call for call in find_one.call_args_list if call[1].get('_id') in ('item9', 'item10')]
+
+    for item_id, coverage in zip(['item9', 'item10'], planning['coverages']):
+        item = get_entity_or_404(item_id, 'items')
+        assert item['planning_id'] == 'bar9'
+        assert item['coverage_id'] == coverage['coverage_id']
+
+
+def test_copy_agenda_keeps_original_untouched(app):
+    from newsroom.push import copy_agenda, get_agenda_updates, set_agenda_metadata_from_planning
+
+    original = {
+        '_id': 'foo',
+        'name': 'Foo',
+        'planning_items': [{'guid': 'bar', 'slugline': 'Bar'}],
+        'coverages': [{'coverage_id': 'baz'}],
+    }
+    expected = deepcopy(original)
+    agenda = copy_agenda(original)
+    planning = deepcopy(test_planning)
+    planning['guid'] = 'bar'
+    planning['event_item'] = 'foo'
+    set_agenda_metadata_from_planning(agenda, planning)
+
+    assert expected == original
+    assert agenda['planning_items'][0]['slugline'] == planning['slugline']
+    updates = get_agenda_updates(agenda, original)
+    assert 'planning_items' in updates
+    assert 'name' not in updates
+    assert 'coverages' not in updates
+
+
+def test_push_unchanged_event_and_planning_are_not_published_again(client, app, mocker):
+    event = deepcopy(test_event)
+    event['guid'] = 'foo10'
+    planning = deepcopy(test_planning)
+    planning['guid'] = 'bar10'
+    planning['event_item'] = 'foo10'
+    post_json(client, '/push', event)
+    post_json(client, '/push', planning)
+
+    publish_event = mocker.spy(newsroom.push, 'publish_event')
+    publish_planning = mocker.spy(newsroom.push, 'publish_planning')
+    event['version'] = 2
+    planning['_current_version'] = 2
+    post_json(client, '/push', event)
+    post_json(client, '/push', planning)
+    assert not publish_event.called
+    assert not publish_planning.called
+
+    planning['ednote'] = 'updated ed note'
+    post_json(client, '/push', planning)
+    assert publish_planning.called
+    parsed = get_entity_or_404('foo10', 'agenda')
+    assert 'updated ed note' == parsed['planning_items'][0]['ednote']
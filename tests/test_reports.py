@@ -2,6 +2,11 @@ from flask import json
 from pytest import fixture
 from bson import ObjectId
 from datetime import datetime, timedelta
+from unittest.mock import patch
+from elasticsearch import Elasticsearch
+from superdesk import get_resource_service
+from newsroom.search import decode_cursor
+from newsroom.write_buffer import write_docs
 from .test_users import test_login_succeeds_for_admin, init as user_init  # noqa
 
 
@@ -164,3 +169,64 @@ def test_expired_companies(client, app):
     report = json.loads(resp.get_data())
     assert report['name'] == 'Expired companies'
     assert len(report['results']) == 2
+
+
+def insert_history(app, count):
+    now = datetime.utcnow()
+    write_docs('history', [{
+        'action': 'download',
+        'versioncreated': now - timedelta(minutes=i),
+        'user': ObjectId(),
+        'company': ObjectId('59bc460f1d41c8fa815cc2c2'),
+        'item': 'item-{}'.format(i),
+        'version': '1',
+        'section': 'wire',
+    } for i in range(count)])
+
+
+def test_subscriber_activity_cursor_pagination(client, app):
+    insert_history(app, 60)
+    test_login_succeeds_for_admin(client)
+
+    response = client.get('/reports/subscriber-activity')
+    assert 200 == response.status_code
+    data = json.loads(response.get_data())
+    assert 25 == len(data['results'])
+    assert 60 == data['aggregations']['action']['buckets'][0]['doc_count']
+
+    results = data['results']
+    while data.get('cursor'):
+        response = client.get('/reports/subscriber-activity?cursor={}'.format(data['cursor']))
+        assert 200 == response.status_code
+        data = json.loads(response.get_data())
+        results.extend(data['results'])
+
+    assert 60 == len(results)
+    assert 60 == len(set([result['item'] for result in results]))
+    assert results == sorted(results, key=lambda result: result['versioncreated'], reverse=True)
+
+
+def test_subscriber_activity_cursor_does_not_scroll(client, app):
+    insert_history(app, 30)
+    test_login_succeeds_for_admin(client)
+
+    with patch.object(Elasticsearch, 'scroll', side_effect=AssertionError('scroll')):
+        data = json.loads(client.get('/reports/subscriber-activity').get_data())
+        assert 'scroll_id' not in decode_cursor(data['cursor'])
+        data = json.loads(client.get('/reports/subscriber-activity?cursor={}'.format(data['cursor'])).get_data())
+    assert 5 == len(data['results'])
+    assert data.get('cursor') is None
+
+
+def test_subscriber_activity_invalid_cursor(client, app):
+    test_login_succeeds_for_admin(client)
+    response = client.get('/reports/subscriber-activity?cursor=foo')
+    assert 400 == response.status_code
+
+
+def test_fetch_all_history(app, monkeypatch):
+    insert_history(app, 30)
+    monkeypatch.setattr('newsroom.history.EXPORT_PAGE_SIZE', 7)
+    history = get_resource_service('history').fetch_history({'query': {'match_all': {}}, 'size': 25, 'from': 0}, True)
+    assert 30 == len(history['items'])
+    assert 30 == len(set([item['item'] for item in history['items']]))
@@ -0,0 +1,87 @@
+from bson import ObjectId
+from pytest import fixture
+from superdesk import get_resource_service
+
+from newsroom.navigations.navigations import get_navigations_by_company
+from newsroom.products.products import get_products_by_company, get_product_by_id, get_products_by_navigation
+from newsroom.resource_cache import get_cache_stats, invalidate
+
+COMPANY_ID = '5c3eb6975f627db90c84093c'
+NAVIGATION_ID = ObjectId('5e65964bf5db68883df561c1')
+
+
+@fixture(autouse=True)
+def init(app):
+    app.config['RESOURCE_CACHE'] = True
+    get_resource_service('navigations').post([{
+        '_id': NAVIGATION_ID,
+        'name': 'Sport',
+        'product_type': 'wire',
+        'is_enabled': True,
+    }])
+    get_resource_service('products').post([{
+        '_id': ObjectId('59b4c5c61d41c8d736852fbf'),
+        'name': 'Sport',
+        'is_enabled': True,
+        'companies': [COMPANY_ID],
+        'navigations': [str(NAVIGATION_ID)],
+        'product_type': 'wire',
+    }, {
+        '_id': ObjectId('59b4c5c61d41c8d736852fc0'),
+        'name': 'Disabled',
+        'is_enabled': False,
+        'companies': [COMPANY_ID],
+        'product_type': 'wire',
+    }, {
+        '_id': ObjectId('59b4c5c61d41c8d736852fc1'),
+        'name': 'Agenda',
+        'is_enabled': True,
+        'companies': [COMPANY_ID],
+        'product_type': 'agenda',
+    }])
+
+
+def test_products_are_filtered_like_mongo_lookup(app):
+    with app.app_context():
+        assert ['Agenda', 'Sport'] == sorted([p['name'] for p in get_products_by_company(COMPANY_ID)])
+        assert ['Sport'] == [p['name'] for p in get_products_by_company(COMPANY_ID, product_type='wire')]
+        assert ['Sport'] == [p['name'] for p in get_products_by_company(COMPANY_ID, str(NAVIGATION_ID))]
+        assert ['Sport'] == [p['name'] for p in get_products_by_navigation([NAVIGATION_ID])]
+        assert [] == get_products_by_company(None)
+        assert [] == get_products_by_company('foo')
+        assert [] == get_product_by_id('59b4c5c61d41c8d736852fc0')
+        assert [] == get_product_by_id('59b4c5c61d41c8d736852fc1', company_id='foo')
+        assert ['Agenda'] == [p['name'] for p in get_product_by_id('59b4c5c61d41c8d736852fc1', 'agenda', COMPANY_ID)]
+        assert ['Sport'] == [n['name'] for n in get_navigations_by_company(COMPANY_ID)]
+
+
+def test_cache_hits_and_invalidation(app):
+    with app.app_context():
+        get_products_by_company(COMPANY_ID)
+    with app.app_context():
+        products = get_products_by_company(COMPANY_ID)
+        products[0]['name'] = 'modified'
+
+    assert {'hits': 1, 'misses': 1, 'cached': True} == get_cache_stats()['products']
+
+    with app.app_context():
+        assert 'modified' not in [p['name'] for p in get_products_by_company(COMPANY_ID)]
+        get_resource_service('products').patch(ObjectId('59b4c5c61d41c8d736852fc1'), {'is_enabled': False})
+        assert ['Sport'] == [p['name'] for p in get_products_by_company(COMPANY_ID)]
+
+    assert {'hits': 2, 'misses': 2, 'cached': True} == get_cache_stats()['products']
+
+
+def test_cache_is_consistent_within_request(app):
+    with app.app_context():
+        assert 2 == len(get_products_by_company(COMPANY_ID))
+
+        # write done by other worker
+        app.data.update('products', ObjectId('59b4c5c61d41c8d736852fc1'), {'is_enabled': False}, None)
+        with app.app_context():
+            invalidate('products')
+
+        assert 2 == len(get_products_by_company(COMPANY_ID))
+
+    with app.app_context():
+        assert 1 == len(get_products_by_company(COMPANY_ID))
@@ -0,0 +1,66 @@
+import logging
+
+from .fixtures import items, init_items, init_auth, init_company  # noqa
+from .utils import get_json
+
+
+def test_search_sends_server_timing(client, app):
+    app.config['SEARCH_SERVER_TIMING'] = True
+    resp = client.get('/wire/search')
+    assert 200 == resp.status_code
+    timings = [timing.split(';')[0] for timing in resp.headers['Server-Timing'].split(', ')]
+    assert ['prefill', 'filters', 'source', 'elastic', 'post_process', 'es_took', 'total'] == timings
+
+
+def test_server_timing_is_disabled_by_default(client, app):
+    resp = client.get('/wire/search')
+    assert 200 == resp.status_code
+    assert 'Server-Timing' not in resp.headers
+
+
+def test_server_timing_is_admin_only(client, app):
+    app.config['SEARCH_SERVER_TIMING'] = True
+    with client.session_transaction() as session:
+        session['user_type'] = 'public'
+    assert 'Server-Timing' not in client.get('/wire/search').headers
+
+
+def test_search_metrics_are_disabled(client, app):
+    app.config['SEARCH_METRICS'] = False
+    app.config['SEARCH_SERVER_TIMING'] = True
+    resp = client.get('/wire/search')
+    assert 200 == resp.status_code
+    assert 'Server-Timing' not in resp.headers
+
+
+def test_slow_search_is_logged_with_query(client, app, caplog):
+    app.config['SEARCH_SLOW_THRESHOLD'] = 0.001
+    with caplog.at_level(logging.WARNING, logger='newsroom.search_metrics'):
+        client.get('/wire/search?q=weather')
+
+    messages = [record.getMessage() for record in caplog.records if record.name == 'newsroom.search_metrics']
+    assert 1 == len(messages)
+    assert 'Slow search GET /wire/search?q=weather' in messages[0]
+    assert '"query_string"' in messages[0]
+
+
+def test_metrics_endpoint(client, app):
+    client.get('/wire/search')
+    client.get('/wire/search')
+
+    data = get_json(client, '/metrics')
+    stats = data['search']['wire.search']
+    assert stats['count'] >= 2
+    assert stats['avg_elastic'] >= 1
+    assert stats['avg_mongo'] > 0
+    assert stats['avg_query_bytes'] > 0
+    assert 'elastic' in stats['avg_stages_ms']
+    assert 'aggregations_cache' in data
+    assert 'permission_filters' in data
+
+
+def test_metrics_endpoint_is_admin_only(client, app):
+    with client.session_transaction() as session:
+        session['user_type'] = 'public'
+    resp = client.get('/metrics', headers={'Accept': 'application/json'})
+    assert 403 == resp.status_code
@@ -4,6 +4,9 @@ from datetime import datetime, timedelta
 from urllib import parse
 from bson import ObjectId
 from copy import deepcopy
+from elasticsearch import Elasticsearch
+from newsroom.benchmarks import count_queries
+from newsroom.search import get_aggregations_cache_stats
 
 from .fixtures import items, init_items, init_auth, init_company, PUBLIC_USER_ID  # noqa
 from .utils import get_json, get_admin_user_id, mock_send_email
@@ -426,6 +429,32 @@ def test_item_detail_access(client, app):
     assert data['body_html']
 
 
+def test_items_permissions_use_single_search(client, app):
+    app.data.insert('products', [{
+        '_id': 10,
+        'name': 'matching product',
+        'companies': ['1'],
+        'is_enabled': True,
+        'product_type': 'wire',
+        'query': 'slugline:%s' % items[0]['slugline']
+    }])
+
+    with client.session_transaction() as session:
+        session['user'] = str(PUBLIC_USER_ID)
+        session['user_type'] = 'public'
+
+    elastic_requests = []
+    for item_ids in ([items[0]['_id']], [item['_id'] for item in items]):
+        with count_queries() as queries:
+            data = get_json(client, '/wire/items/{}'.format(','.join(item_ids)))
+        elastic_requests.append(queries['elastic'])
+        access = {item['_id']: item['_access'] for item in data}
+        assert access.pop(items[0]['_id'])
+        assert not any(access.values())
+
+    assert elastic_requests[0] == elastic_requests[1]
+
+
 def test_search_using_section_filter_for_public_user(client, app):
     app.data.insert('navigations', [{
         '_id': 51,
@@ -586,6 +615,30 @@ def test_company_type_filter(client, app):
     assert 'WEATHER' != data['_items'][0]['slugline']
 
 
+def test_first_page_aggregations_are_cached_until_push(client, app):
+    app.config['AGGREGATIONS_CACHE'] = True
+
+    def get_services(url='/wire/search'):
+        data = get_json(client, url)
+        return {bucket['key']: bucket['doc_count'] for bucket in data['_aggregations']['service']['buckets']}
+
+    stats = get_aggregations_cache_stats()
+    services = get_services()
+    assert services == get_services()
+    assert services == get_services('/wire/search?size=5')
+    assert 2 == get_aggregations_cache_stats()['hits'] - stats['hits']
+
+    client.post('/push', data=json.dumps({
+        'guid': 'service-a-item',
+        'type': 'text',
+        'headline': 'Service A',
+        'service': [{'code': 'a', 'name': 'Service A'}],
+    }), content_type='application/json')
+
+    assert services['Service A'] + 1 == get_services()['Service A']
+    assert 2 == get_aggregations_cache_stats()['misses'] - stats['misses']
+
+
 def test_search_by_products_and_filtered_by_embargoe(client, app):
     app.data.insert('products', [{
         '_id': 10,
@@ -625,6 +678,36 @@ def test_search_by_products_and_filtered_by_embargoe(client, app):
         assert items[0]['headline'] == 'china story'
 
 
+def test_products_items_are_searched_using_single_request(client, app):
+    app.data.insert('products', [{
+        '_id': 10,
+        'name': 'China',
+        'query': 'headline:china',
+        'is_enabled': True,
+        'product_type': 'wire'
+    }, {
+        '_id': 11,
+        'name': 'Sport',
+        'sd_product_id': 'sport',
+        'is_enabled': True,
+        'product_type': 'wire'
+    }])
+    app.data.insert('items', [
+        {'_id': 'china', 'headline': 'china story', 'type': 'text'},
+        {'_id': 'sport', 'headline': 'sport story', 'type': 'text', 'products': [{'code': 'sport'}]},
+    ])
+
+    with patch('newsroom.wire.search.get_user') as mock_get_user, \
+            patch('elasticsearch.Elasticsearch.msearch', autospec=True, side_effect=Elasticsearch.msearch) as msearch:
+        mock_get_user.return_value = {'_id': 'test_user_id', 'user_type': 'administrator'}
+        items = get_resource_service('wire_search').get_products_items([(11, 5), (12, 5), (10, 5)])
+
+    assert 1 == msearch.call_count
+    assert ['sport'] == [item['_id'] for item in items[0]]
+    assert items[1] is None
+    assert ['china'] == [item['_id'] for item in items[2]]
+
+
 def test_wire_delete(client, app):
     docs = [
         items[1],
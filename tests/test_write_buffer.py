@@ -0,0 +1,75 @@
+import time
+
+from bson import ObjectId
+from pytest import fixture
+from superdesk import get_resource_service
+
+from newsroom.write_buffer import WriteBuffer, get_write_buffer, write_docs
+
+from .fixtures import init_auth, ADMIN_USER_ID  # noqa
+
+
+@fixture
+def write_buffer(app):
+    app.config.update({
+        'WRITE_BUFFER_ENABLED': True,
+        'WRITE_BUFFER_MAX_SIZE': 3,
+        'WRITE_BUFFER_BATCH_SIZE': 100,
+        'WRITE_BUFFER_FLUSH_INTERVAL': 3600,
+    })
+    write_buffer = get_write_buffer()
+    yield write_buffer
+    write_buffer.stop()
+
+
+def get_history():
+    return list(get_resource_service('history').find({}))
+
+
+def test_history_is_written_in_batches(app, write_buffer):
+    user = {'_id': ObjectId(ADMIN_USER_ID)}
+    get_resource_service('history').create([{'_id': 'foo'}, {'_id': 'bar'}], 'download', user)
+    assert [] == get_history()
+    assert 2 == write_buffer.stats()['buffered']
+
+    write_buffer.flush()
+    assert ['bar', 'foo'] == sorted([record['item'] for record in get_history()])
+    assert {'buffered': 0, 'written': 2, 'dropped': 0, 'failed': 0} == write_buffer.stats()
+
+
+def test_records_are_dropped_when_buffer_is_full(app, write_buffer):
+    user = {'_id': ObjectId(ADMIN_USER_ID)}
+    get_resource_service('history').create([{'_id': 'foo'}, {'_id': 'bar'}], 'download', user)
+    get_resource_service('history').create([{'_id': 'baz'}, {'_id': 'qux'}], 'download', user)
+    assert 1 == write_buffer.stats()['dropped']
+
+    write_buffer.stop()
+    assert 3 == len(get_history())
+
+
+def test_batch_size_triggers_write(app):
+    app.config.update({'WRITE_BUFFER_BATCH_SIZE': 2, 'WRITE_BUFFER_FLUSH_INTERVAL': 3600})
+    write_buffer = WriteBuffer(app)
+    write_buffer.add('history', [{'item': 'foo', 'action': 'download'}])
+    assert not write_buffer.wakeup.is_set()
+    write_buffer.add('history', [{'item': 'bar', 'action': 'download'}])
+    for _i in range(50):
+        if write_buffer.stats()['written']:
+            break
+        time.sleep(0.1)
+    assert 2 == write_buffer.stats()['written']
+    assert 2 == len(get_history())
+    write_buffer.stop()
+
+
+def test_records_stored_in_mongo_before_failure_are_indexed(app):
+    write_docs('history', [{'_id': 'bar', 'item': 'bar', 'action': 'download'}])
+    write_docs('history', [
+        {'_id': 'foo', 'item': 'foo', 'action': 'download'},
+        {'_id': 'bar', 'item': 'bar', 'action': 'download'},
+        {'_id': 'baz', 'item': 'baz', 'action': 'download'},
+    ])
+
+    assert 3 == len(get_history())
+    indexed = get_resource_service('history').search({'query': {'match_all': {}}, 'size': 10})
+    assert ['bar', 'baz', 'foo'] == sorted(doc['item'] for doc in indexed)